@@ -0,0 +1,157 @@
+"""Accessibility score from precomputed per-city percentile ranks.
+
+realestate.listing_accessibility (migrations/0010_listing_accessibility.sql)
+stores, for every current listing, how close it is to each POI type relative
+to its city: 1 - percent_rank of the distance (1.0 = closest in the city, 0.0 =
+farthest or unknown). A score is then the
+weighted mean of those columns scaled to 0..100, which is plain arithmetic on a
+primary-key join instead of a window function per request. default_score
+(equal weights) is stored and indexed so sort=accessibility with default
+weights reads straight off the index. Every listing gets a row (one without a
+city scores 0.0 on every column, under city ''), so the search inner-joins the
+table and orders by the bare column.
+
+    python -m backend.accessibility            # rebuild every city
+    python -m backend.accessibility 2024-06-01 # only cities present in that snapshot
+"""
+import argparse
+from sqlalchemy import Table, Column, MetaData, String, Float, Index, text, bindparam
+from sqlalchemy.orm import Session
+from .settings import settings
+
+# weight key -> distance column of the Listing view
+ACCESS_COLUMNS = {
+    "centre": "centre_distance",
+    "school": "school_distance",
+    "clinic": "clinic_distance",
+    "post_office": "post_office_distance",
+    "kindergarten": "kindergarten_distance",
+    "restaurant": "restaurant_distance",
+    "college": "college_distance",
+    "pharmacy": "pharmacy_distance",
+}
+
+meta = MetaData(schema=settings.SCHEMA)
+
+accessibility = Table(
+    "listing_accessibility", meta,
+    Column("listing_id", String, primary_key=True),
+    Column("city", String, nullable=False),
+    *[Column(key, Float, nullable=False) for key in ACCESS_COLUMNS],
+    Column("default_score", Float, nullable=False),
+    Index("ix_listing_accessibility_score", "default_score", "listing_id"),
+    Index("ix_listing_accessibility_city_score", "city", "default_score"),
+)
+
+# ranks are over the newest row of each listing: DISTINCT ON makes that hold
+# whether VIEW_OR_TABLE is latest_listings (a no-op) or the full fact_listings
+REFRESH_SQL = """
+WITH latest AS (
+    SELECT * FROM (
+        SELECT DISTINCT ON (listing_id) * FROM {schema}.{source}
+        ORDER BY listing_id, snapshot_date DESC
+    ) newest
+    WHERE TRUE {only_cities}
+),
+ranked AS (
+    SELECT listing_id, coalesce(lower(city), '') AS city,
+           {ranks}
+    FROM latest
+)
+INSERT INTO {schema}.listing_accessibility (listing_id, city, {keys}, default_score)
+SELECT listing_id, city, {keys}, 100.0 * ({key_sum}) / {n_keys}
+FROM ranked
+ON CONFLICT (listing_id) DO UPDATE
+SET city = EXCLUDED.city, {updates}, default_score = EXCLUDED.default_score
+"""
+
+RANK_SQL = (
+    "CASE WHEN {col} IS NULL OR city IS NULL THEN 0.0 "
+    "ELSE 1.0 - percent_rank() OVER (PARTITION BY lower(city) ORDER BY {col} NULLS LAST) END AS {key}"
+)
+
+# city '' stands for listings without one
+SNAPSHOT_CITIES_SQL = (
+    "SELECT DISTINCT coalesce(lower(city), '') FROM {schema}.fact_listings "
+    "WHERE snapshot_date = CAST(:snapshot AS date)"
+)
+
+
+def refresh_accessibility(db: Session, snapshot_date=None) -> int:
+    """Recompute ranks for the cities in snapshot_date (every city if None).
+
+    Ranks are relative to the whole city, so a city is always recomputed as a
+    unit; its stale rows are removed in the same transaction."""
+    schema = settings.SCHEMA
+    keys = list(ACCESS_COLUMNS)
+    cities = SNAPSHOT_CITIES_SQL.format(schema=schema)
+    only = f"AND coalesce(lower(city), '') IN ({cities})" if snapshot_date is not None else ""
+    params = {"snapshot": str(snapshot_date)} if snapshot_date is not None else {}
+
+    if snapshot_date is None:
+        db.execute(text(f"DELETE FROM {schema}.listing_accessibility"))
+    else:
+        db.execute(text(f"DELETE FROM {schema}.listing_accessibility WHERE city IN ({cities})"), params)
+
+    sql = REFRESH_SQL.format(
+        schema=schema,
+        source=settings.VIEW_OR_TABLE,
+        only_cities=only,
+        ranks=",\n           ".join(RANK_SQL.format(col=col, key=key) for key, col in ACCESS_COLUMNS.items()),
+        keys=", ".join(keys),
+        key_sum=" + ".join(keys),
+        n_keys=len(keys),
+        updates=", ".join(f"{k} = EXCLUDED.{k}" for k in keys),
+    )
+    res = db.execute(text(sql), params)
+    db.commit()
+    return res.rowcount
+
+
+def parse_weights(spec: str | None) -> dict[str, float] | None:
+    """"school:2,pharmacy:1" -> normalized weights over ACCESS_COLUMNS (None = defaults)."""
+    if not spec:
+        return None
+    weights = dict.fromkeys(ACCESS_COLUMNS, 0.0)
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        key, _, value = part.partition(":")
+        key = key.strip().lower()
+        if key not in weights:
+            raise ValueError(f"unknown accessibility weight {key!r}; expected one of {', '.join(ACCESS_COLUMNS)}")
+        try:
+            weights[key] = float(value) if value.strip() else 1.0
+        except ValueError as exc:
+            raise ValueError(f"weight for {key!r} must be a number") from exc
+        if weights[key] < 0:
+            raise ValueError(f"weight for {key!r} must not be negative")
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("at least one accessibility weight must be positive")
+    return {f"w_{k}": v / total for k, v in weights.items()}
+
+
+def score_expression(custom_weights: bool):
+    """0..100 score over the accessibility table; weights come from w_<key> bind params.
+
+    The default is the bare column so that ordering by it can use
+    ix_listing_accessibility_score; the table has no NULLs to coalesce."""
+    if not custom_weights:
+        return accessibility.c.default_score
+    return 100.0 * sum(bindparam(f"w_{k}", type_=Float()) * accessibility.c[k] for k in ACCESS_COLUMNS)
+
+
+def main() -> None:
+    from .db import SessionLocal
+
+    ap = argparse.ArgumentParser(description="Rebuild realestate.listing_accessibility")
+    ap.add_argument("snapshot_date", nargs="?", help="only cities present in this snapshot (YYYY-MM-DD)")
+    args = ap.parse_args()
+    with SessionLocal() as db:
+        n = refresh_accessibility(db, args.snapshot_date)
+    print(f"refreshed accessibility for {n} listings")
+
+
+if __name__ == "__main__":
+    main()
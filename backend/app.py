@@ -1,15 +1,43 @@
-from fastapi import FastAPI, Depends, Query
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, Annotated
-from .db import get_db
-from sqlalchemy.orm import Session
-from .crud import search_listings,fetch_price_histories
-from .schemas import ListingsResponse, ListingOut
+from .db import get_read_db, engine, warm_up, pool_stats
+from sqlalchemy.ext.asyncio import AsyncSession
+from .crud import search_listings_async, stream_listings_async, cluster_listings_async, cluster_cell_size, snap_bbox, OPINION_SORTS
+from .schemas import ListingsResponse, ClustersResponse
+from .serialization import encode_listings_page, dumps, LISTING_FIELDS, EXPORT_ENCODERS
+from .settings import settings
+from .registry import registry
+from .http_cache import response_cache, cache_key
+from .instrumentation import TimingMiddleware, metrics, span
+from .accessibility import ACCESS_COLUMNS, parse_weights
+from . import snapshots
+from .columnar import engine as columnar_engine
 from backend.routers.opinion import router as opinions_router
+from backend.routers.similar import router as similar_router
+from backend.routers.stats import router as stats_router
+from backend.ml.similar import similarity
+from backend.ml.price import predictor as price_predictor
 
 
 
-app = FastAPI(title="Property Search API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # reflect the search tables once instead of on every request
+    registry.load(engine)
+    # open pooled connections now instead of on the first requests
+    await warm_up()
+    if settings.USE_COLUMNAR_ENGINE:
+        await asyncio.to_thread(columnar_engine.reload)
+    # built off the request path; the first /similar call waits for it if needed
+    similarity.rebuild_in_background()
+    yield
+
+
+app = FastAPI(title="Property Search API", lifespan=lifespan)
 origins =[
     "http://localhost:3000",
     "http://127.0.0.1:3000",
@@ -22,17 +50,32 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Server-Timing on every response, per-route/stage histograms for /metrics
+app.add_middleware(TimingMiddleware, fastapi_app=app)
 
 
 app.include_router(opinions_router)
+app.include_router(similar_router)
+app.include_router(stats_router)
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
 
-@app.get("/listings", response_model=ListingsResponse)
-def list_listings(
+@app.get("/health/pools")
+def health_pools():
+    """Connection pool usage per engine (primary, replica, sync and async)."""
+    return pool_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus text format: request/stage/query latency histograms, pool waits and gauges."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def listing_filters(
     city: Optional[str] = None,
     type: Optional[str] = None,
     min_m2: Optional[float] = None,
@@ -41,20 +84,6 @@ def list_listings(
     max_price: Optional[float] = None,
     rooms: Optional[int] = None,
     amenities: Optional[str] = Query(None, description="comma-separated: parking,balcony,elevator,security,storage"),
-    # viewport bbox (map bounds)
-    bbox_south: float | None = None,
-    bbox_west: float | None = None,
-    bbox_north: float | None = None,
-    bbox_east: float | None = None,
-     # proximity filter (center + radius in meters)
-    lat: float | None = None,
-    lng: float | None = None,
-    radius_m: int | None = None,
-    page: int = Query(1, ge=1),
-    page_size: int = Query(24, ge=1, le=100),
-    sort: Optional[str] = Query("recent", pattern="^(price_asc|price_desc|m2_asc|m2_desc|recent)$"),
-    include_history: bool = Query(False),
-    db: Session = Depends(get_db),
     max_school: float | None = None,
     max_clinic: float | None = None,
     max_post_office: float | None = None,
@@ -62,12 +91,17 @@ def list_listings(
     max_college: float | None = None,
     max_pharmacy: float | None = None,
     max_kindergarten: float | None = None,
-):
-    a_list = [a.strip() for a in amenities.split(",")] if amenities else []
-
-    rows, total = search_listings(
-        db=db,
-        city=city,
+    min_accessibility: float | None = Query(None, ge=0, le=100, description="minimum accessibility score (0..100)"),
+    access_weights: str | None = Query(None, description="accessibility weights, e.g. school:2,pharmacy:1 (keys: " + ",".join(ACCESS_COLUMNS) + ")"),
+) -> dict:
+    """Attribute filters shared by the listing endpoints, normalized for cache keys."""
+    a_list = sorted({a.strip().lower() for a in amenities.split(",") if a.strip()}) if amenities else []
+    try:
+        weights = parse_weights(access_weights)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return dict(
+        city=city.strip().lower() if city else None,
         type_=type,
         min_m2=min_m2,
         max_m2=max_m2,
@@ -75,13 +109,6 @@ def list_listings(
         max_price=max_price,
         rooms=rooms,
         amenities=a_list,
-        page=page,
-        page_size=page_size,
-        sort=sort,
-        # pass through geo params
-        bbox_south=bbox_south, bbox_west=bbox_west,
-        bbox_north=bbox_north, bbox_east=bbox_east,
-        lat=lat, lng=lng, radius_m=radius_m,
         # pass the distance filters through:
         max_school=max_school,
         max_clinic=max_clinic,
@@ -90,14 +117,165 @@ def list_listings(
         max_college=max_college,
         max_pharmacy=max_pharmacy,
         max_kindergarten=max_kindergarten,
+        min_accessibility=min_accessibility,
+        access_weights=weights,
     )
 
-    items = [ListingOut.model_validate(r).model_dump() for r in rows]
 
-    # Attach price history for the items returned on this page
-    ids = [it["listing_id"] for it in items]
-    hmap = fetch_price_histories(db, ids)
-    for it in items:
-        it["price_history"] = hmap.get(it["listing_id"], [])
+@app.get("/listings", response_model=ListingsResponse)
+async def list_listings(
+    request: Request,
+    filters: dict = Depends(listing_filters),
+    # viewport bbox (map bounds)
+    bbox_south: float | None = None,
+    bbox_west: float | None = None,
+    bbox_north: float | None = None,
+    bbox_east: float | None = None,
+     # proximity filter (center + radius in meters)
+    lat: float | None = None,
+    lng: float | None = None,
+    radius_m: int | None = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(24, ge=1, le=100),
+    sort: Optional[str] = Query("recent", pattern="^(price_asc|price_desc|m2_asc|m2_desc|recent|distance_asc|accessibility|" + "|".join(OPINION_SORTS) + ")$"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; replaces page"),
+    include_history: bool = Query(False),
+    include_opinions: bool = Query(False, description="attach per-listing opinion averages as opinion_summary"),
+    include_prediction: bool = Query(False, description="attach predicted_next_price from the price model"),
+    history_format: str = Query("points", pattern="^(points|columnar)$", description="points: [{date, price}], columnar: {dates, prices}"),
+    format: str = Query("rows", pattern="^(rows|columnar)$", description="rows: items[], columnar: one array per field under columns"),
+    count: Optional[str] = Query(None, pattern="^(exact|cached|estimate)$", description="how total is computed; defaults to COUNT_MODE"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # geo params stay exact, in the query and in the cache key: snapping only the
+    # key would serve one viewport's page for another that matches other rows.
+    # They are parsed to float, so 50 and 50.0 already share an entry.
+    filters = dict(
+        filters,
+        page=page,
+        page_size=page_size,
+        sort=sort,
+        cursor=cursor,
+        count_mode=count,
+        include_opinions=include_opinions,
+        # pass through geo params
+        bbox_south=bbox_south, bbox_west=bbox_west,
+        bbox_north=bbox_north, bbox_east=bbox_east,
+        lat=lat, lng=lng, radius_m=radius_m,
+    )
+
+    async def produce() -> bytes:
+        try:
+            result, hmap = await search_listings_async(
+                db,
+                with_histories=include_history,
+                columnar_history=history_format == "columnar",
+                **filters,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+        # one batched predict for the page (cached per listing, snapshot and model version)
+        predictions = None
+        if include_prediction:
+            ids = [r[LISTING_FIELDS.index("listing_id")] for r in result.rows]
+            with span("predict"):
+                predictions = await price_predictor.predict_async(db, ids)
+
+        # Attach price history for the items returned on this page
+        empty = {"dates": [], "prices": []} if history_format == "columnar" else []
+        with span("serialize"):
+            return encode_listings_page(
+                result.rows,
+                page=page,
+                page_size=page_size,
+                total=result.total,
+                total_is_estimate=result.total_is_estimate,
+                next_cursor=result.next_cursor,
+                histories=hmap if include_history else None,
+                empty_history=empty,
+                columnar=format == "columnar",
+                opinion_summaries=include_opinions,
+                predictions=predictions,
+            )
+
+    if include_prediction and not price_predictor.enabled:
+        raise HTTPException(status_code=503, detail="price model is not configured (PRICE_MODEL_PATH)")
+
+    # a new snapshot clears the cached pages (throttled to one check per poll interval)
+    with span("snapshot_watch"):
+        await db.run_sync(snapshots.watch)
+    # pages showing opinion data live under their own prefix, which opinion writes clear
+    namespace = "listings:opinions" if include_opinions or sort in OPINION_SORTS else "listings"
+    key = cache_key(namespace, include_history=include_history, history_format=history_format, format=format,
+                    include_prediction=include_prediction, **filters)
+    return await response_cache.respond(request, key, produce)
+
+
+@app.get("/listings/export")
+async def export_listings(
+    filters: dict = Depends(listing_filters),
+    bbox_south: float | None = None,
+    bbox_west: float | None = None,
+    bbox_north: float | None = None,
+    bbox_east: float | None = None,
+    lat: float | None = None,
+    lng: float | None = None,
+    radius_m: int | None = None,
+    sort: Optional[str] = Query("recent", pattern="^(price_asc|price_desc|m2_asc|m2_desc|recent|distance_asc|accessibility)$"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow)$"),
+    include_history: bool = Query(False),
+    limit: int | None = Query(None, ge=1, description="stop after this many listings"),
+):
+    """Every listing matching the /listings filters, streamed in sort order as NDJSON,
+    CSV or an Arrow IPC stream. Rows are read through a server-side cursor and
+    encoded batch by batch, so memory stays flat and bytes flow immediately."""
+    try:
+        encoder = EXPORT_ENCODERS[format](include_history)
+    except RuntimeError as exc:  # pyarrow missing
+        raise HTTPException(status_code=501, detail=str(exc))
+    filters = dict(
+        filters, sort=sort,
+        bbox_south=bbox_south, bbox_west=bbox_west, bbox_north=bbox_north, bbox_east=bbox_east,
+        lat=lat, lng=lng, radius_m=radius_m,
+    )
+
+    async def body():
+        yield encoder.header()
+        batches = stream_listings_async(
+            batch_rows=settings.EXPORT_BATCH_ROWS, with_histories=include_history, limit=limit, **filters
+        )
+        async for rows, histories in batches:
+            yield encoder.encode(rows, histories)
+        yield encoder.footer()
+
+    return StreamingResponse(
+        body(),
+        media_type=encoder.media_type,
+        headers={"Content-Disposition": f'attachment; filename="listings.{encoder.extension}"'},
+    )
+
+
+@app.get("/listings/clusters", response_model=ClustersResponse)
+async def listing_clusters(
+    request: Request,
+    bbox_south: float,
+    bbox_west: float,
+    bbox_north: float,
+    bbox_east: float,
+    zoom: int = Query(..., ge=0, le=22),
+    filters: dict = Depends(listing_filters),
+    raw_threshold: int = Query(settings.CLUSTER_RAW_THRESHOLD, ge=0, le=1000, description="return raw listings when at most this many match"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # snap to the cluster grid: every viewport at this zoom maps onto whole cells,
+    # so cells are stable while panning and each snapped view is one cache entry
+    cell = cluster_cell_size(zoom)
+    bbox = snap_bbox(bbox_south, bbox_west, bbox_north, bbox_east, cell)
+
+    async def produce() -> bytes:
+        return dumps(await cluster_listings_async(db, bbox=bbox, zoom=zoom, raw_threshold=raw_threshold, **filters))
 
-    return {"items": items, "page": page, "page_size": page_size, "total": total}
+    await db.run_sync(snapshots.watch)
+    key = cache_key("listings:clusters", bbox=bbox, zoom=zoom, raw_threshold=raw_threshold, **filters)
+    return await response_cache.respond(request, key, produce)
@@ -0,0 +1 @@
+"""Benchmarks for the backend hot paths (run as ``python -m backend.bench.<name>``)."""
@@ -0,0 +1,81 @@
+"""Stored benchmark results, for comparing a run against an earlier one.
+
+Results are flat {benchmark: {metric: value}} dicts saved as
+backend/bench/baselines/<suite>-<name>.json together with the run parameters.
+--save NAME on micro/load writes one; --compare NAME prints the change per
+metric and exits 1 when a latency grew (or a throughput dropped) by more than
+--tolerance.
+"""
+import json
+import platform
+import time
+from pathlib import Path
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+# metrics where bigger is better; every other metric is a time
+HIGHER_IS_BETTER = ("ops_per_s", "rps")
+
+
+def baseline_path(suite: str, name: str) -> Path:
+    return BASELINE_DIR / f"{suite}-{name}.json"
+
+
+def save(suite: str, name: str, results: dict, params: dict) -> Path:
+    path = baseline_path(suite, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc = {
+        "suite": suite,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+    path.write_text(json.dumps(doc, indent=2, sort_keys=True))
+    return path
+
+
+def load(suite: str, name: str) -> dict:
+    path = baseline_path(suite, name)
+    if not path.exists():
+        raise SystemExit(f"no baseline {path}")
+    return json.loads(path.read_text())
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print current vs baseline per metric; returns the regressions beyond tolerance."""
+    regressions = []
+    print(f"\n{'benchmark':<32} {'metric':<10} {'baseline':>12} {'current':>12} {'change':>8}")
+    for bench, metrics in results.items():
+        old = baseline["results"].get(bench)
+        if old is None:
+            continue
+        for metric, value in metrics.items():
+            before = old.get(metric)
+            if not isinstance(value, (int, float)) or not before:
+                continue
+            change = value / before - 1
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = "  !" if worse > tolerance else ""
+            print(f"{bench:<32} {metric:<10} {before:>12.4g} {value:>12.4g} {change:>+7.1%}{flag}")
+            if worse > tolerance:
+                regressions.append(f"{bench} {metric}: {before:.4g} -> {value:.4g} ({change:+.1%})")
+    return regressions
+
+
+def percentiles(samples: list[float]) -> dict:
+    """p50/p95/p99 and mean of samples (seconds), reported in milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+    }
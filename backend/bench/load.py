@@ -0,0 +1,219 @@
+"""HTTP load test of /listings and the opinion endpoints with a realistic query mix.
+
+    uvicorn backend.app:app --workers 4 --port 8000 &
+    python -m backend.bench.load --url http://localhost:8000 --concurrency 32 --duration 60 --save main
+    python -m backend.bench.load --duration 60 --compare main
+
+A pool of --concurrency clients sends requests for --duration seconds, each
+request drawn from SHAPES by weight: plain browsing, the filter panel, map
+viewports and radius searches around real listings, cursor paging, pages with
+history/opinion summaries, single-listing opinions, the batch endpoint and
+market statistics.
+Parameters are drawn from the listings the server returns at start-up, so a
+run sees a realistic mix of response-cache hits and misses; the hit ratio
+(X-Cache) is reported next to p50/p95/p99 latency and requests per second per
+shape and overall. Requests in the first --warmup seconds are not counted.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import defaultdict
+import httpx
+
+from backend.bench import baseline
+
+AMENITIES = ["parking", "balcony", "elevator", "security", "storage"]
+SORTS = ["recent", "price_asc", "price_desc", "m2_asc", "m2_desc"]
+
+
+class Context:
+    """Listing ids, cities, coordinates and a cursor sampled from the running server."""
+
+    def __init__(self, listings: list[dict], cursor: str | None):
+        self.listings = listings
+        self.ids = [l["listing_id"] for l in listings]
+        self.cities = sorted({l["city"] for l in listings if l.get("city")})
+        self.cursor = cursor
+
+    def listing(self, rnd: random.Random) -> dict:
+        return rnd.choice(self.listings)
+
+
+def browse(rnd, ctx):
+    return "GET", "/listings", {"sort": rnd.choice(SORTS), "page_size": 24}
+
+
+def filter_panel(rnd, ctx):
+    lo = rnd.choice([200_000, 300_000, 400_000, 500_000])
+    params = {"city": rnd.choice(ctx.cities), "min_price": lo, "max_price": lo + rnd.choice([200_000, 400_000]),
+              "sort": rnd.choice(SORTS)}
+    if rnd.random() < 0.5:
+        params["rooms"] = rnd.randint(1, 4)
+    if rnd.random() < 0.3:
+        params["amenities"] = ",".join(rnd.sample(AMENITIES, rnd.randint(1, 2)))
+    return "GET", "/listings", params
+
+
+def map_viewport(rnd, ctx):
+    l = ctx.listing(rnd)
+    half = rnd.choice([0.01, 0.02, 0.05])
+    lat, lng = float(l["latitude"]) + rnd.uniform(-half, half) / 2, float(l["longitude"]) + rnd.uniform(-half, half) / 2
+    return "GET", "/listings", {"bbox_south": lat - half, "bbox_north": lat + half,
+                                "bbox_west": lng - half * 1.6, "bbox_east": lng + half * 1.6, "sort": "recent"}
+
+
+def radius(rnd, ctx):
+    l = ctx.listing(rnd)
+    return "GET", "/listings", {"lat": l["latitude"], "lng": l["longitude"],
+                                "radius_m": rnd.choice([500, 1000, 2000]), "sort": "distance_asc"}
+
+
+def poi(rnd, ctx):
+    return "GET", "/listings", {"max_school": rnd.choice([0.3, 0.5, 1.0]), "max_pharmacy": rnd.choice([0.3, 0.5]),
+                                "sort": rnd.choice(SORTS)}
+
+
+def next_page(rnd, ctx):
+    return "GET", "/listings", {"cursor": ctx.cursor, "sort": "recent"} if ctx.cursor else {"page": 2}
+
+
+def with_extras(rnd, ctx):
+    return "GET", "/listings", {"city": rnd.choice(ctx.cities), "include_history": "true",
+                                "include_opinions": "true", "sort": "recent"}
+
+
+def opinions_one(rnd, ctx):
+    return "GET", f"/listings/{rnd.choice(ctx.ids)}/opinions", {}
+
+
+def opinions_batch(rnd, ctx):
+    ids = rnd.sample(ctx.ids, min(24, len(ctx.ids)))
+    return "POST", "/listings/opinions:batch", {"listing_ids": ids, "mode": rnd.choice(["summary", "summary", "full"])}
+
+
+def market(rnd, ctx):
+    params = {"by": rnd.choice(["", "type", "rooms", "type,rooms"])}
+    if rnd.random() < 0.7:
+        params["city"] = rnd.choice(ctx.cities)
+    return "GET", "/stats/market", params
+
+
+# (name, weight, request builder)
+SHAPES = [
+    ("browse", 20, browse),
+    ("filter_panel", 25, filter_panel),
+    ("map_viewport", 15, map_viewport),
+    ("radius", 5, radius),
+    ("poi", 5, poi),
+    ("next_page", 10, next_page),
+    ("with_extras", 5, with_extras),
+    ("opinions_one", 10, opinions_one),
+    ("opinions_batch", 5, opinions_batch),
+    ("market", 3, market),
+]
+
+
+async def discover(client: httpx.AsyncClient, pages: int) -> Context:
+    listings, cursor = [], None
+    for _ in range(pages):
+        r = await client.get("/listings", params={"page_size": 100, "sort": "recent", **({"cursor": cursor} if cursor else {})})
+        r.raise_for_status()
+        body = r.json()
+        listings += body["items"]
+        cursor = body.get("next_cursor")
+        if not cursor:
+            break
+    if not listings:
+        raise SystemExit("the server returned no listings: load data first (python -m backend.bench.synthetic)")
+    return Context(listings, cursor)
+
+
+async def worker(client, ctx, rnd, deadline, warm_until, samples, errors, hits):
+    names, weights, builders = zip(*SHAPES)
+    while (now := time.perf_counter()) < deadline:
+        i = rnd.choices(range(len(SHAPES)), weights)[0]
+        method, path, params = builders[i](rnd, ctx)
+        t0 = time.perf_counter()
+        try:
+            if method == "GET":
+                r = await client.get(path, params=params)
+            else:
+                r = await client.post(path, json=params)
+            ok = r.status_code < 400
+        except httpx.HTTPError:
+            ok, r = False, None
+        elapsed = time.perf_counter() - t0
+        if now < warm_until:
+            continue
+        samples[names[i]].append(elapsed)
+        if not ok:
+            errors[names[i]] += 1
+        elif r.headers.get("x-cache") == "HIT":
+            hits[names[i]] += 1
+
+
+async def run(args) -> tuple[dict, float]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        ctx = await discover(client, args.discover_pages)
+        samples, errors, hits = defaultdict(list), defaultdict(int), defaultdict(int)
+        start = time.perf_counter()
+        warm_until, deadline = start + args.warmup, start + args.warmup + args.duration
+        await asyncio.gather(*[
+            worker(client, ctx, random.Random(args.seed + i), deadline, warm_until, samples, errors, hits)
+            for i in range(args.concurrency)
+        ])
+        wall = time.perf_counter() - warm_until
+
+    results = {}
+    for name, _, _ in SHAPES:
+        s = samples.get(name)
+        if s:
+            results[name] = dict(baseline.percentiles(s), rps=len(s) / wall, requests=len(s),
+                                 errors=errors[name], cache_hit=hits[name] / len(s))
+    every = [x for s in samples.values() for x in s]
+    if every:
+        results["all"] = dict(baseline.percentiles(every), rps=len(every) / wall, requests=len(every),
+                              errors=sum(errors.values()), cache_hit=sum(hits.values()) / len(every))
+    return results, wall
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Load test /listings and the opinion endpoints")
+    ap.add_argument("--url", default="http://localhost:8000")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    ap.add_argument("--warmup", type=float, default=5.0, help="seconds before measuring starts")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    ap.add_argument("--discover-pages", type=int, default=5, help="pages of 100 listings to draw parameters from")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--save", metavar="NAME", help="store the results as baseline NAME")
+    ap.add_argument("--compare", metavar="NAME", help="compare against baseline NAME")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed regression before --compare fails")
+    args = ap.parse_args()
+
+    results, wall = asyncio.run(run(args))
+    print(f"{'shape':<16} {'requests':>9} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'hit':>6}")
+    for name, r in results.items():
+        print(f"{name:<16} {r['requests']:>9,} {r['rps']:>8.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['p99_ms']:>9.1f} {r['errors']:>7} {r['cache_hit']:>6.0%}")
+    print(f"\n{args.concurrency} clients for {wall:.1f}s against {args.url}")
+
+    # only latencies and throughput are compared
+    compared = {k: {m: v for m, v in r.items() if m.endswith("_ms") or m == "rps"} for k, r in results.items()}
+    params = {k: v for k, v in vars(args).items() if k not in ("save", "compare")}
+    if args.save:
+        print(f"saved {baseline.save('load', args.save, results, params)}")
+    if args.compare:
+        regressions = baseline.compare(compared, baseline.load("load", args.compare), args.tolerance)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+    if results.get("all", {}).get("errors"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
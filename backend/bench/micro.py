@@ -0,0 +1,141 @@
+"""Microbenchmarks of the backend hot paths against a loaded database.
+
+    python -m backend.bench.synthetic --listings 200000 --snapshots 12
+    python -m backend.bench.micro --repeat 50 --save main
+    python -m backend.bench.micro --repeat 50 --compare main
+
+Benchmarks:
+
+* build_filters / prepare_search: SQL expression building and statement-cache
+  lookup for the plan_check cases (no I/O);
+* search_listings[<case>]: count + page query per case, through the sync path;
+* fetch_price_histories[N]: history arrays for N random listing ids;
+* synthesize_opinions[N]: opinion generation for N in-memory listings;
+* upsert_many[N]: opinions for N real listings written with the batched upsert
+  (this writes to synthetic_opinions and listing_opinion_summary).
+
+Each benchmark is warmed up once, then timed --repeat times; mean/p50/p95/p99
+latency and operations per second are reported, and optionally saved as a
+baseline or compared against one (backend/bench/baseline.py).
+"""
+import argparse
+import random
+import sys
+import time
+from sqlalchemy import text
+
+from backend.db import SessionLocal, engine
+from backend.settings import settings
+from backend.crud import build_filters, prepare_search, search_listings
+from backend.history import fetch_price_histories
+from backend.opinion_crud.opinion import upsert_many
+from backend.services.opinion_generator import synthesize_opinions
+from backend.bench import baseline
+from backend.bench.opinions import fake_listings
+from backend.bench.plan_check import CASES, FILTER_DEFAULTS
+
+OPINION_COLUMNS = """listing_id, city, type, square_m, rooms, floor, floor_count, build_year,
+    centre_distance, poi_count, has_parking_space, has_elevator, has_security"""
+
+
+def measure(fn, repeat: int, ops: int = 1) -> dict:
+    """Warm up once, time `repeat` calls; ops is the work units per call (rows, ids)."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    stats = baseline.percentiles(samples)
+    stats["ops_per_s"] = ops * len(samples) / sum(samples) if sum(samples) else 0.0
+    return stats
+
+
+def search_params(case: dict) -> dict:
+    return dict(FILTER_DEFAULTS, page=1, page_size=20, **case)
+
+
+def sample_ids(db, n: int, seed: int) -> list[str]:
+    rows = db.execute(text(
+        f"SELECT listing_id FROM {settings.SCHEMA}.{settings.VIEW_OR_TABLE} TABLESAMPLE SYSTEM (5) LIMIT :n"
+    ), {"n": n * 20}).scalars().all()
+    if not rows:
+        raise SystemExit("no listings: load data first (python -m backend.bench.synthetic)")
+    rnd = random.Random(seed)
+    return rnd.sample(rows, min(n, len(rows)))
+
+
+def run(args) -> dict:
+    results: dict[str, dict] = {}
+
+    def record(name: str, stats: dict) -> None:
+        results[name] = stats
+        print(f"{name:<40} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['ops_per_s']:>12,.0f}")
+
+    def wanted(name: str) -> bool:
+        return not args.only or any(o in name for o in args.only)
+
+    print(f"{'benchmark':<40} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>12}")
+
+    filter_cases = [{k: v for k, v in search_params(c).items() if k in FILTER_DEFAULTS} for _, c in CASES]
+    if wanted("build_filters"):
+        record("build_filters", measure(lambda: [build_filters(**f) for f in filter_cases], args.repeat * 10, len(filter_cases)))
+    if wanted("prepare_search"):
+        record("prepare_search", measure(lambda: [prepare_search(bind=engine, **search_params(c)) for _, c in CASES], args.repeat * 10, len(CASES)))
+
+    if wanted("synthesize_opinions"):
+        for n in args.opinion_sizes:
+            df = fake_listings(n)
+            record(f"synthesize_opinions[{n}]", measure(lambda: synthesize_opinions(df, 3, 42), max(3, args.repeat // 10), n * 3))
+
+    with SessionLocal() as db:
+        for label, case in CASES:
+            name = f"search_listings[{label}]"
+            if wanted(name):
+                record(name, measure(lambda: search_listings(db, **search_params(case)), args.repeat))
+
+        for n in args.history_sizes:
+            name = f"fetch_price_histories[{n}]"
+            if wanted(name):
+                ids = sample_ids(db, n, args.seed)
+                record(name, measure(lambda: fetch_price_histories(db, ids), args.repeat, len(ids)))
+
+        if wanted("upsert_many"):
+            import pandas as pd
+
+            ids = sample_ids(db, args.upsert_listings, args.seed)
+            res = db.execute(text(
+                f"SELECT {OPINION_COLUMNS} FROM {settings.SCHEMA}.{settings.VIEW_OR_TABLE} WHERE listing_id = ANY(:ids)"
+            ), {"ids": ids})
+            df = pd.DataFrame(res.all(), columns=list(res.keys()))
+            rows = synthesize_opinions(df, 3, args.seed).to_dict(orient="records")
+            record(f"upsert_many[{len(rows)}]", measure(lambda: upsert_many(db, rows), max(3, args.repeat // 10), len(rows)))
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Microbenchmarks of the backend hot paths")
+    ap.add_argument("--repeat", type=int, default=30)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--history-sizes", type=int, nargs="+", default=[20, 100])
+    ap.add_argument("--opinion-sizes", type=int, nargs="+", default=[10_000])
+    ap.add_argument("--upsert-listings", type=int, default=1000)
+    ap.add_argument("--only", nargs="+", help="run benchmarks whose name contains any of these")
+    ap.add_argument("--save", metavar="NAME", help="store the results as baseline NAME")
+    ap.add_argument("--compare", metavar="NAME", help="compare against baseline NAME")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed regression before --compare fails")
+    args = ap.parse_args()
+
+    results = run(args)
+    params = {k: v for k, v in vars(args).items() if k not in ("save", "compare")}
+    if args.save:
+        print(f"\nsaved {baseline.save('micro', args.save, results, params)}")
+    if args.compare:
+        regressions = baseline.compare(results, baseline.load("micro", args.compare), args.tolerance)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Throughput of synthesize_opinions, checked against the per-opinion reference.
+
+    python -m backend.bench.opinions
+    python -m backend.bench.opinions --sizes 10000 100000 --per-listing 3 --reference-max 10000
+
+Listings are generated in memory (no database needed). For sizes up to
+--reference-max the reference loop is timed too and both outputs must be
+identical; the vectorized run is also repeated to confirm a seed reproduces
+the same frame.
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from backend.services.opinion_generator import synthesize_opinions, synthesize_opinions_reference
+
+
+def fake_listings(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    floor_count = rng.integers(1, 20, n)
+    df = pd.DataFrame({
+        "listing_id": [f"bench{i:07d}" for i in range(n)],
+        "build_year": rng.integers(1900, 2024, n).astype(float),
+        "centre_distance": rng.gamma(2.0, 2.0, n),
+        "poi_count": rng.poisson(15, n).astype(float),
+        "has_parking_space": rng.random(n) < 0.4,
+        "has_elevator": rng.random(n) < 0.5,
+        "has_security": rng.random(n) < 0.2,
+        "floor": rng.integers(0, floor_count + 1),
+        "floor_count": floor_count,
+    })
+    # a few gaps so the default-filling path is exercised
+    df.loc[df.sample(frac=0.05, random_state=seed).index, "build_year"] = np.nan
+    return df
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark synthetic opinion generation")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--per-listing", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--reference-max", type=int, default=10_000, help="largest size the reference loop runs at")
+    args = ap.parse_args()
+
+    print(f"{'listings':>9} {'opinions':>9} {'vectorized':>12} {'op/s':>12} {'reference':>11} {'speedup':>8}")
+    for n in args.sizes:
+        df = fake_listings(n)
+        fast, t_fast = timed(synthesize_opinions, df, args.per_listing, args.seed)
+        again = synthesize_opinions(df, args.per_listing, args.seed)
+        pd.testing.assert_frame_equal(fast, again)
+
+        ref_col, speed_col = "-", "-"
+        if n <= args.reference_max:
+            ref, t_ref = timed(synthesize_opinions_reference, df, args.per_listing, args.seed)
+            pd.testing.assert_frame_equal(fast, ref, check_dtype=False)
+            ref_col, speed_col = f"{t_ref:.3f}s", f"{t_ref / t_fast:.1f}x"
+        print(f"{n:>9,} {len(fast):>9,} {t_fast:>11.3f}s {len(fast) / t_fast:>12,.0f} {ref_col:>11} {speed_col:>8}")
+
+
+if __name__ == "__main__":
+    main()
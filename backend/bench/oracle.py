@@ -0,0 +1,79 @@
+"""Check the columnar engine against the SQL search path (the reference).
+
+    python -m backend.bench.oracle --pages 3
+
+Runs a set of /listings parameter combinations through crud.search_listings and
+ColumnarIndex.search, following next_cursor for a few pages, and reports any
+difference in totals or listing order. Exits non-zero on a mismatch.
+"""
+import argparse
+import sys
+
+from backend.columnar import ColumnarIndex
+from backend.crud import search_listings
+from backend.db import SessionLocal
+from backend.serialization import LISTING_FIELDS
+
+_ID = LISTING_FIELDS.index("listing_id")
+
+CASES = [
+    {},
+    {"city": "krakow"},
+    {"city": "Warszawa", "min_price": 400_000, "max_price": 900_000, "rooms": 3},
+    {"type_": "blockOfFlats", "min_m2": 40, "max_m2": 70, "sort": "price_asc"},
+    {"amenities": ["balcony", "elevator"], "sort": "m2_desc"},
+    {"max_school": 500, "max_pharmacy": 300, "sort": "price_desc"},
+    {"bbox_south": 50.0, "bbox_west": 19.8, "bbox_north": 50.1, "bbox_east": 20.0},
+    {"lat": 52.23, "lng": 21.01, "radius_m": 1500, "sort": "distance_asc"},
+]
+
+FILTERS = (
+    "city", "type_", "min_m2", "max_m2", "min_price", "max_price", "rooms", "amenities",
+)
+
+
+def run_case(db, index, case: dict, pages: int, page_size: int) -> list[str]:
+    params = {f: None for f in FILTERS}
+    params.update(case)
+    params.setdefault("sort", "recent")
+    problems = []
+    sql_cursor = mem_cursor = None
+    for page in range(1, pages + 1):
+        sql = search_listings(db, page=page, page_size=page_size, cursor=sql_cursor, count_mode="exact", **params)
+        mem = index.search(page=page, page_size=page_size, cursor=mem_cursor, **params)
+        if sql.total != mem.total:
+            problems.append(f"page {page}: total sql={sql.total} columnar={mem.total}")
+        sql_ids = [r[_ID] for r in sql.rows]
+        mem_ids = [r[_ID] for r in mem.rows]
+        if sql_ids != mem_ids:
+            problems.append(f"page {page}: ids differ (first sql={sql_ids[:3]} columnar={mem_ids[:3]})")
+        if not sql.next_cursor or not mem.next_cursor:
+            if bool(sql.next_cursor) != bool(mem.next_cursor):
+                problems.append(f"page {page}: next_cursor presence differs")
+            break
+        sql_cursor, mem_cursor = sql.next_cursor, mem.next_cursor
+    return problems
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--pages", type=int, default=3)
+    ap.add_argument("--page-size", type=int, default=24)
+    args = ap.parse_args()
+
+    failed = False
+    with SessionLocal() as db:
+        index = ColumnarIndex.load(db)
+        print(f"loaded {index.n} listings")
+        for case in CASES:
+            problems = run_case(db, index, case, args.pages, args.page_size)
+            status = "ok" if not problems else "MISMATCH"
+            print(f"{status:8s} {case}")
+            for p in problems:
+                print(f"         {p}")
+            failed |= bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Query-plan regression check for the common /listings parameter combinations.
+
+    python -m backend.migrate && python -m backend.bench.plan_check
+    python -m backend.bench.plan_check --verbose   # print every plan
+
+Each case is EXPLAINed (nothing is executed) for its first page and for a
+keyset page. A case fails when its plan uses no index, has a sequential scan
+on the listing relations, or has a Sort whose input is at least --full-sort of
+the table (a Top-N sort over a filtered subset is fine). Exits 1 on any
+failure, so it can gate a migration or a query change;
+backend/tests/test_plans.py runs the same check under pytest. Needs DATABASE_URL pointing at a local Postgres
+with realistic volume: on a near-empty table a seq scan is the right plan, so
+the check refuses to run below --min-rows.
+"""
+import argparse
+import json
+import sys
+from sqlalchemy import select
+
+from backend.db import SessionLocal
+from backend.settings import settings
+from backend.crud import prepare_search, encode_cursor
+from backend.counts import explain_plan, estimate_count
+from backend.models import Listing
+
+# (label, prepare_search keyword arguments): browse, filter panel, map and POI searches
+CASES = [
+    ("browse recent", dict(sort="recent")),
+    ("browse price asc", dict(sort="price_asc")),
+    ("browse price desc", dict(sort="price_desc")),
+    ("browse m2 desc", dict(sort="m2_desc")),
+    ("city", dict(city="krakow", sort="recent")),
+    ("city price range", dict(city="warszawa", min_price=400_000, max_price=900_000, sort="price_asc")),
+    ("city type rooms", dict(city="warszawa", type_="blockOfFlats", rooms=3, sort="price_asc")),
+    ("amenity", dict(amenities=["elevator"], sort="recent")),
+    ("city amenities", dict(city="gdansk", amenities=["balcony", "elevator"], sort="price_asc")),
+    ("poi caps", dict(max_school=300, max_pharmacy=200, sort="recent")),
+    ("bbox", dict(bbox_south=50.0, bbox_west=19.8, bbox_north=50.1, bbox_east=20.0, sort="recent")),
+    ("radius by distance", dict(lat=52.23, lng=21.01, radius_m=1500, sort="distance_asc")),
+    ("accessibility", dict(sort="accessibility")),
+]
+
+# a plausible keyset position per sort, only needed to bind the keyset template
+AFTER_KEYS = {
+    "recent": "2024-01-01", "price_asc": 500_000.0, "price_desc": 500_000.0,
+    "m2_asc": 60.0, "m2_desc": 60.0, "distance_asc": 500.0, "accessibility": 50.0,
+}
+
+FILTER_DEFAULTS = dict(city=None, type_=None, min_m2=None, max_m2=None, min_price=None,
+                       max_price=None, rooms=None, amenities=None)
+
+
+def _nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _nodes(child)
+
+
+def check_plan(plan: dict, relations: set[str], table_rows: float, full_sort: float) -> list[str]:
+    problems = []
+    if not any("Index" in node["Node Type"] for node in _nodes(plan)):
+        problems.append("no index used")
+    for node in _nodes(plan):
+        kind = node["Node Type"]
+        if kind == "Seq Scan" and node.get("Relation Name") in relations:
+            problems.append(f"seq scan on {node['Relation Name']}")
+        if kind == "Sort" and node.get("Plan Rows", 0) >= full_sort * table_rows:
+            problems.append(f"sort over {node['Plan Rows']:,} rows ({', '.join(node.get('Sort Key', []))})")
+    return problems
+
+
+def listing_relations() -> set[str]:
+    return {"fact_listings", settings.VIEW_OR_TABLE}
+
+
+def listing_rows(db) -> float:
+    """Planner estimate of the rows of settings.VIEW_OR_TABLE, the relation Listing
+    is bound to and the one a full sort would run over. Asked of the planner
+    rather than read from reltuples so that it holds for a view too."""
+    return max(estimate_count(db, select(Listing.listing_id), {}), 0)
+
+
+def explain_case(db, case: dict, keyset: bool, page_size: int = 24) -> dict:
+    """Plan of a case's first page, or of a keyset page after a plausible position."""
+    filters = dict(FILTER_DEFAULTS, **case)
+    cursor = encode_cursor(filters["sort"], AFTER_KEYS[filters["sort"]], "0") if keyset else None
+    query = prepare_search(bind=db.get_bind(), page=1, page_size=page_size, cursor=cursor, **filters)
+    return explain_plan(db, query.stmts.page, query.page_params)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="EXPLAIN the common /listings queries and flag full scans/sorts")
+    ap.add_argument("--page-size", type=int, default=24)
+    ap.add_argument("--full-sort", type=float, default=0.5, help="fraction of the table a Sort may not reach")
+    ap.add_argument("--min-rows", type=int, default=50_000, help="refuse to judge plans on smaller tables")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+
+    relations = listing_relations()
+    failures = 0
+    with SessionLocal() as db:
+        table_rows = listing_rows(db)
+        if table_rows < args.min_rows:
+            print(f"{settings.VIEW_OR_TABLE} has ~{int(table_rows):,} rows (< {args.min_rows:,}); plans on a table this "
+                  "small are not representative. Load more data or lower --min-rows.")
+            sys.exit(2)
+
+        for label, case in CASES:
+            for variant in ("first page", "keyset page"):
+                plan = explain_case(db, case, variant == "keyset page", args.page_size)
+                problems = check_plan(plan, relations, table_rows, args.full_sort)
+                failures += bool(problems)
+                status = "FAIL" if problems else "ok"
+                print(f"{status:<4} {label:<22} {variant:<12} cost={plan['Total Cost']:>12,.1f}  {'; '.join(problems)}")
+                if args.verbose:
+                    print(json.dumps(plan, indent=2))
+
+    print(f"\n{failures} failing plan(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Count the SQL statements and compilations behind each /listings request.
+
+    python -m backend.bench.query_counts --requests 50
+    python -m backend.bench.query_counts --requests 50 --cold
+
+--cold empties the schema registry and the statement cache before every
+request, which reproduces the old per-request reflection behaviour.
+Needs DATABASE_URL pointing at a database with the realestate schema.
+"""
+import argparse
+from collections import Counter
+from sqlalchemy import event
+from fastapi.testclient import TestClient
+
+from backend.app import app
+from backend.db import async_engine
+from backend.registry import registry
+from backend.crud import _search_statements
+
+# representative /listings query strings (map panning, filter panel, plain browse)
+QUERIES = [
+    "",
+    "city=krakow",
+    "city=warszawa&min_price=400000&max_price=900000&rooms=3",
+    "city=gdansk&amenities=balcony,elevator&sort=price_asc",
+    "bbox_south=50.0&bbox_west=19.8&bbox_north=50.1&bbox_east=20.0",
+    "lat=52.23&lng=21.01&radius_m=1500&sort=distance_asc",
+    "max_school=500&max_pharmacy=300&sort=m2_desc",
+]
+
+CATALOG_MARKERS = ("pg_catalog", "information_schema", "pg_class", "pg_attribute")
+
+
+def run(n_requests: int, cold: bool) -> Counter:
+    stats: Counter = Counter()
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        kind = "catalog" if any(m in statement for m in CATALOG_MARKERS) else "app"
+        stats[f"{kind}_queries"] += 1
+        if context is not None and getattr(context, "cache_hit", None) == context.dialect.CACHE_MISS:
+            stats["compilations"] += 1
+
+    engine = async_engine.sync_engine  # /listings runs on the async engine
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        with TestClient(app) as client:
+            for i in range(n_requests):
+                if cold:
+                    registry.clear()
+                    _search_statements.cache_clear()
+                resp = client.get(f"/listings?{QUERIES[i % len(QUERIES)]}&count=exact")
+                resp.raise_for_status()
+                stats["requests"] += 1
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    return stats
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--requests", type=int, default=len(QUERIES) * 5)
+    ap.add_argument("--cold", action="store_true")
+    args = ap.parse_args()
+
+    stats = run(args.requests, args.cold)
+    n = stats["requests"] or 1
+    print(f"mode={'cold' if args.cold else 'warm'} requests={stats['requests']}")
+    for key in ("app_queries", "catalog_queries", "compilations"):
+        print(f"  {key:16s} total={stats[key]:6d}  per_request={stats[key] / n:6.2f}")
+
+
+if __name__ == "__main__":
+    main()
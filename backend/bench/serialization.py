@@ -0,0 +1,97 @@
+"""Serialization time per /listings page: ORM + Pydantic path vs tuple + single encode.
+
+    python -m backend.bench.serialization --page-size 100 --repeat 2000
+
+Runs without a database: rows are synthetic, shaped like the page query output.
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from backend.schemas import ListingOut, ListingsResponse
+from backend.serialization import LISTING_FIELDS, encode_listings_page
+
+
+def make_rows(n: int, seed: int = 0) -> list[tuple]:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        values = {
+            "listing_id": f"lst-{i:08d}",
+            "city": rnd.choice(["krakow", "warszawa", "gdansk", "wroclaw"]),
+            "type": rnd.choice(["blockOfFlats", "apartmentBuilding", "tenement"]),
+            "square_m": round(rnd.uniform(25, 120), 1),
+            "rooms": rnd.randint(1, 5),
+            "floor": rnd.randint(0, 10),
+            "floor_count": rnd.randint(2, 12),
+            "build_year": rnd.randint(1900, 2024),
+            "latitude": rnd.uniform(49.9, 54.5),
+            "longitude": rnd.uniform(14.2, 24.1),
+            "price": float(rnd.randint(200_000, 2_000_000)),
+        }
+        row = tuple(
+            values.get(f, rnd.random() < 0.5 if f.startswith("has_") else rnd.uniform(50, 3000))
+            for f in LISTING_FIELDS
+        )
+        rows.append(row + ("2024-06-01",))  # trailing sort_key, as from the page query
+    return rows
+
+
+def make_histories(rows, points: int = 12) -> dict:
+    return {
+        r[0]: [{"date": f"2024-{m:02d}-01", "price": 500_000.0 + m} for m in range(1, points + 1)]
+        for r in rows
+    }
+
+
+def old_path(rows, histories) -> bytes:
+    # ORM entity -> ListingOut -> dict -> mutate -> ListingsResponse validate + dump
+    objs = [SimpleNamespace(**dict(zip(LISTING_FIELDS, r))) for r in rows]
+    items = [ListingOut.model_validate(o).model_dump() for o in objs]
+    for it in items:
+        it["price_history"] = histories.get(it["listing_id"], [])
+    payload = {"items": items, "page": 1, "page_size": len(rows), "total": 10_000}
+    return ListingsResponse.model_validate(payload).model_dump_json().encode()
+
+
+def new_path(rows, histories, columnar: bool = False) -> bytes:
+    return encode_listings_page(
+        rows, page=1, page_size=len(rows), total=10_000, total_is_estimate=False,
+        next_cursor=None, histories=histories, empty_history=[], columnar=columnar,
+    )
+
+
+def timeit(fn, repeat: int) -> float:
+    fn()  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--page-size", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=1000)
+    ap.add_argument("--no-history", action="store_true")
+    args = ap.parse_args()
+
+    rows = make_rows(args.page_size)
+    histories = {} if args.no_history else make_histories(rows)
+    hist = None if args.no_history else histories
+
+    # the ORM objects are built inside old_path: the real path pays for them too
+    results = {
+        "orm+pydantic": timeit(lambda: old_path(rows, histories), args.repeat),
+        "tuples+encode": timeit(lambda: new_path(rows, hist), args.repeat),
+        "columnar": timeit(lambda: new_path(rows, hist, columnar=True), args.repeat),
+    }
+    base = results["orm+pydantic"]
+    print(f"page_size={args.page_size} history={'no' if args.no_history else 'yes'}")
+    for name, sec in results.items():
+        print(f"  {name:14s} {sec * 1e3:8.3f} ms/page  x{base / sec:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
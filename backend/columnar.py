@@ -0,0 +1,290 @@
+"""Optional in-memory columnar search engine over the latest listings.
+
+With USE_COLUMNAR_ENGINE=True the Listing view is loaded into NumPy arrays at
+startup and /listings filters are evaluated as vectorized boolean masks instead
+of SQL. bbox and radius filters use a lat/lon grid index, so geo search works
+without PostGIS too. The engine reloads in the background when a new snapshot
+is detected and swaps the index in one assignment; the SQL path in crud stays
+the fallback (and the reference, see backend/bench/oracle.py).
+"""
+import logging
+import math
+import threading
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .crud import (
+    AMENITY_MAP, SORT_KEYS, MIN_PRICE_FLOOR, EARTH_RADIUS_M, LISTING_COLUMNS,
+    SearchResult, decode_cursor, encode_cursor,
+)
+from .models import Listing
+from .serialization import LISTING_FIELDS
+from .settings import settings
+from . import snapshots
+
+log = logging.getLogger(__name__)
+
+GRID_DEG = 0.02  # grid cell edge, ~2 km at Polish latitudes
+_NX = int(math.ceil(360 / GRID_DEG))
+
+# filter name -> (column, comparison); NaN (SQL NULL) never matches, like in SQL
+RANGE_FILTERS = {
+    "min_m2": ("square_m", np.greater_equal),
+    "max_m2": ("square_m", np.less_equal),
+    "min_price": ("price", np.greater_equal),
+    "max_price": ("price", np.less_equal),
+    "rooms": ("rooms", np.equal),
+    "max_school": ("school_distance", np.less_equal),
+    "max_clinic": ("clinic_distance", np.less_equal),
+    "max_post_office": ("post_office_distance", np.less_equal),
+    "max_restaurant": ("restaurant_distance", np.less_equal),
+    "max_college": ("college_distance", np.less_equal),
+    "max_pharmacy": ("pharmacy_distance", np.less_equal),
+    "max_kindergarten": ("kindergarten_distance", np.less_equal),
+}
+
+NUMERIC_COLUMNS = sorted({col for col, _ in RANGE_FILTERS.values()} | {"latitude", "longitude"})
+
+
+def _float_array(values) -> np.ndarray:
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def _codes(values) -> tuple[np.ndarray, dict]:
+    """Dictionary-encode values; None gets -1."""
+    lookup: dict = {}
+    codes = np.fromiter(
+        (-1 if v is None else lookup.setdefault(v, len(lookup)) for v in values),
+        dtype=np.int32, count=len(values),
+    )
+    return codes, lookup
+
+
+def _haversine_m(lat, lng, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    dlat = np.radians(lats - lat)
+    dlng = np.radians(lngs - lng)
+    a = np.sin(dlat / 2) ** 2 + math.cos(math.radians(lat)) * np.cos(np.radians(lats)) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+class ColumnarIndex:
+    def __init__(self, rows: list[tuple], snapshot_dates: list):
+        self.rows = rows
+        self.n = n = len(rows)
+        cols = dict(zip(LISTING_FIELDS, zip(*rows))) if rows else {f: () for f in LISTING_FIELDS}
+
+        self.num = {f: _float_array(cols[f]) for f in NUMERIC_COLUMNS}
+        self.flags = {a: np.array([v is True for v in cols[col.key]], dtype=bool) for a, col in AMENITY_MAP.items()}
+        self.city, self.city_lookup = _codes([c.lower() if c else None for c in cols["city"]])
+        self.type, self.type_lookup = _codes(list(cols["type"]))
+
+        # listing_id tie-breaker as an integer rank in string order
+        ids = np.array(cols["listing_id"], dtype=object)
+        order = np.argsort(ids.astype(str), kind="stable")
+        self.sorted_ids = ids[order].astype(str)
+        self.id_rank = np.empty(n, dtype=np.int64)
+        self.id_rank[order] = np.arange(n)
+
+        # sort keys, matching SORT_KEYS: recent = coalesce(snapshot_date, '1970-01-01')
+        self.recent_str = [str(d) if d is not None else "1970-01-01" for d in snapshot_dates]
+        self.keys = {
+            "price_asc": self.num["price"],
+            "m2_asc": np.where(np.isnan(self.num["square_m"]), np.inf, self.num["square_m"]),
+            "recent": np.array(self.recent_str, dtype="datetime64[D]").astype(np.int64),
+        }
+        self.keys["price_desc"] = self.keys["price_asc"]
+        self.keys["m2_desc"] = self.keys["m2_asc"]
+
+        # grid index: listing positions sorted by cell id
+        lat, lng = self.num["latitude"], self.num["longitude"]
+        located = ~(np.isnan(lat) | np.isnan(lng))
+        cell = np.full(n, -1, dtype=np.int64)
+        cy = np.floor((lat[located] + 90) / GRID_DEG).astype(np.int64)
+        cx = np.floor((lng[located] + 180) / GRID_DEG).astype(np.int64)
+        cell[located] = cy * _NX + cx
+        self.grid_order = np.argsort(cell, kind="stable")
+        self.grid_cells = cell[self.grid_order]
+
+    @classmethod
+    def load(cls, db: Session) -> "ColumnarIndex":
+        res = db.execute(select(*LISTING_COLUMNS, Listing.snapshot_date))
+        rows, dates = [], []
+        for r in res:
+            rows.append(tuple(r[:-1]))
+            dates.append(r[-1])
+        return cls(rows, dates)
+
+    # -- geo --------------------------------------------------------------
+
+    def _cells_in(self, south, west, north, east) -> np.ndarray:
+        """Positions of listings in grid cells overlapping the box (a superset)."""
+        cy0, cy1 = int((south + 90) // GRID_DEG), int((north + 90) // GRID_DEG)
+        cx0, cx1 = int((west + 180) // GRID_DEG), int((east + 180) // GRID_DEG)
+        parts = []
+        for cy in range(cy0, cy1 + 1):
+            lo = np.searchsorted(self.grid_cells, cy * _NX + cx0, side="left")
+            hi = np.searchsorted(self.grid_cells, cy * _NX + cx1, side="right")
+            if hi > lo:
+                parts.append(self.grid_order[lo:hi])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def _geo(self, f: dict) -> tuple[np.ndarray | None, np.ndarray | None]:
+        """(candidate positions or None for all, distances aligned with them or None)."""
+        bbox = (f.get("bbox_south"), f.get("bbox_west"), f.get("bbox_north"), f.get("bbox_east"))
+        lat, lng, radius_m = f.get("lat"), f.get("lng"), f.get("radius_m")
+        use_bbox, use_radius = None not in bbox, None not in (lat, lng, radius_m)
+        if not (use_bbox or use_radius):
+            return None, None
+
+        if use_radius:
+            dlat = radius_m / 111_195.0
+            dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+            box = (lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+            if use_bbox:
+                box = (max(box[0], bbox[0]), max(box[1], bbox[1]), min(box[2], bbox[2]), min(box[3], bbox[3]))
+        else:
+            box = bbox
+
+        idx = self._cells_in(*box)
+        lats, lngs = self.num["latitude"][idx], self.num["longitude"][idx]
+        keep = np.ones(len(idx), dtype=bool)
+        if use_bbox:
+            keep &= (lats >= bbox[0]) & (lats <= bbox[2]) & (lngs >= bbox[1]) & (lngs <= bbox[3])
+        dist = None
+        if use_radius:
+            dist = _haversine_m(lat, lng, lats, lngs)
+            keep &= dist <= radius_m
+            dist = dist[keep]
+        return idx[keep], dist
+
+    # -- search -----------------------------------------------------------
+
+    def _mask(self, idx: np.ndarray | None, f: dict) -> np.ndarray:
+        def col(a):
+            return a if idx is None else a[idx]
+
+        size = self.n if idx is None else len(idx)
+        mask = np.ones(size, dtype=bool)
+        if f.get("city"):
+            code = self.city_lookup.get(f["city"].lower(), -2)
+            mask &= col(self.city) == code
+        if f.get("type_"):
+            code = self.type_lookup.get(f["type_"], -2)
+            mask &= col(self.type) == code
+        for name, (column, op) in RANGE_FILTERS.items():
+            value = f.get(name)
+            if value is not None:
+                mask &= op(col(self.num[column]), value)
+        for a in f.get("amenities") or []:
+            if a in self.flags:
+                mask &= col(self.flags[a])
+        return mask
+
+    def search(self, *, page: int, page_size: int, sort: str | None, cursor: str | None = None,
+               count_mode: str | None = None, **f) -> SearchResult:
+        """Same contract as crud.search_listings; totals are always exact."""
+        f["min_price"] = max(MIN_PRICE_FLOOR, float(f.get("min_price") or 0.0))
+
+        idx, dist = self._geo(f)
+        mask = self._mask(idx, f)
+        sel = np.flatnonzero(mask) if idx is None else idx[mask]
+        total = len(sel)
+
+        if sort == "distance_asc" and dist is not None:
+            sort_name, key, desc = sort, dist[mask], False
+        else:
+            sort_name = sort if sort in SORT_KEYS else "recent"
+            key, desc = self.keys[sort_name][sel], SORT_KEYS[sort_name][1] == "desc"
+        rank = self.id_rank[sel]
+
+        offset = (page - 1) * page_size
+        if cursor:
+            cursor_sort, after_key, after_id = decode_cursor(cursor)
+            if cursor_sort != sort_name:
+                raise ValueError("cursor was issued for a different sort")
+            if sort_name == "recent":
+                after_key = np.datetime64(after_key, "D").astype(np.int64)
+            after_rank = np.searchsorted(self.sorted_ids, after_id, side="left")
+            exact = after_rank < self.n and self.sorted_ids[after_rank] == after_id
+            if desc:
+                after = (key < after_key) | ((key == after_key) & (rank < after_rank))
+            else:
+                # a vanished after_id still sorts between its neighbours
+                after = (key > after_key) | ((key == after_key) & (rank >= after_rank + exact))
+            sel, key, rank = sel[after], key[after], rank[after]
+            offset = 0
+
+        order = self._top(key, rank, offset + page_size + 1, desc)[offset:]
+        page_pos = order[:page_size]
+
+        keys_out = key[page_pos]
+        rows = []
+        for pos, k in zip(page_pos, keys_out):
+            i = sel[pos]
+            sort_key = self.recent_str[i] if sort_name == "recent" else float(k)
+            rows.append(self.rows[i] + (sort_key,))
+
+        next_cursor = None
+        if len(order) > page_size:
+            last = rows[-1]
+            next_cursor = encode_cursor(sort_name, last[-1], last[LISTING_FIELDS.index("listing_id")])
+        return SearchResult(rows, total, False, next_cursor)
+
+    @staticmethod
+    def _top(key: np.ndarray, rank: np.ndarray, need: int, desc: bool) -> np.ndarray:
+        """Positions of the first `need` rows by (key, rank), via argpartition + a small sort."""
+        k = -key if desc else key
+        r = -rank if desc else rank
+        keep = np.arange(len(k))
+        if len(k) > need:
+            cut = k[np.argpartition(k, need - 1)[need - 1]]
+            below = np.flatnonzero(k < cut)
+            # rows tied with the cut-off key compete on the tie-breaker; partition
+            # those too, since one snapshot date can tie most of the table
+            ties = np.flatnonzero(k == cut)
+            room = need - len(below)
+            if len(ties) > room:
+                ties = ties[np.argpartition(r[ties], room - 1)[:room]]
+            keep = np.concatenate([below, ties])
+        return keep[np.lexsort((r[keep], k[keep]))][:need]
+
+
+class ColumnarEngine:
+    """Holds the current ColumnarIndex; reload() builds a new one and swaps it in."""
+
+    def __init__(self):
+        self.index: ColumnarIndex | None = None
+        self._reload_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.index is not None
+
+    def reload(self) -> None:
+        from .db import ReadSessionLocal
+
+        if not self._reload_lock.acquire(blocking=False):
+            return  # a reload is already running
+        try:
+            with ReadSessionLocal() as db:
+                index = ColumnarIndex.load(db)
+            self.index = index
+            log.info("columnar engine loaded %d listings", index.n)
+        finally:
+            self._reload_lock.release()
+
+    def reload_in_background(self) -> None:
+        threading.Thread(target=self.reload, name="columnar-reload", daemon=True).start()
+
+    def search(self, **filters) -> SearchResult:
+        return self.index.search(**filters)
+
+
+engine = ColumnarEngine()
+
+
+@snapshots.subscribe
+def _reload_on_snapshot(_snapshot_date) -> None:
+    if settings.USE_COLUMNAR_ENGINE:
+        engine.reload_in_background()
@@ -0,0 +1,97 @@
+"""Total-count strategies for /listings: exact, cached per filter signature, or planner estimate."""
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from .settings import settings
+from . import snapshots
+
+COUNT_MODES = ("exact", "cached", "estimate")
+
+
+class CountCache:
+    """Small thread-safe LRU of filter signature -> exact total."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value: int) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+count_cache = CountCache(settings.COUNT_CACHE_SIZE)
+
+
+@snapshots.subscribe
+def _invalidate_counts(_snapshot_date) -> None:
+    count_cache.clear()
+
+
+def count_statement(stmt):
+    """select count(*) over the filtered, unpaginated stmt."""
+    return select(func.count()).select_from(stmt.subquery())
+
+
+def exact_count(db: Session, count_stmt, params: dict) -> int:
+    return db.execute(count_stmt, params).scalar_one()
+
+
+@lru_cache(maxsize=512)
+def _explain_sql(stmt, dialect):
+    compiled = stmt.compile(dialect=dialect)
+    return f"EXPLAIN (FORMAT JSON) {compiled}", compiled
+
+
+def explain_plan(db: Session, stmt, params: dict) -> dict:
+    """Top plan node of EXPLAIN (FORMAT JSON) for stmt with params bound; nothing is executed."""
+    sql, compiled = _explain_sql(stmt, db.get_bind().dialect)
+    bound = compiled.construct_params(params)
+    if compiled.positional:
+        bound = tuple(bound[name] for name in compiled.positiontup)
+    plan = db.connection().exec_driver_sql(sql, bound).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def estimate_count(db: Session, stmt, params: dict) -> int:
+    """Row estimate of the planner for stmt."""
+    return int(explain_plan(db, stmt, params)["Plan Rows"])
+
+
+def count_total(db: Session, stmts, params: dict, mode: str, signature: tuple) -> tuple[int, bool]:
+    """Return (total, is_estimate) for the filtered search described by stmts.base/stmts.count."""
+    if mode == "estimate":
+        estimate = estimate_count(db, stmts.base, params)
+        # small results are cheap to count and the planner is least accurate there
+        if estimate >= settings.ESTIMATE_EXACT_BELOW:
+            return estimate, True
+        return exact_count(db, stmts.count, params), False
+
+    if mode == "cached":
+        total = count_cache.get(signature)
+        if total is None:
+            total = exact_count(db, stmts.count, params)
+            count_cache.put(signature, total)
+        return total, False
+
+    return exact_count(db, stmts.count, params), False
@@ -1,8 +1,25 @@
-from sqlalchemy import select, and_, or_, func, MetaData, Table
+import asyncio
+import base64
+import json
+import math
+from datetime import date
+from functools import lru_cache
+from sqlalchemy import select, and_, or_, func, tuple_, bindparam, literal_column, Float
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
-from typing import Sequence, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import NamedTuple, Sequence, Tuple
 from .models import Listing
 from .settings import settings
+from .counts import count_statement, count_total
+from .registry import registry
+from .history import fetch_price_histories
+from .accessibility import accessibility, score_expression
+from .opinion_models.opinion import OpinionSummary
+from .serialization import LISTING_FIELDS
+from .db import ReadAsyncSessionLocal
+from .instrumentation import span, annotate
+from . import snapshots
 
 
 AMENITY_MAP = {
@@ -14,12 +31,39 @@ AMENITY_MAP = {
 }
 
 
+# sort name -> (key expression, direction). Keys must be non-null so they can be
+# compared in a keyset predicate: price is always >= MIN_PRICE_FLOOR, square_m is
+# coalesced to +inf which keeps Postgres' default NULLS LAST / NULLS FIRST order.
+# The coalesce defaults are SQL literals, not bound values, so the expressions
+# match the indexes in migrations/0002_search_sort_keys.sql under every driver.
+M2_KEY = func.coalesce(Listing.square_m, literal_column("'Infinity'::float8", Float()))
+RECENT_KEY = func.coalesce(Listing.snapshot_date, literal_column("'1970-01-01'::date", Listing.snapshot_date.type))
+
+SORT_KEYS = {
+    "price_asc": (Listing.price, "asc"),
+    "price_desc": (Listing.price, "desc"),
+    "m2_asc": (M2_KEY, "asc"),
+    "m2_desc": (M2_KEY, "desc"),
+    "recent": (RECENT_KEY, "desc"),
+}
+
+
+# sort=opinion_<score>: best average first; listings without opinions sort last
+OPINION_SORTS = {
+    f"opinion_{c}": func.coalesce(getattr(OpinionSummary, f"avg_{c}"), 0.0)
+    for c in ("overall", "cleanliness", "safety", "parking", "noise", "transit_access", "sunlight")
+}
+
+# attached after sort_key when include_opinions is set (see serialization.SUMMARY_FIELDS)
+OPINION_SUMMARY_COLUMNS = (
+    OpinionSummary.n_opinions, OpinionSummary.avg_cleanliness, OpinionSummary.avg_safety,
+    OpinionSummary.avg_parking, OpinionSummary.avg_noise, OpinionSummary.avg_transit_access,
+    OpinionSummary.avg_sunlight, OpinionSummary.avg_overall,
+)
+
 SORT_MAP = {
-    "price_asc": Listing.price.asc(),
-    "price_desc": Listing.price.desc(),
-    "m2_asc": Listing.square_m.asc(),
-    "m2_desc": Listing.square_m.desc(),
-    "recent": func.coalesce(Listing.snapshot_date, "1970-01-01").desc(),
+    name: (key.asc() if direction == "asc" else key.desc())
+    for name, (key, direction) in SORT_KEYS.items()
 }
 
 
@@ -72,54 +116,56 @@ def build_filters(
     
     return and_(*conds) if conds else None
 
-def fetch_price_histories(db, listing_ids: list[str]) -> dict[str, list[dict]]:
-    """Fetch price histories for listing_ids and sort them by snapshot_date in Python."""
-    if not listing_ids:
-        return {}
-
-    meta = MetaData(schema="realestate")
-    fact = Table("fact_listings", meta, autoload_with=db.bind)
-
-    q = (
-        select(
-            fact.c.listing_id,
-            func.json_agg(
-                func.json_build_object(
-                    "date", fact.c.snapshot_date,
-                    "price", fact.c.price
-                )
-            ).label("hist")
-        )
-        .where(fact.c.listing_id.in_(listing_ids))
-        .group_by(fact.c.listing_id)
-    )
-
-    rows = db.execute(q).all()
-
-    out: dict[str, list[dict]] = {}
-    for lid, hist in rows:
-        # hist is a Python list of dicts (date, price) or None
-        seq = hist or []
-        # Sort by "date" key ascending (YYYY-MM-DD strings sort correctly)
-        seq.sort(key=lambda d: d.get("date"))
-        out[lid] = seq
-    return out
+def encode_cursor(sort: str, key, listing_id: str) -> str:
+    """Opaque keyset cursor: the sort it belongs to plus the last row's (key, listing_id)."""
+    raw = json.dumps([sort, key, listing_id], separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[str, object, str]:
+    """(sort, key, listing_id); the key of sort=recent comes back as a date, which
+    the keyset predicate binds against the date column."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort, key, listing_id = json.loads(raw)
+        if sort == "recent":
+            key = date.fromisoformat(key)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(sort, str) or not isinstance(listing_id, str):
+        raise ValueError("invalid cursor")
+    return sort, key, listing_id
+
+def filter_signature(**filters) -> tuple:
+    """Normalized, hashable form of the active filters: order, case and duplicates don't matter."""
+    sig = []
+    for name, value in sorted(filters.items()):
+        if value is None or value == []:
+            continue
+        if name == "city":
+            value = value.strip().lower()
+        elif name == "amenities":
+            value = tuple(sorted({a for a in value if a in AMENITY_MAP}))
+            if not value:
+                continue
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        sig.append((name, value))
+    return tuple(sig)
 
 def reflect_fact_table(db: Session):
-    meta = MetaData(schema=settings.SCHEMA)
-    fact = Table("fact_listings", meta, autoload_with=db.bind)
-    return fact
+    return registry.table("fact_listings", db.get_bind())
 
 def apply_bbox_filter(q, fact, south, west, north, east):
     """Use PostGIS ST_Intersects against an envelope; falls back to lat/lon if geom missing."""
-    if None in (south, west, north, east):
+    # identity checks: the cached templates pass bindparams, and `in` would compare them with ==
+    if any(v is None for v in (south, west, north, east)):
         return q
     envelope = func.ST_MakeEnvelope(west, south, east, north, 4326)
     return q.where(func.ST_Intersects(fact.c.geom, envelope))
 
 def apply_radius_filter(q, fact, lat, lng, radius_m):
     """Filter within radius_m meters of (lat, lng). Returns (query, distance_expr or None)."""
-    if None in (lat, lng, radius_m):
+    if any(v is None for v in (lat, lng, radius_m)):
         return q, None
     user_pt = func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326)  # SRID 4326
     # geography distance in meters (geom is geography)
@@ -127,11 +173,167 @@ def apply_radius_filter(q, fact, lat, lng, radius_m):
     q = q.where(func.ST_DWithin(fact.c.geom, user_pt, radius_m))
     return q, dist
 
+EARTH_RADIUS_M = 6_371_008.8
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters as a SQL expression (no PostGIS needed)."""
+    dlat = func.radians(lat2 - lat1)
+    dlng = func.radians(lng2 - lng1)
+    a = func.power(func.sin(dlat / 2), 2) + func.cos(func.radians(lat1)) * func.cos(func.radians(lat2)) * func.power(func.sin(dlng / 2), 2)
+    return 2 * EARTH_RADIUS_M * func.asin(func.sqrt(a))
+
+def apply_latlon_bbox_filter(q, south, west, north, east):
+    """bbox on the plain latitude/longitude columns, for USE_POSTGIS=False."""
+    return q.where(Listing.latitude.between(south, north), Listing.longitude.between(west, east))
+
+def apply_latlon_radius_filter(q, lat, lng, radius_m):
+    """Radius on latitude/longitude via haversine. Returns (query, distance_expr)."""
+    dist = haversine_m(lat, lng, Listing.latitude, Listing.longitude)
+    # a latitude band first keeps the trigonometry off rows that can't match
+    band = radius_m / 111_195.0
+    q = q.where(Listing.latitude.between(lat - band, lat + band), dist <= radius_m)
+    return q, dist
+
 MIN_PRICE_FLOOR = 10_000.0
 
-def search_listings(
-    db: Session,
+# filter name -> condition on a bound parameter of the same name; the cached
+# statement templates below are built from these.
+FILTER_TEMPLATES = {
+    "city": lambda p: func.lower(Listing.city) == p,
+    "type_": lambda p: Listing.type == p,
+    "min_m2": lambda p: Listing.square_m >= p,
+    "max_m2": lambda p: Listing.square_m <= p,
+    "min_price": lambda p: Listing.price >= p,
+    "max_price": lambda p: Listing.price <= p,
+    "rooms": lambda p: Listing.rooms == p,
+    "max_school": lambda p: Listing.school_distance <= p,
+    "max_clinic": lambda p: Listing.clinic_distance <= p,
+    "max_post_office": lambda p: Listing.post_office_distance <= p,
+    "max_restaurant": lambda p: Listing.restaurant_distance <= p,
+    "max_college": lambda p: Listing.college_distance <= p,
+    "max_pharmacy": lambda p: Listing.pharmacy_distance <= p,
+    "max_kindergarten": lambda p: Listing.kindergarten_distance <= p,
+}
+
+# plain columns in LISTING_FIELDS order: pages come back as tuples, not ORM entities
+LISTING_COLUMNS = tuple(getattr(Listing, f) for f in LISTING_FIELDS)
+
+class SearchResult(NamedTuple):
+    rows: Sequence[Row]  # LISTING_FIELDS values, sort_key, then OPINION_SUMMARY_COLUMNS if included
+    total: int
+    total_is_estimate: bool
+    next_cursor: str | None
+
+class SearchStatements(NamedTuple):
+    base: object       # filtered, unordered select (count / estimate input)
+    count: object      # select count(*) over base
+    page: object       # ordered page select with (*LISTING_COLUMNS, sort_key) rows
+    direction: str
+    ordered: object    # every match in page order, no limit (bulk export)
+
+@lru_cache(maxsize=512)
+def _search_statements(shape: tuple) -> SearchStatements:
+    """Build the statements for one combination of active filters.
+
+    Every value is a bindparam, so a shape is built once per process and its
+    SQL compiled once (SQLAlchemy's compiled cache is keyed on statement
+    structure, which is identical on every reuse).
+    """
+    active, amenities, use_bbox, use_radius, access, attach_opinions, sort_name, keyset, _registry_version = shape
+
+    base = select(*LISTING_COLUMNS)
+    conds = [FILTER_TEMPLATES[name](bindparam(name)) for name in active]
+    conds += [AMENITY_MAP[a].is_(True) for a in amenities]
+    if conds:
+        base = base.where(and_(*conds))
+
+    distance_expr = None
+    if (use_bbox or use_radius) and not settings.USE_POSTGIS:
+        if use_bbox:
+            base = apply_latlon_bbox_filter(
+                base,
+                bindparam("bbox_south"), bindparam("bbox_west"),
+                bindparam("bbox_north"), bindparam("bbox_east"),
+            )
+        if use_radius:
+            base, distance_expr = apply_latlon_radius_filter(
+                base, bindparam("lat"), bindparam("lng"), bindparam("radius_m")
+            )
+    elif use_bbox or use_radius:
+        fact = registry.table("fact_listings")
+        # match the listing's own snapshot row: joining on listing_id alone repeats
+        # each listing once per snapshot in its history
+        base = base.join(fact, and_(fact.c.listing_id == Listing.listing_id,
+                                    fact.c.snapshot_date == Listing.snapshot_date))
+        if use_bbox:
+            base = apply_bbox_filter(
+                base, fact,
+                bindparam("bbox_south"), bindparam("bbox_west"),
+                bindparam("bbox_north"), bindparam("bbox_east"),
+            )
+        if use_radius:
+            base, distance_expr = apply_radius_filter(
+                base, fact, bindparam("lat"), bindparam("lng"), bindparam("radius_m")
+            )
+
+    # Accessibility: precomputed per-city ranks, one primary-key join. Every listing
+    # has a row, so an inner join drops nothing and sort=accessibility can walk
+    # ix_listing_accessibility_score instead of sorting the whole relation.
+    score_expr = None
+    if access is not None:
+        with_min, custom_weights = access
+        base = base.join(accessibility, accessibility.c.listing_id == Listing.listing_id)
+        score_expr = score_expression(custom_weights)
+        if with_min:
+            base = base.where(score_expr >= bindparam("min_accessibility", type_=Float()))
+
+    # Sorting: every order ends with listing_id so it is total and keyset-safe
+    if sort_name == "distance_asc":
+        sort_key, direction = distance_expr, "asc"
+    elif sort_name == "accessibility":
+        sort_key, direction = score_expr, "desc"
+    elif sort_name in OPINION_SORTS:
+        sort_key, direction = OPINION_SORTS[sort_name], "desc"
+    else:
+        sort_key, direction = SORT_KEYS[sort_name]
+    if direction == "asc":
+        order_clause = (sort_key.asc(), Listing.listing_id.asc())
+    else:
+        order_clause = (sort_key.desc(), Listing.listing_id.desc())
+
+    # opinion summaries only touch the page: the count never needs the join
+    page = base
+    if attach_opinions or sort_name in OPINION_SORTS:
+        page = page.outerjoin(OpinionSummary, OpinionSummary.listing_id == Listing.listing_id)
+    page = page.add_columns(sort_key.label("sort_key"))
+    ordered = base.add_columns(sort_key.label("sort_key")).order_by(*order_clause)
+    if attach_opinions:
+        page = page.add_columns(*OPINION_SUMMARY_COLUMNS)
+    page = page.order_by(*order_clause)
+    if keyset:
+        position = tuple_(sort_key, Listing.listing_id)
+        numeric = sort_name in ("distance_asc", "accessibility") or sort_name in OPINION_SORTS
+        key_type = Float() if numeric else sort_key.type
+        after = tuple_(bindparam("after_key", type_=key_type), bindparam("after_id"))
+        page = page.where(position > after if direction == "asc" else position < after)
+    else:
+        page = page.offset(bindparam("offset"))
+    page = page.limit(bindparam("limit"))
+
+    return SearchStatements(base, count_statement(base), page, direction, ordered)
+
+class SearchQuery(NamedTuple):
+    stmts: SearchStatements
+    params: dict          # filter values, shared by count and page statements
+    page_params: dict     # params plus limit and offset / keyset position
+    sort_name: str
+    page_size: int
+    signature: tuple
+    count_mode: str
+
+def prepare_search(
     *,
+    bind=None,
     city: str | None,
     type_: str | None,
     min_m2: float | None,
@@ -143,6 +345,8 @@ def search_listings(
     page: int,
     page_size: int,
     sort: str | None,
+    cursor: str | None = None,
+    count_mode: str | None = None,
 
     # NEW geo params
     bbox_south: float | None = None,
@@ -161,74 +365,252 @@ def search_listings(
     max_pharmacy: float | None = None,
     max_kindergarten: float | None = None,
 
+    # accessibility score: 0..100, weights as returned by accessibility.parse_weights
+    min_accessibility: float | None = None,
+    access_weights: dict[str, float] | None = None,
+
+    # per-listing opinion averages appended to each row (after sort_key)
+    include_opinions: bool = False,
 ):
-    # Base: select from v_latest_listings
-    base = select(Listing)
-    params: dict[str, object] = {}
+    """Resolve search parameters into cached statements plus bound values; no I/O
+    unless a geo filter needs the registry loaded through bind."""
     effective_min_price = max(MIN_PRICE_FLOOR, float(min_price or 0.0))
 
-    # Build attribute filters 
-    filters = build_filters(city, type_, min_m2, max_m2, min_price=effective_min_price, max_price=max_price, rooms=rooms, amenities=amenities)
-    if filters is not None:
-        base = base.where(filters)
+    # Attribute filters: name -> bound value (same names as FILTER_TEMPLATES)
+    values = {
+        "city": city.lower() if city else None,  # exact; swap to ilike for partial
+        "type_": type_ or None,
+        "min_m2": min_m2,
+        "max_m2": max_m2,
+        "min_price": effective_min_price,
+        "max_price": max_price,
+        "rooms": rooms,
+        "max_school": max_school,
+        "max_clinic": max_clinic,
+        "max_post_office": max_post_office,
+        "max_restaurant": max_restaurant,
+        "max_college": max_college,
+        "max_pharmacy": max_pharmacy,
+        "max_kindergarten": max_kindergarten,
+    }
+    params: dict[str, object] = {k: v for k, v in values.items() if v is not None}
+    amenity_flags = tuple(sorted({a for a in amenities or [] if a in AMENITY_MAP}))
 
     # Geo
-    distance_expr = None
-    if settings.USE_POSTGIS and any(v is not None for v in (bbox_south, bbox_west, bbox_north, bbox_east, lat, lng, radius_m)):
-        fact = reflect_fact_table(db)
-        # join on listing_id
-        base = base.join(fact, fact.c.listing_id == Listing.listing_id)
-
-        # bbox
-        if None not in (bbox_south, bbox_west, bbox_north, bbox_east):
-            base = apply_bbox_filter(base, fact, bbox_south, bbox_west, bbox_north, bbox_east)
-
-        # radius
-        if None not in (lat, lng, radius_m):
-            base, distance_expr = apply_radius_filter(base, fact, lat, lng, radius_m)
-            
-
-
-
-    # POI distance filters (adjust names if your columns differ)
-    if max_school is not None:
-        filters.append("school_distance <= :max_school")
-        params["max_school"] = max_school
-    if max_clinic is not None:
-        filters.append("clinic_distance <= :max_clinic")
-        params["max_clinic"] = max_clinic
-    if max_post_office is not None:
-        filters.append("post_office_distance <= :max_post_office")
-        params["max_post_office"] = max_post_office
-    if max_restaurant is not None:
-        filters.append("restaurant_distance <= :max_restaurant")
-        params["max_restaurant"] = max_restaurant
-    if max_college is not None:
-        filters.append("college_distance <= :max_college")
-        params["max_college"] = max_college
-    if max_pharmacy is not None:
-        filters.append("pharmacy_distance <= :max_pharmacy")
-        params["max_pharmacy"] = max_pharmacy
-    if max_kindergarten is not None:
-        filters.append("kindergarten_distance <= :max_kindergarten")
-        params["max_kindergarten"] = max_kindergarten
-
-    # Count total (wrap the selectable)
-    total = db.execute(select(func.count()).select_from(base.subquery())).scalar_one()
-
-    # Sorting
-    if sort == "distance_asc" and distance_expr is not None:
-        order_clause = distance_expr.asc()
+    use_bbox = None not in (bbox_south, bbox_west, bbox_north, bbox_east)
+    use_radius = None not in (lat, lng, radius_m)
+    geo: dict[str, object] = {}
+    if use_bbox:
+        geo.update(bbox_south=bbox_south, bbox_west=bbox_west, bbox_north=bbox_north, bbox_east=bbox_east)
+    if use_radius:
+        geo.update(lat=lat, lng=lng, radius_m=radius_m)
+    if (use_bbox or use_radius) and settings.USE_POSTGIS and bind is not None:
+        registry.load(bind)
+
+    if sort == "distance_asc" and use_radius:
+        sort_name = sort
+    elif sort == "accessibility" or sort in OPINION_SORTS:
+        sort_name = sort
     else:
-        order_clause = SORT_MAP.get(sort or "", SORT_MAP["recent"])
-
-    rows = (
-        db.execute(
-            base.order_by(order_clause)
-                .offset((page - 1) * page_size)
-                .limit(page_size)
-        ).scalars().all()
+        sort_name = sort if sort in SORT_KEYS else "recent"
+
+    # the score only joins in when it is filtered or sorted on; custom weights are
+    # bound values, default weights read the stored (indexed) default_score
+    access = None
+    if min_accessibility is not None or sort_name == "accessibility":
+        access = (min_accessibility is not None, access_weights is not None)
+
+    shape = (tuple(sorted(params)), amenity_flags, use_bbox, use_radius, access, bool(include_opinions),
+             sort_name, bool(cursor), registry.version)
+    stmts = _search_statements(shape)
+    params.update(geo)
+    if access is not None:
+        if min_accessibility is not None:
+            params["min_accessibility"] = float(min_accessibility)
+        if access_weights is not None:
+            params.update(access_weights)
+
+    signature = filter_signature(amenities=list(amenity_flags), **params)
+
+    page_params = dict(params, limit=page_size + 1)  # one extra row tells us whether there is a next page
+    if cursor:
+        cursor_sort, after_key, after_id = decode_cursor(cursor)
+        if cursor_sort != sort_name:
+            raise ValueError("cursor was issued for a different sort")
+        page_params.update(after_key=after_key, after_id=after_id)
+    else:
+        page_params["offset"] = (page - 1) * page_size
+
+    return SearchQuery(stmts, params, page_params, sort_name, page_size, signature,
+                       count_mode or settings.COUNT_MODE)
+
+def count_search(db: Session, query: SearchQuery) -> tuple[int, bool]:
+    if query.count_mode == "cached":
+        snapshots.watch(db)
+    return count_total(db, query.stmts, query.params, query.count_mode, query.signature)
+
+def page_result(query: SearchQuery, fetched, total: int, total_is_estimate: bool) -> SearchResult:
+    """Trim the page_size + 1 fetched rows and derive next_cursor from the last kept row."""
+    rows = fetched[:query.page_size]
+
+    next_cursor = None
+    if len(fetched) > query.page_size:
+        last = fetched[query.page_size - 1]
+        next_cursor = encode_cursor(query.sort_name, last.sort_key, last.listing_id)
+
+    return SearchResult(rows, total, total_is_estimate, next_cursor)
+
+def search_listings(db: Session, **filters) -> SearchResult:
+    """Run a listing search; filters are the keyword arguments of prepare_search."""
+    query = prepare_search(bind=db.get_bind(), **filters)
+    total, total_is_estimate = count_search(db, query)
+    fetched = db.execute(query.stmts.page, query.page_params).all()
+    return page_result(query, fetched, total, total_is_estimate)
+
+async def search_listings_async(
+    db: AsyncSession, *, with_histories: bool = False, columnar_history: bool = False, **filters
+) -> tuple[SearchResult, dict]:
+    """Async search: the count runs on its own session, concurrently with the page
+    query and (with_histories) the price-history lookup for the page's ids.
+    With USE_COLUMNAR_ENGINE and a loaded index, filtering happens in memory."""
+    # the in-memory index has no accessibility or opinion data
+    needs_sql = (
+        filters.get("sort") == "accessibility" or filters.get("sort") in OPINION_SORTS
+        or filters.get("min_accessibility") is not None or filters.get("include_opinions")
+    )
+    if settings.USE_COLUMNAR_ENGINE and not needs_sql:
+        from .columnar import engine as columnar_engine  # columnar imports this module
+
+        if columnar_engine.ready:
+            with span("columnar"):
+                result = await asyncio.to_thread(columnar_engine.search, **filters)
+            histories: dict = {}
+            if with_histories:
+                ids = [r[LISTING_FIELDS.index("listing_id")] for r in result.rows]
+                with span("histories"):
+                    histories = await db.run_sync(fetch_price_histories, ids, columnar_history)
+            return result, histories
+
+    if not registry.loaded:
+        with span("reflect"):
+            await db.run_sync(lambda s: registry.load(s.get_bind()))
+    query = prepare_search(**filters)
+    annotate(filters=query.signature)
+
+    async def count():
+        with span("count"):
+            async with ReadAsyncSessionLocal() as count_db:
+                return await count_db.run_sync(count_search, query)
+
+    count_task = asyncio.create_task(count())
+    try:
+        with span("page"):
+            fetched = (await db.execute(query.stmts.page, query.page_params)).all()
+        histories: dict = {}
+        if with_histories:
+            ids = [r.listing_id for r in fetched[:query.page_size]]
+            with span("histories"):
+                histories = await db.run_sync(fetch_price_histories, ids, columnar_history)
+        total, total_is_estimate = await count_task
+    except BaseException:
+        count_task.cancel()
+        raise
+    return page_result(query, fetched, total, total_is_estimate), histories
+
+async def stream_listings_async(
+    *, batch_rows: int, with_histories: bool = False, limit: int | None = None, **filters
+):
+    """Every listing matching filters, in sort order, as (rows, histories) batches of
+    up to batch_rows. Rows come through a server-side cursor (stream_results with
+    yield_per), so memory is bounded by one batch however many rows match.
+    Sessions are opened here, as the caller may outlive its request dependencies."""
+    async with ReadAsyncSessionLocal() as db:
+        if not registry.loaded:
+            await db.run_sync(lambda s: registry.load(s.get_bind()))
+        query = prepare_search(page=1, page_size=1, **filters)
+        annotate(filters=query.signature)
+        stmt = query.stmts.ordered
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        result = await db.stream(stmt.execution_options(yield_per=batch_rows), query.params)
+        async with ReadAsyncSessionLocal() as history_db:
+            async for rows in result.partitions(batch_rows):
+                histories: dict = {}
+                if with_histories:
+                    histories = await history_db.run_sync(fetch_price_histories, [r.listing_id for r in rows])
+                yield rows, histories
+
+# grid cells across one 256 px map tile; 8 gives ~32 px clusters on screen
+CLUSTER_CELLS_PER_TILE = 8
+
+def cluster_cell_size(zoom: int) -> float:
+    """Cluster cell edge in degrees at a web-map zoom level."""
+    return 360.0 / (2 ** zoom) / CLUSTER_CELLS_PER_TILE
+
+def snap_bbox(south: float, west: float, north: float, east: float, step: float) -> tuple[float, float, float, float]:
+    """Grow the box outward to multiples of step."""
+    return (
+        round(math.floor(south / step) * step, 9),
+        round(math.floor(west / step) * step, 9),
+        round(math.ceil(north / step) * step, 9),
+        round(math.ceil(east / step) * step, 9),
     )
 
-
-    return rows, total
\ No newline at end of file
+@lru_cache(maxsize=128)
+def _cluster_statements(base) -> tuple:
+    """(aggregate, raw) statements over a cached filter base, limited to a lat/lon box."""
+    in_view = base.where(
+        Listing.latitude.between(bindparam("south"), bindparam("north")),
+        Listing.longitude.between(bindparam("west"), bindparam("east")),
+    )
+    sub = in_view.subquery()
+    cell = bindparam("cell", type_=Float())
+    agg = (
+        select(
+            func.floor(sub.c.latitude / cell).label("gy"),
+            func.floor(sub.c.longitude / cell).label("gx"),
+            func.count().label("count"),
+            func.avg(sub.c.latitude).label("lat"),
+            func.avg(sub.c.longitude).label("lng"),
+            func.min(sub.c.price).label("price_min"),
+            func.percentile_cont(0.5).within_group(sub.c.price).label("price_median"),
+            func.max(sub.c.price).label("price_max"),
+        )
+        # by position: the cell expressions carry a bind parameter
+        .group_by(literal_column("1"), literal_column("2"))
+    )
+    raw = in_view.order_by(Listing.listing_id).limit(bindparam("limit"))
+    return agg, raw
+
+async def cluster_listings_async(
+    db: AsyncSession, *, bbox: tuple[float, float, float, float], zoom: int, raw_threshold: int, **filters
+) -> dict:
+    """Grid clusters (count, centroid, price min/median/max) for a viewport, in one
+    aggregate query; raw listings instead when at most raw_threshold match."""
+    query = prepare_search(page=1, page_size=1, sort=None, count_mode="exact", **filters)
+    agg, raw = _cluster_statements(query.stmts.base)
+    south, west, north, east = bbox
+    cell = cluster_cell_size(zoom)
+    params = dict(query.params, south=south, west=west, north=north, east=east)
+
+    cells = (await db.execute(agg, dict(params, cell=cell))).all()
+    total = sum(c.count for c in cells)
+    out = {"zoom": zoom, "cell_size": cell, "bbox": list(bbox), "total": total}
+
+    if total <= raw_threshold:
+        rows = (await db.execute(raw, dict(params, limit=raw_threshold))).all()
+        return dict(out, mode="listings", clusters=[], items=[dict(zip(LISTING_FIELDS, r)) for r in rows])
+
+    clusters = [
+        {
+            "cell": f"{zoom}/{int(c.gy)}/{int(c.gx)}",
+            "count": c.count,
+            "lat": c.lat,
+            "lng": c.lng,
+            "price_min": c.price_min,
+            "price_median": c.price_median,
+            "price_max": c.price_max,
+        }
+        for c in cells
+    ]
+    return dict(out, mode="clusters", clusters=clusters, items=[])
@@ -1,12 +1,24 @@
-from sqlalchemy import create_engine
+import asyncio
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 from .settings import settings
+from .instrumentation import TimedQueuePool, TimedAsyncQueuePool, install_query_hooks
 
 
-# engine = create_engine(settings.DATABASE_URL, pool_size=10, max_overflow=20, pool_pre_ping=True)
-# SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def pool_options() -> dict:
+    """Pool parameters from Settings, shared by every engine."""
+    return dict(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+
+engine = create_engine(settings.DATABASE_URL, poolclass=TimedQueuePool, **pool_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -18,4 +30,95 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def _asyncio_url(sync_url: str) -> str:
+    url = make_url(sync_url)
+    if url.drivername in ("postgresql", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+
+def async_database_url() -> str:
+    """ASYNC_DATABASE_URL, or DATABASE_URL moved onto an asyncio driver (psycopg 3 is both)."""
+    return settings.ASYNC_DATABASE_URL or _asyncio_url(settings.DATABASE_URL)
+
+
+def async_read_database_url() -> str | None:
+    """ASYNC_READ_DATABASE_URL, or READ_DATABASE_URL on an asyncio driver; None without a replica."""
+    if settings.ASYNC_READ_DATABASE_URL:
+        return settings.ASYNC_READ_DATABASE_URL
+    return _asyncio_url(settings.READ_DATABASE_URL) if settings.READ_DATABASE_URL else None
+
+
+async_engine = create_async_engine(async_database_url(), poolclass=TimedAsyncQueuePool, **pool_options())
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# read-only traffic (/listings, similar listings) goes to the replica
+# when one is configured, otherwise these are the primary engines
+if settings.READ_DATABASE_URL:
+    read_engine = create_engine(settings.READ_DATABASE_URL, poolclass=TimedQueuePool, **pool_options())
+else:
+    read_engine = engine
+read_url = async_read_database_url()
+if read_url:
+    read_async_engine = create_async_engine(read_url, poolclass=TimedAsyncQueuePool, **pool_options())
+else:
+    read_async_engine = async_engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+ReadAsyncSessionLocal = async_sessionmaker(read_async_engine, autoflush=False, expire_on_commit=False)
+
+# name -> sync Engine of every distinct engine, for hooks, warm-up and stats
+ENGINES = {"primary": engine, "primary_async": async_engine.sync_engine}
+if read_engine is not engine:
+    ENGINES["replica"] = read_engine
+if read_async_engine is not async_engine:
+    ENGINES["replica_async"] = read_async_engine.sync_engine
+
+# query counts/timings per request, slow-query log, pool gauges
+for _name, _engine in ENGINES.items():
+    install_query_hooks(_engine, _name)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_read_db():
+    """Session for handlers that only read; may lag the primary by the replication delay."""
+    async with ReadAsyncSessionLocal() as db:
+        yield db
+
+
+async def warm_up(n: int | None = None) -> None:
+    """Open n connections per async engine (DB_POOL_WARMUP) at startup, so the first
+    requests after a deploy don't pay connection setup."""
+    n = min(settings.DB_POOL_WARMUP if n is None else n, settings.DB_POOL_SIZE)
+    if n <= 0:
+        return
+
+    # all n checked out at once, so n distinct connections are opened, then returned to the pool
+    conns = [e.connect() for e in {async_engine, read_async_engine} for _ in range(n)]
+    try:
+        await asyncio.gather(*[c.start() for c in conns])
+        await asyncio.gather(*[c.execute(text("SELECT 1")) for c in conns])
+    finally:
+        await asyncio.gather(*[c.close() for c in conns], return_exceptions=True)
+
+
+def pool_stats() -> dict:
+    """Current usage of every engine's pool."""
+    stats = {}
+    for name, eng in ENGINES.items():
+        pool = eng.pool
+        stats[name] = {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "timeout": settings.DB_POOL_TIMEOUT,
+        }
+    return stats
@@ -0,0 +1,91 @@
+"""Per-listing price history stored as date-sorted parallel arrays.
+
+realestate.listing_price_history (migrations/0009_listing_price_history.sql)
+has one row per listing, with snapshot dates and prices as arrays ordered by
+date. After a snapshot is ingested, refresh_price_history(db, snapshot_date)
+rebuilds the rows of the listings in that snapshot, so /listings reads history
+with a single primary-key lookup.
+
+    python -m backend.history            # full rebuild (backfill)
+    python -m backend.history 2024-06-01 # only listings present in that snapshot
+"""
+import argparse
+from sqlalchemy import Table, Column, MetaData, String, Date, Float, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from .settings import settings
+
+meta = MetaData(schema=settings.SCHEMA)
+
+price_history = Table(
+    "listing_price_history", meta,
+    Column("listing_id", String, primary_key=True),
+    Column("dates", ARRAY(Date), nullable=False),
+    Column("prices", ARRAY(Float), nullable=False),
+    Column("last_snapshot", Date, nullable=False),
+)
+
+REFRESH_SQL = """
+INSERT INTO {schema}.listing_price_history AS h (listing_id, dates, prices, last_snapshot)
+SELECT f.listing_id,
+       array_agg(f.snapshot_date::date ORDER BY f.snapshot_date),
+       array_agg(f.price::float8 ORDER BY f.snapshot_date),
+       max(f.snapshot_date::date)
+FROM {schema}.fact_listings f
+WHERE f.price IS NOT NULL
+  {only_snapshot}
+GROUP BY f.listing_id
+ON CONFLICT (listing_id) DO UPDATE
+SET dates = EXCLUDED.dates,
+    prices = EXCLUDED.prices,
+    last_snapshot = EXCLUDED.last_snapshot
+"""
+
+ONLY_SNAPSHOT = """AND f.listing_id IN (
+    SELECT listing_id FROM {schema}.fact_listings WHERE snapshot_date = CAST(:snapshot AS date)
+  )"""
+
+
+def refresh_price_history(db: Session, snapshot_date=None) -> int:
+    """Rebuild history rows for the listings in snapshot_date (all listings if None)."""
+    only = ONLY_SNAPSHOT.format(schema=settings.SCHEMA) if snapshot_date is not None else ""
+    sql = REFRESH_SQL.format(schema=settings.SCHEMA, only_snapshot=only)
+    params = {"snapshot": str(snapshot_date)} if snapshot_date is not None else {}
+    res = db.execute(text(sql), params)
+    db.commit()
+    return res.rowcount
+
+
+def fetch_price_histories(db: Session, listing_ids: list[str], columnar: bool = False) -> dict:
+    """listing_id -> history, as [{date, price}, ...] or {"dates": [...], "prices": [...]}."""
+    if not listing_ids:
+        return {}
+
+    rows = db.execute(
+        select(price_history.c.listing_id, price_history.c.dates, price_history.c.prices)
+        .where(price_history.c.listing_id.in_(listing_ids))
+    ).all()
+
+    out: dict = {}
+    for lid, dates, prices in rows:
+        iso = [d.isoformat() for d in dates]
+        if columnar:
+            out[lid] = {"dates": iso, "prices": list(prices)}
+        else:
+            out[lid] = [{"date": d, "price": p} for d, p in zip(iso, prices)]
+    return out
+
+
+def main() -> None:
+    from .db import SessionLocal
+
+    ap = argparse.ArgumentParser(description="Rebuild realestate.listing_price_history")
+    ap.add_argument("snapshot_date", nargs="?", help="only listings present in this snapshot (YYYY-MM-DD)")
+    args = ap.parse_args()
+    with SessionLocal() as db:
+        n = refresh_price_history(db, args.snapshot_date)
+    print(f"refreshed {n} listing histories")
+
+
+if __name__ == "__main__":
+    main()
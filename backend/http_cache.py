@@ -0,0 +1,207 @@
+"""Response cache for the read endpoints, with strong ETags and pre-compressed bodies.
+
+Entries are keyed on normalized request parameters (see cache_key) and hold the
+JSON body plus its gzip/brotli encodings, so a hit costs neither a query nor a
+compression pass. The default backend is an in-process LRU with TTL and an
+entry/byte cap; set RESPONSE_CACHE_URL=redis://... to share entries between
+workers (needs the optional ``redis`` package).
+"""
+import gzip
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, NamedTuple
+from fastapi import Request, Response
+from .settings import settings
+from . import snapshots
+
+try:  # optional: brotli is only offered when the package is installed
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+class CacheEntry(NamedTuple):
+    body: bytes
+    etag: str
+    media_type: str
+    gzip: bytes | None
+    br: bytes | None
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzip or b"") + len(self.br or b"")
+
+
+class MemoryBackend:
+    """Thread-safe LRU with per-entry expiry, capped by entry count and total bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: OrderedDict[str, tuple[float, CacheEntry]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, entry = item
+            if expires < time.monotonic():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry, ttl: int) -> None:
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (time.monotonic() + ttl, entry)
+            self._bytes += entry.size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._data)))
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                self._pop(key)
+
+    def _pop(self, key: str) -> None:
+        _, entry = self._data.pop(key)
+        self._bytes -= entry.size
+
+
+class RedisBackend:
+    """Shared backend; entries are pickled, so only point it at a trusted Redis."""
+
+    def __init__(self, url: str, namespace: str = "rc:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.namespace = namespace
+
+    def get(self, key: str) -> CacheEntry | None:
+        raw = self.client.get(self.namespace + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, entry: CacheEntry, ttl: int) -> None:
+        self.client.set(self.namespace + key, pickle.dumps(entry), ex=ttl)
+
+    def delete_prefix(self, prefix: str) -> None:
+        keys = list(self.client.scan_iter(match=self.namespace + prefix + "*", count=500))
+        if keys:
+            self.client.delete(*keys)
+
+
+def cache_key(namespace: str, **params) -> str:
+    """namespace + digest of the non-empty params; callers normalize values first."""
+    items = sorted((k, v) for k, v in params.items() if v is not None and v != [] and v != "")
+    digest = hashlib.sha1(repr(items).encode()).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def _accepted_encodings(request: Request) -> set[str]:
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, param = part.partition(";")
+        name, _, q = param.partition("=")
+        if name.strip() == "q":
+            try:
+                if float(q) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding.strip():
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _not_modified(request: Request, entry: CacheEntry) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip() for t in header.split(",")}
+    # any content-coding of the same body counts as a match
+    base = entry.etag[:-1]
+    return "*" in tags or any(t == entry.etag or t.startswith(base + "-") for t in tags)
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: int, min_compress: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.min_compress = min_compress
+
+    def make_entry(self, body: bytes, media_type: str) -> CacheEntry:
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        gz = br = None
+        if len(body) >= self.min_compress:
+            gz = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                br = brotli.compress(body, quality=5)
+        return CacheEntry(body, etag, media_type, gz, br)
+
+    def to_response(self, request: Request, entry: CacheEntry, hit: bool) -> Response:
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+            "X-Cache": "HIT" if hit else "MISS",
+        }
+        if _not_modified(request, entry):
+            return Response(status_code=304, headers=headers)
+
+        accepted = _accepted_encodings(request)
+        body = entry.body
+        if entry.br is not None and "br" in accepted:
+            body = entry.br
+            headers.update({"Content-Encoding": "br", "ETag": entry.etag[:-1] + '-br"'})
+        elif entry.gzip is not None and "gzip" in accepted:
+            body = entry.gzip
+            headers.update({"Content-Encoding": "gzip", "ETag": entry.etag[:-1] + '-gz"'})
+        return Response(content=body, media_type=entry.media_type, headers=headers)
+
+    async def respond(
+        self,
+        request: Request,
+        key: str,
+        produce: Callable[[], Awaitable[bytes]],
+        media_type: str = "application/json",
+    ) -> Response:
+        """Serve key from the cache, or await produce() for the body and store it."""
+        entry = self.backend.get(key)
+        hit = entry is not None
+        if entry is None:
+            entry = self.make_entry(await produce(), media_type)
+            self.backend.set(key, entry, self.ttl)
+        return self.to_response(request, entry, hit)
+
+    def invalidate(self, prefix: str) -> None:
+        self.backend.delete_prefix(prefix)
+
+
+def _make_backend():
+    if settings.RESPONSE_CACHE_URL:
+        return RedisBackend(settings.RESPONSE_CACHE_URL)
+    return MemoryBackend(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_MAX_BYTES)
+
+
+response_cache = ResponseCache(_make_backend(), settings.RESPONSE_CACHE_TTL, settings.RESPONSE_CACHE_MIN_COMPRESS)
+
+
+@snapshots.subscribe
+def _invalidate_listings(_snapshot_date) -> None:
+    response_cache.invalidate("listings:")
+
+
+def invalidate_opinions(listing_id: str) -> None:
+    response_cache.invalidate(f"opinions:{listing_id}:")
+    # pages that attach or sort by opinion summaries
+    response_cache.invalidate("listings:opinions:")
@@ -0,0 +1,288 @@
+"""Snapshot ingestion: monthly apartments_pl_YYYY_MM.csv files -> realestate.fact_listings.
+
+Port of the loader in main/data.ipynb (snapshot_from_name, guess_delimiter,
+load_one), reworked for repeat runs:
+
+* every file is streamed with COPY into its own staging table (a temporary
+  table on the worker's connection, dropped at commit), so files load in
+  parallel without sharing realestate.stg_listings;
+* the file's SHA-256 goes into realestate.ingest_manifest in the same
+  transaction as its rows, and files whose checksum is already there are
+  skipped (ON CONFLICT (listing_id, snapshot_date) DO NOTHING keeps reloads
+  idempotent too);
+* once the new snapshots are in, the derived tables (latest_listings, price
+  history, accessibility ranks, the market_stats rollup of their month) are
+  refreshed for them and snapshots.announce() bumps realestate.data_version
+  and clears this process's caches; API processes notice the load through
+  snapshots.watch(), backfilled and --force reloaded snapshots included;
+* with --features the new snapshots' feature-store partitions are written too
+  (backend/ml/features.py), and with --opinions (default: OPINION_PRECOMPUTE)
+  their listings get opinions generated ahead of the first view, before the
+  snapshot is published (backend/services/opinion_worker.py).
+
+    python -m backend.ingest /data/apt_prices_poland --jobs 4
+    python -m backend.ingest /data/apt_prices_poland/apartments_pl_2024_06.csv --force
+"""
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple
+import psycopg
+from sqlalchemy.engine import make_url
+
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+DATE_RE = re.compile(r'(?P<yyyy>20\d{2})[-_](?P<mm>\d{1,2})', re.I)
+
+COPY_CHUNK = 1024 * 1024
+
+# CSV column order of the source files (COPY maps by position)
+STAGING_DDL = """
+CREATE TEMP TABLE stg_listings (
+  id TEXT, city TEXT, type TEXT, squareMeters NUMERIC,
+  rooms NUMERIC, floor NUMERIC, floorCount NUMERIC, buildYear NUMERIC,
+  latitude NUMERIC, longitude NUMERIC, centreDistance NUMERIC, poiCount NUMERIC,
+  schoolDistance NUMERIC, clinicDistance NUMERIC, postOfficeDistance NUMERIC,
+  kindergartenDistance NUMERIC, restaurantDistance NUMERIC, collegeDistance NUMERIC,
+  pharmacyDistance NUMERIC, ownership TEXT, buildingMaterial TEXT, condition TEXT,
+  hasParkingSpace BOOLEAN, hasBalcony BOOLEAN, hasElevator BOOLEAN,
+  hasSecurity BOOLEAN, hasStorageRoom BOOLEAN, price NUMERIC
+) ON COMMIT DROP
+"""
+
+INSERT_FACT_SQL = """
+INSERT INTO {schema}.fact_listings (
+  listing_id, snapshot_date, city, type, square_m, rooms, floor, floor_count,
+  build_year, latitude, longitude, centre_distance, poi_count, school_distance,
+  clinic_distance, post_office_distance, kindergarten_distance, restaurant_distance,
+  college_distance, pharmacy_distance, ownership, building_material, condition,
+  has_parking_space, has_balcony, has_elevator, has_security, has_storage_room, price
+)
+SELECT
+  COALESCE(NULLIF(id,''), md5(concat_ws('|',
+      NULLIF(trim(city),''), type,
+      latitude::text, longitude::text,
+      buildYear::text, price::text))) AS listing_id,
+  %s::date AS snapshot_date,
+  NULLIF(trim(city),'') AS city,
+  type,
+  squareMeters AS square_m,
+  rooms::INT AS rooms,
+  floor::INT AS floor,
+  floorCount::INT AS floor_count,
+  buildYear::INT AS build_year,
+  latitude, longitude,
+  centreDistance AS centre_distance,
+  poiCount::INT AS poi_count,
+  schoolDistance, clinicDistance, postOfficeDistance,
+  kindergartenDistance, restaurantDistance, collegeDistance, pharmacyDistance,
+  ownership, buildingMaterial, condition,
+  hasParkingSpace, hasBalcony, hasElevator, hasSecurity, hasStorageRoom,
+  price
+FROM stg_listings
+WHERE NULLIF(trim(city),'') IS NOT NULL
+  AND COALESCE(squareMeters,0) > 0
+  AND COALESCE(price,0) > 0
+ON CONFLICT (listing_id, snapshot_date) DO NOTHING
+"""
+
+MANIFEST_DDL = """
+CREATE TABLE IF NOT EXISTS {schema}.ingest_manifest (
+  sha256 text PRIMARY KEY,
+  file_name text NOT NULL,
+  snapshot_date date NOT NULL,
+  rows_staged integer NOT NULL,
+  rows_inserted integer NOT NULL,
+  seconds double precision NOT NULL,
+  loaded_at timestamptz NOT NULL DEFAULT now()
+)
+"""
+
+
+class LoadResult(NamedTuple):
+    file_name: str
+    snapshot_date: str
+    rows_staged: int
+    rows_inserted: int
+    seconds: float
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows_staged / self.seconds if self.seconds else 0.0
+
+
+def libpq_dsn() -> str:
+    """DATABASE_URL without the SQLAlchemy driver suffix, for psycopg.connect."""
+    url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+def snapshot_from_name(fname: str):
+    m = DATE_RE.search(os.path.basename(fname))
+    if not m:
+        return None
+    yyyy = m.group("yyyy")
+    mm = int(m.group("mm"))
+    if not (1 <= mm <= 12):
+        return None
+    return f"{yyyy}-{mm:02d}-01"
+
+def guess_delimiter(csv_path: str) -> str:
+    with open(csv_path, "r", encoding="utf-8-sig", errors="replace") as f:
+        header = f.readline()
+    return ";" if header.count(";") > header.count(",") else ","
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(COPY_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+def discover(paths: list[str]) -> list[str]:
+    """CSV files named on the command line, or found in the given directories."""
+    found = []
+    for p in paths:
+        found += sorted(glob.glob(os.path.join(p, "*.csv"))) if os.path.isdir(p) else [p]
+    return found
+
+def loaded_checksums(dsn: str) -> set[str]:
+    with psycopg.connect(dsn) as con:
+        con.execute(MANIFEST_DDL.format(schema=settings.SCHEMA))
+        return {r[0] for r in con.execute(f"SELECT sha256 FROM {settings.SCHEMA}.ingest_manifest")}
+
+def load_one(dsn: str, csv_path: str, snapshot_date: str, sha256: str) -> LoadResult:
+    """COPY one file into a private staging table and move it into fact_listings,
+    all in one transaction together with its manifest row."""
+    t0 = time.perf_counter()
+    delim = guess_delimiter(csv_path)
+    schema = settings.SCHEMA
+
+    with psycopg.connect(dsn) as con:
+        with con.cursor() as cur:
+            cur.execute(STAGING_DDL)
+            with open(csv_path, "rb") as f:
+                with cur.copy(f"COPY stg_listings FROM STDIN WITH (FORMAT csv, HEADER true, DELIMITER '{delim}')") as cp:
+                    while chunk := f.read(COPY_CHUNK):
+                        cp.write(chunk)
+
+            cur.execute("SELECT COUNT(*) FROM stg_listings")
+            rows_staged = cur.fetchone()[0]
+
+            cur.execute(INSERT_FACT_SQL.format(schema=schema), (snapshot_date,))
+            rows_inserted = cur.rowcount
+
+            seconds = time.perf_counter() - t0
+            cur.execute(
+                f"""INSERT INTO {schema}.ingest_manifest
+                    (sha256, file_name, snapshot_date, rows_staged, rows_inserted, seconds)
+                    VALUES (%s, %s, %s::date, %s, %s, %s)
+                    ON CONFLICT (sha256) DO UPDATE
+                    SET rows_staged = EXCLUDED.rows_staged, rows_inserted = EXCLUDED.rows_inserted,
+                        seconds = EXCLUDED.seconds, loaded_at = now()""",
+                (sha256, os.path.basename(csv_path), snapshot_date, rows_staged, rows_inserted, seconds),
+            )
+        con.commit()
+
+    return LoadResult(os.path.basename(csv_path), snapshot_date, rows_staged, rows_inserted, seconds)
+
+def refresh_downstream(snapshot_dates: list[str], features: bool = False, opinions: bool = False) -> None:
+    """Rebuild what derives from fact_listings for the new snapshots, then announce
+    the newest one so every process drops its caches."""
+    from .db import SessionLocal
+    from .latest import refresh_latest
+    from .history import refresh_price_history
+    from .accessibility import refresh_accessibility
+    from .market import refresh_market_stats
+    from . import snapshots
+
+    with SessionLocal() as db:
+        for snap in sorted(snapshot_dates):
+            t0 = time.perf_counter()
+            n_latest = refresh_latest(db, snap)
+            n_hist = refresh_price_history(db, snap)
+            n_access = refresh_accessibility(db, snap)  # ranks read latest_listings
+            n_market = refresh_market_stats(db, snap)
+            log.info("%s: %d latest rows, %d histories, %d accessibility rows, %d market stats refreshed in %.1fs",
+                     snap, n_latest, n_hist, n_access, n_market, time.perf_counter() - t0)
+    if features:
+        from .db import engine
+        from .ml.features import build
+        for snap in sorted(snapshot_dates):
+            build(engine, snap)
+    if opinions:
+        from .services.opinion_worker import opinion_worker
+        for snap in sorted(snapshot_dates):
+            n = opinion_worker.precompute(snap)
+            log.info("%s: %d opinions precomputed", snap, n)
+    with SessionLocal() as db:
+        snapshots.announce(db, max(snapshot_dates))
+
+def ingest(paths: list[str], jobs: int = 4, force: bool = False, refresh: bool = True,
+           features: bool = False, opinions: bool = False) -> list[LoadResult]:
+    dsn = libpq_dsn()
+    done = set() if force else loaded_checksums(dsn)
+
+    todo = []
+    for path in discover(paths):
+        snap = snapshot_from_name(path)
+        if not snap:
+            log.warning("skip (no YYYY[-_]MM in name): %s", os.path.basename(path))
+            continue
+        sha = file_sha256(path)
+        if sha in done:
+            log.info("skip (already loaded): %s", os.path.basename(path))
+            continue
+        todo.append((path, snap, sha))
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {pool.submit(load_one, dsn, path, snap, sha): path for path, snap, sha in todo}
+        for fut in as_completed(futures):
+            path = futures[fut]
+            try:
+                r = fut.result()
+            except Exception:
+                log.exception("failed: %s", os.path.basename(path))
+                continue
+            log.info("%s -> %s: staged %d, inserted %d (%.0f rows/s)",
+                     r.file_name, r.snapshot_date, r.rows_staged, r.rows_inserted, r.rows_per_sec)
+            results.append(r)
+
+    if refresh and any(r.rows_inserted for r in results):
+        refresh_downstream([r.snapshot_date for r in results if r.rows_inserted], features, opinions)
+    return results
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Load apartments_pl_YYYY_MM.csv snapshots into fact_listings")
+    ap.add_argument("paths", nargs="+", help="CSV files or directories containing them")
+    ap.add_argument("--jobs", type=int, default=min(4, os.cpu_count() or 1), help="files loaded in parallel")
+    ap.add_argument("--force", action="store_true", help="load files even if their checksum is in the manifest")
+    ap.add_argument("--no-refresh", action="store_true", help="skip the latest/history/accessibility refresh")
+    ap.add_argument("--features", action="store_true", help="also write the new snapshots' feature-store partitions")
+    ap.add_argument("--opinions", action=argparse.BooleanOptionalAction, default=settings.OPINION_PRECOMPUTE,
+                    help="also generate opinions for the new snapshots' listings (default: OPINION_PRECOMPUTE)")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    t0 = time.perf_counter()
+    results = ingest(args.paths, jobs=args.jobs, force=args.force, refresh=not args.no_refresh,
+                     features=args.features, opinions=args.opinions)
+    wall = time.perf_counter() - t0
+
+    print(f"\n{'snapshot':<11} {'file':<35} {'staged':>9} {'inserted':>9} {'rows/s':>10}")
+    for r in sorted(results, key=lambda r: r.snapshot_date):
+        print(f"{r.snapshot_date:<11} {r.file_name:<35} {r.rows_staged:>9,} {r.rows_inserted:>9,} {r.rows_per_sec:>10,.0f}")
+    staged = sum(r.rows_staged for r in results)
+    print(f"\n{len(results)} file(s), {staged:,} rows in {wall:.1f}s "
+          f"({staged / wall if wall else 0:,.0f} rows/s end to end, --jobs {args.jobs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Per-request timing: query counts, named stages, Server-Timing and /metrics.
+
+* TimingMiddleware opens a RequestTimings for every request (a ContextVar, so
+  it follows the request into tasks, threads and SQLAlchemy's greenlets) and
+  adds a Server-Timing header: one entry per stage plus "db" (all statements,
+  with the query count) and "total".
+* span(name) times a stage of a handler, e.g. the count or page query.
+* install_query_hooks(engine) times every statement through the cursor
+  events; statements slower than SLOW_QUERY_MS are logged with their SQL,
+  parameters, route and the request's filter signature (annotate()).
+* TimedQueuePool / TimedAsyncQueuePool measure how long a checkout waited for
+  a connection.
+* metrics.render() is the Prometheus text format served on /metrics. The
+  numbers are per process; with several workers each one reports its own.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from .settings import settings
+
+slow_log = logging.getLogger("backend.slow_query")
+
+# seconds; Prometheus' default buckets with a finer low end for single queries
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, name: str, help_: str, labels: tuple[str, ...], buckets=BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_, labels, buckets
+        self._series: dict[tuple, list] = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                s = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for values, s in sorted(series.items()):
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, values))
+            sep = "," if labels else ""
+            for bound, n in zip(self.buckets, s):
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {n}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {s[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {s[-2]}")
+            lines.append(f"{self.name}_count{{{labels}}} {s[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_: str, labels: tuple[str, ...]):
+        self.name, self.help, self.labels = name, help_, labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_values, v in sorted(values.items()):
+            labels = ",".join(f'{k}="{x}"' for k, x in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {v}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.requests = Histogram("http_request_duration_seconds", "Request latency by route", ("route", "method", "status"))
+        self.stages = Histogram("request_stage_duration_seconds", "Time spent in named request stages", ("route", "stage"))
+        self.queries = Histogram("db_query_duration_seconds", "SQL statement latency by route", ("route",))
+        self.query_count = Counter("db_queries_total", "SQL statements executed by route", ("route",))
+        self.slow_queries = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ("route",))
+        self.pool_wait = Histogram("db_pool_checkout_wait_seconds", "Time a checkout waited for a pooled connection", ("pool",))
+        self._gauges = []  # callables returning [(name, help, {labels}, value), ...]
+
+    def add_gauges(self, fn) -> None:
+        self._gauges.append(fn)
+
+    def render(self) -> str:
+        lines = []
+        for m in (self.requests, self.stages, self.queries, self.query_count, self.slow_queries, self.pool_wait):
+            lines += m.render()
+        seen = set()
+        for fn in self._gauges:
+            for name, help_, labels, value in fn():
+                if name not in seen:
+                    lines += [f"# HELP {name} {help_}", f"# TYPE {name} gauge"]
+                    seen.add(name)
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_str}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class RequestTimings:
+    __slots__ = ("route", "stages", "queries", "query_seconds", "annotations")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.stages: dict[str, float] = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.annotations: dict[str, object] = {}
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{name};dur={sec * 1000:.1f}" for name, sec in self.stages.items()]
+        parts.append(f'db;dur={self.query_seconds * 1000:.1f};desc="{self.queries} queries"')
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def current() -> RequestTimings | None:
+    return _current.get()
+
+
+def annotate(**values) -> None:
+    """Attach request details (e.g. filters=<filter signature>) for the slow-query log."""
+    timings = _current.get()
+    if timings is not None:
+        timings.annotations.update(values)
+
+
+@contextmanager
+def span(name: str):
+    """Time a named stage of the current request (a no-op outside requests)."""
+    timings = _current.get()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            elapsed = time.perf_counter() - t0
+            timings.add_stage(name, elapsed)
+            metrics.stages.observe(elapsed, timings.route, name)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    timings = _current.get()
+    route = timings.route if timings is not None else "background"
+    if timings is not None:
+        timings.queries += 1
+        timings.query_seconds += elapsed
+    metrics.queries.observe(elapsed, route)
+    metrics.query_count.inc(1, route)
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        metrics.slow_queries.inc(1, route)
+        slow_log.warning(
+            "slow query %.1f ms route=%s filters=%s\n%s\nparams=%r",
+            elapsed * 1000, route, timings.annotations.get("filters") if timings else None,
+            statement, parameters,
+        )
+
+
+def install_query_hooks(engine, name: str) -> None:
+    """Time every statement on engine (pass async_engine.sync_engine for the async one);
+    name labels its pool in the pool metrics."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    engine.pool.label = name
+    metrics.add_gauges(lambda: pool_gauges(engine, name))
+
+
+def pool_gauges(engine, name: str) -> list[tuple]:
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return []
+    labels = {"pool": name}
+    return [
+        ("db_pool_size", "Configured pool size", labels, pool.size()),
+        ("db_pool_checked_out", "Connections currently checked out", labels, pool.checkedout()),
+        ("db_pool_checked_in", "Idle connections in the pool", labels, pool.checkedin()),
+        ("db_pool_overflow", "Connections open beyond pool_size", labels, max(0, pool.overflow())),
+    ]
+
+
+class _TimedGet:
+    """Mixin timing QueuePool._do_get, i.e. the wait for a free (or new) connection."""
+    label = "default"  # set per engine by install_query_hooks
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.pool_wait.observe(time.perf_counter() - t0, self.label)
+
+
+class TimedQueuePool(_TimedGet, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedGet, AsyncAdaptedQueuePool):
+    pass
+
+
+def _route_label(app, scope) -> str:
+    """The matched route's path template, so metric labels stay bounded."""
+    from starlette.routing import Match
+
+    for r in app.router.routes:
+        if r.matches(scope)[0] == Match.FULL:
+            return getattr(r, "path", "unmatched")
+    return "unmatched"
+
+
+class TimingMiddleware:
+    """ASGI middleware: per-request RequestTimings, Server-Timing header, request histogram."""
+
+    def __init__(self, app, fastapi_app=None):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route = _route_label(self.fastapi_app, scope) if self.fastapi_app is not None else scope["path"]
+        timings = RequestTimings(route)
+        token = _current.set(timings)
+        t0 = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if settings.SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.server_timing(time.perf_counter() - t0).encode()))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            metrics.requests.observe(time.perf_counter() - t0, route, scope["method"], str(status["code"]))
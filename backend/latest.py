@@ -0,0 +1,86 @@
+"""realestate.latest_listings: the newest fact_listings row of every listing.
+
+Created by migrations/0006_latest_listings.sql and kept current here:
+
+* refresh_latest(db, snapshot_date) upserts only the listings present in that
+  snapshot (their newest row is recomputed from fact_listings through the
+  (listing_id, snapshot_date DESC) index), which is what ingestion runs;
+* refresh_latest(db) without a date is the full path: it rewrites every row
+  from fact_listings and deletes listings that no longer exist. Like
+  REFRESH MATERIALIZED VIEW CONCURRENTLY it applies the result as row-level
+  changes, so readers are never blocked and never see an empty table.
+
+    python -m backend.latest            # full refresh
+    python -m backend.latest 2024-06-01 # listings in that snapshot only
+"""
+import argparse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .settings import settings
+
+LATEST_TABLE = "latest_listings"
+
+UPSERT_SQL = """
+INSERT INTO {schema}.{latest} ({cols})
+SELECT DISTINCT ON (f.listing_id) {f_cols}
+FROM {schema}.fact_listings f
+{where}
+ORDER BY f.listing_id, f.snapshot_date DESC
+ON CONFLICT (listing_id) DO UPDATE SET {updates}
+"""
+
+ONLY_SNAPSHOT = """WHERE f.listing_id IN (
+    SELECT listing_id FROM {schema}.fact_listings WHERE snapshot_date = CAST(:snapshot AS date)
+)"""
+
+DELETE_MISSING_SQL = """
+DELETE FROM {schema}.{latest} l
+WHERE NOT EXISTS (SELECT 1 FROM {schema}.fact_listings f WHERE f.listing_id = l.listing_id)
+"""
+
+
+def latest_columns(db: Session) -> list[str]:
+    rows = db.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = :schema AND table_name = :table ORDER BY ordinal_position"
+    ), {"schema": settings.SCHEMA, "table": LATEST_TABLE})
+    return [r[0] for r in rows]
+
+
+def refresh_latest(db: Session, snapshot_date=None) -> int:
+    """Upsert the newest row of the listings in snapshot_date (all listings if
+    None); returns the number of rows written."""
+    schema = settings.SCHEMA
+    cols = latest_columns(db)
+    if not cols:
+        raise RuntimeError(f"{schema}.{LATEST_TABLE} does not exist; run python -m backend.migrate")
+
+    sql = UPSERT_SQL.format(
+        schema=schema,
+        latest=LATEST_TABLE,
+        cols=", ".join(cols),
+        f_cols=", ".join(f"f.{c}" for c in cols),
+        where=ONLY_SNAPSHOT.format(schema=schema) if snapshot_date is not None else "",
+        updates=", ".join(f"{c} = EXCLUDED.{c}" for c in cols if c != "listing_id"),
+    )
+    params = {"snapshot": str(snapshot_date)} if snapshot_date is not None else {}
+    written = db.execute(text(sql), params).rowcount
+    if snapshot_date is None:
+        db.execute(text(DELETE_MISSING_SQL.format(schema=schema, latest=LATEST_TABLE)))
+    db.commit()
+    return written
+
+
+def main() -> None:
+    from .db import SessionLocal
+
+    ap = argparse.ArgumentParser(description="Refresh realestate.latest_listings")
+    ap.add_argument("snapshot_date", nargs="?", help="only listings present in this snapshot (YYYY-MM-DD)")
+    args = ap.parse_args()
+    with SessionLocal() as db:
+        n = refresh_latest(db, args.snapshot_date)
+    print(f"refreshed {n} latest listings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Market statistics: price and price per m² by month, city, type and rooms.
+
+realestate.market_stats (migrations/0008_market_stats.sql) holds one row per
+month and combination of city / type / rooms, each dimension either a value or
+rolled up, computed in one GROUPING SETS pass over the month's listings:
+counts, averages and the 10/25/50/75/90th percentiles of price and price per m².
+A listing seen in several snapshots of a month counts once, at its newest row.
+
+* refresh_market_stats(db, snapshot_date) rewrites the snapshot's month only,
+  which is what ingestion runs;
+* refresh_market_stats(db) without a date rebuilds every month.
+
+fetch_market_stats reads one level of the rollup for GET /stats/market and adds
+the month-over-month change of the medians.
+
+    python -m backend.market            # rebuild every month
+    python -m backend.market 2024-06-01 # only that snapshot's month
+"""
+import argparse
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from .settings import settings
+
+MARKET_TABLE = "market_stats"
+
+# dimension -> GROUPING() bit set when the dimension is rolled up
+DIMENSIONS = {"city": 4, "type": 2, "rooms": 1}
+ALL_LEVELS = 7
+
+QUANTILES = ("p10", "p25", "median", "p75", "p90")
+STAT_COLUMNS = (
+    "n_listings", "avg_price", *(f"price_{q}" for q in QUANTILES),
+    "avg_price_m2", *(f"price_m2_{q}" for q in QUANTILES),
+)
+
+DELETE_MONTH_SQL = "DELETE FROM {schema}.{table} WHERE month = CAST(:month AS date)"
+
+REFRESH_MONTH_SQL = """
+WITH month_rows AS (
+    SELECT DISTINCT ON (f.listing_id)
+           lower(f.city) AS city, f.type, f.rooms,
+           f.price::float8 AS price,
+           f.price::float8 / nullif(f.square_m, 0) AS price_m2
+    FROM {schema}.fact_listings f
+    WHERE f.snapshot_date >= CAST(:month AS date)
+      AND f.snapshot_date < CAST(:month AS date) + interval '1 month'
+      AND f.price IS NOT NULL AND f.city IS NOT NULL
+    ORDER BY f.listing_id, f.snapshot_date DESC
+),
+rollup AS (
+    SELECT GROUPING(city, type, rooms) AS level,
+           coalesce(city, '') AS city, coalesce(type, '') AS type, coalesce(rooms, 0) AS rooms,
+           count(*) AS n_listings,
+           avg(price) AS avg_price,
+           percentile_cont(ARRAY[0.1, 0.25, 0.5, 0.75, 0.9]) WITHIN GROUP (ORDER BY price) AS pq,
+           avg(price_m2) AS avg_price_m2,
+           percentile_cont(ARRAY[0.1, 0.25, 0.5, 0.75, 0.9]) WITHIN GROUP (ORDER BY price_m2) AS mq
+    FROM month_rows
+    GROUP BY GROUPING SETS (
+        (city, type, rooms), (city, type), (city, rooms), (type, rooms),
+        (city), (type), (rooms), ()
+    )
+)
+INSERT INTO {schema}.{table} (level, city, type, rooms, month, {stat_cols})
+SELECT level, city, type, rooms, CAST(:month AS date), n_listings,
+       avg_price, pq[1], pq[2], pq[3], pq[4], pq[5],
+       avg_price_m2, mq[1], mq[2], mq[3], mq[4], mq[5]
+FROM rollup
+"""
+
+MONTHS_SQL = "SELECT DISTINCT date_trunc('month', snapshot_date)::date FROM {schema}.fact_listings ORDER BY 1"
+
+# one rollup level; mom is the change against the previous calendar month of the same series
+FETCH_SQL = """
+SELECT * FROM (
+    SELECT city, type, rooms, month, {stat_cols},
+           CASE WHEN lag(month) OVER w = month - interval '1 month'
+                THEN price_median / nullif(lag(price_median) OVER w, 0) - 1 END AS price_median_mom,
+           CASE WHEN lag(month) OVER w = month - interval '1 month'
+                THEN price_m2_median / nullif(lag(price_m2_median) OVER w, 0) - 1 END AS price_m2_median_mom
+    FROM {schema}.{table}
+    WHERE level = :level {filters}
+    WINDOW w AS (PARTITION BY city, type, rooms ORDER BY month)
+) s
+WHERE {months}
+ORDER BY city, type, rooms, month
+"""
+
+
+def month_of(snapshot_date) -> date:
+    return date.fromisoformat(str(snapshot_date)[:10]).replace(day=1)
+
+
+def refresh_market_stats(db: Session, snapshot_date=None) -> int:
+    """Rewrite the rollup rows of snapshot_date's month (every month if None);
+    returns the number of rows written."""
+    schema = settings.SCHEMA
+    if snapshot_date is None:
+        months = list(db.execute(text(MONTHS_SQL.format(schema=schema))).scalars())
+    else:
+        months = [month_of(snapshot_date)]
+
+    insert = text(REFRESH_MONTH_SQL.format(schema=schema, table=MARKET_TABLE, stat_cols=", ".join(STAT_COLUMNS)))
+    delete = text(DELETE_MONTH_SQL.format(schema=schema, table=MARKET_TABLE))
+    written = 0
+    for month in months:
+        # one transaction per month: readers see the old month or the new one
+        db.execute(delete, {"month": str(month)})
+        written += db.execute(insert, {"month": str(month)}).rowcount
+        db.commit()
+    return written
+
+
+def level_of(grouped: set[str]) -> int:
+    """GROUPING() bitmask of a rollup level broken down by the given dimensions."""
+    return ALL_LEVELS & ~sum(DIMENSIONS[d] for d in grouped)
+
+
+async def fetch_market_stats(
+    db: AsyncSession,
+    *,
+    by: list[str],
+    city: str | None = None,
+    type_: str | None = None,
+    rooms: int | None = None,
+    since: date | None = None,
+    until: date | None = None,
+) -> list[dict]:
+    """Monthly series for every combination of the by dimensions; a filtered
+    dimension is broken down too and pinned to its value. Dimensions neither
+    listed nor filtered are rolled up and come back as None."""
+    values = {"city": city, "type": type_, "rooms": rooms}
+    grouped = set(by) | {d for d, v in values.items() if v is not None}
+    params: dict = {"level": level_of(grouped)}
+    filters = []
+    for dim, value in values.items():
+        if value is not None:
+            filters.append(f"AND {dim} = :{dim}")
+            params[dim] = value
+    months = ["TRUE"]
+    if since is not None:
+        months.append("month >= :since")
+        params["since"] = since
+    if until is not None:
+        months.append("month <= :until")
+        params["until"] = until
+
+    sql = FETCH_SQL.format(
+        schema=settings.SCHEMA,
+        table=MARKET_TABLE,
+        stat_cols=", ".join(STAT_COLUMNS),
+        filters=" ".join(filters),
+        months=" AND ".join(months),
+    )
+    res = await db.execute(text(sql), params)
+    items = []
+    for row in res.mappings():
+        item = dict(row)
+        item["month"] = item["month"].isoformat()
+        for dim in DIMENSIONS:
+            # rolled up, or missing in the data ('' / 0)
+            if dim not in grouped or not item[dim]:
+                item[dim] = None
+        items.append(item)
+    return items
+
+
+def main() -> None:
+    from .db import SessionLocal
+
+    ap = argparse.ArgumentParser(description="Rebuild realestate.market_stats")
+    ap.add_argument("snapshot_date", nargs="?", help="only the month of this snapshot (YYYY-MM-DD)")
+    args = ap.parse_args()
+    with SessionLocal() as db:
+        n = refresh_market_stats(db, args.snapshot_date)
+    print(f"refreshed {n} market stats rows")
+
+
+if __name__ == "__main__":
+    main()
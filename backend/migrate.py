@@ -0,0 +1,151 @@
+"""Versioned SQL migrations from backend/migrations/NNNN_name.sql.
+
+Applied versions are recorded in realestate.schema_migrations together with a
+checksum of the file, so an edited migration is reported instead of silently
+skipped. {schema} in a file is replaced by settings.SCHEMA. A file whose first
+line is "-- no-transaction" runs statement by statement in autocommit mode,
+which CREATE INDEX CONCURRENTLY requires; every other file runs in a single
+transaction.
+
+    python -m backend.migrate           # apply pending migrations
+    python -m backend.migrate --status  # list applied / pending
+"""
+import argparse
+import hashlib
+import re
+from pathlib import Path
+from typing import NamedTuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from .settings import settings
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+NO_TRANSACTION = "-- no-transaction"
+
+_NAME = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+VERSIONS_DDL = """
+CREATE TABLE IF NOT EXISTS {schema}.schema_migrations (
+    version integer PRIMARY KEY,
+    name text NOT NULL,
+    checksum text NOT NULL,
+    applied_at timestamptz NOT NULL DEFAULT now()
+)
+"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: Path
+
+    @property
+    def sql(self) -> str:
+        return self.path.read_text().replace("{schema}", settings.SCHEMA)
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.path.read_bytes()).hexdigest()
+
+    @property
+    def transactional(self) -> bool:
+        return not self.path.read_text().lstrip().startswith(NO_TRANSACTION)
+
+
+def discover(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    found = []
+    for path in sorted(directory.glob("*.sql")):
+        m = _NAME.match(path.name)
+        if not m:
+            raise ValueError(f"migration file {path.name} does not match NNNN_name.sql")
+        found.append(Migration(int(m.group(1)), m.group(2), path))
+    versions = [m.version for m in found]
+    if len(versions) != len(set(versions)):
+        raise ValueError("duplicate migration version numbers")
+    return found
+
+
+def split_statements(sql: str) -> list[str]:
+    """Split on top-level semicolons; dollar-quoted bodies (DO $$ ... $$) stay whole."""
+    statements, current, in_dollar = [], [], False
+    for line in sql.splitlines():
+        if line.strip().startswith("--") and not in_dollar:
+            continue
+        current.append(line)
+        if line.count("$$") % 2:
+            in_dollar = not in_dollar
+        if not in_dollar and line.rstrip().endswith(";"):
+            stmt = "\n".join(current).strip().rstrip(";").strip()
+            if stmt:
+                statements.append(stmt)
+            current = []
+    tail = "\n".join(current).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def applied(engine: Engine) -> dict[int, str]:
+    with engine.begin() as conn:
+        conn.execute(text(VERSIONS_DDL.format(schema=settings.SCHEMA)))
+        rows = conn.execute(text(f"SELECT version, checksum FROM {settings.SCHEMA}.schema_migrations"))
+        return {v: c for v, c in rows}
+
+
+def _record(conn, m: Migration) -> None:
+    conn.execute(
+        text(f"INSERT INTO {settings.SCHEMA}.schema_migrations (version, name, checksum) VALUES (:v, :n, :c)"),
+        {"v": m.version, "n": m.name, "c": m.checksum},
+    )
+
+
+def apply(engine: Engine, m: Migration) -> None:
+    if m.transactional:
+        with engine.begin() as conn:
+            for stmt in split_statements(m.sql):
+                conn.exec_driver_sql(stmt)
+            _record(conn, m)
+        return
+    # every statement commits on its own; they are written to be re-runnable
+    # (IF NOT EXISTS), so a failure part-way is fixed by running again
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for stmt in split_statements(m.sql):
+            conn.exec_driver_sql(stmt)
+        _record(conn, m)
+
+
+def migrate(engine: Engine, directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """Apply every pending migration in version order; returns the ones applied."""
+    done = applied(engine)
+    ran = []
+    for m in discover(directory):
+        if m.version in done:
+            if done[m.version] != m.checksum:
+                raise RuntimeError(f"migration {m.path.name} was edited after it was applied")
+            continue
+        apply(engine, m)
+        ran.append(m)
+    return ran
+
+
+def main() -> None:
+    from .db import engine
+
+    ap = argparse.ArgumentParser(description="Apply the SQL migrations in backend/migrations")
+    ap.add_argument("--status", action="store_true", help="list migrations without applying")
+    args = ap.parse_args()
+
+    if args.status:
+        done = applied(engine)
+        for m in discover():
+            state = "pending" if m.version not in done else ("applied" if done[m.version] == m.checksum else "CHANGED")
+            print(f"{m.version:04d} {m.name:<30} {state}")
+        return
+    ran = migrate(engine)
+    for m in ran:
+        print(f"applied {m.version:04d}_{m.name}")
+    print(f"{len(ran)} migration(s) applied")
+
+
+if __name__ == "__main__":
+    main()
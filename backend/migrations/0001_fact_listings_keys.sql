@@ -0,0 +1,12 @@
+-- no-transaction
+-- Keys of the fact table itself.
+-- (listing_id, snapshot_date DESC) serves v_latest_listings (DISTINCT ON listing_id
+-- ORDER BY snapshot_date DESC), the price-history rebuild and the PostGIS join
+-- back from the listing row to its own snapshot; snapshot_date alone serves the
+-- snapshot watcher's max() and per-snapshot loads.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_listing_snapshot
+    ON {schema}.fact_listings (listing_id, snapshot_date DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_snapshot_date
+    ON {schema}.fact_listings (snapshot_date);
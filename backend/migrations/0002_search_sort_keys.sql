@@ -0,0 +1,13 @@
+-- no-transaction
+-- One index per /listings sort order, on exactly the key expression crud.SORT_KEYS
+-- orders by, with listing_id as the tie-breaker so keyset pages ("(key, id) > (:k, :id)")
+-- are index range scans. Descending sorts read these backwards.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_price_id
+    ON {schema}.fact_listings (price, listing_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_m2_id
+    ON {schema}.fact_listings ((coalesce(square_m, 'Infinity'::float8)), listing_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_recent_id
+    ON {schema}.fact_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id);
@@ -0,0 +1,55 @@
+-- no-transaction
+-- Attribute filters. City is always compared lower-cased, so its indexes are on
+-- the expression; the composites put the sort key right after the equality
+-- columns so a filtered page stays an ordered index scan.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_city_recent
+    ON {schema}.fact_listings (lower(city), (coalesce(snapshot_date, '1970-01-01'::date)), listing_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_city_price
+    ON {schema}.fact_listings (lower(city), price, listing_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_city_type_rooms
+    ON {schema}.fact_listings (lower(city), type, rooms, price);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_square_m
+    ON {schema}.fact_listings (square_m);
+
+-- amenities are boolean flags: partial indexes hold only the matching rows,
+-- ordered for the default (recent) sort
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_parking_recent
+    ON {schema}.fact_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id) WHERE has_parking_space;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_balcony_recent
+    ON {schema}.fact_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id) WHERE has_balcony;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_elevator_recent
+    ON {schema}.fact_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id) WHERE has_elevator;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_security_recent
+    ON {schema}.fact_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id) WHERE has_security;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_storage_recent
+    ON {schema}.fact_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id) WHERE has_storage_room;
+
+-- POI distance caps (max_school=... etc.), combined by bitmap AND when several are set
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_school_distance
+    ON {schema}.fact_listings (school_distance);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_clinic_distance
+    ON {schema}.fact_listings (clinic_distance);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_post_office_distance
+    ON {schema}.fact_listings (post_office_distance);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_restaurant_distance
+    ON {schema}.fact_listings (restaurant_distance);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_college_distance
+    ON {schema}.fact_listings (college_distance);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_pharmacy_distance
+    ON {schema}.fact_listings (pharmacy_distance);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fact_listings_kindergarten_distance
+    ON {schema}.fact_listings (kindergarten_distance);
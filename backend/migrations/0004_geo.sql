@@ -0,0 +1,21 @@
+-- Geo filters. With PostGIS, bbox (ST_Intersects) and radius (ST_DWithin) filters
+-- run against geom through a GiST index; without it (USE_POSTGIS=false) the
+-- lat/lon fallback filters on a latitude band first, served by the btree.
+-- The GiST index is skipped when fact_listings has no geom column.
+
+CREATE INDEX IF NOT EXISTS ix_fact_listings_lat_lng
+    ON {schema}.fact_listings (latitude, longitude);
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = '{schema}' AND table_name = 'fact_listings' AND column_name = 'geom'
+    ) THEN
+        EXECUTE 'CREATE INDEX IF NOT EXISTS ix_fact_listings_geom ON {schema}.fact_listings USING gist (geom)';
+    END IF;
+END
+$$;
+
+-- expression indexes only get planner statistics after an ANALYZE
+ANALYZE {schema}.fact_listings;
@@ -0,0 +1,48 @@
+-- Synthetic opinions and their per-listing averages.
+-- listing_opinion_summary is rewritten by opinion_crud on every opinion write
+-- (same transaction), so /listings can join it for attach and sort instead of
+-- aggregating synthetic_opinions per request. The backfill covers existing rows.
+
+CREATE TABLE IF NOT EXISTS {schema}.synthetic_opinions (
+    opinion_id text PRIMARY KEY,
+    listing_id text NOT NULL,
+    cleanliness smallint NOT NULL,
+    safety smallint NOT NULL,
+    parking smallint NOT NULL,
+    noise smallint NOT NULL,
+    transit_access smallint NOT NULL,
+    sunlight smallint NOT NULL,
+    overall smallint NOT NULL,
+    review_text text NOT NULL,
+    source text NOT NULL DEFAULT 'synthetic_v1',
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_synthetic_opinions_listing
+    ON {schema}.synthetic_opinions (listing_id, overall DESC, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS {schema}.listing_opinion_summary (
+    listing_id text PRIMARY KEY,
+    n_opinions integer NOT NULL,
+    avg_cleanliness double precision NOT NULL,
+    avg_safety double precision NOT NULL,
+    avg_parking double precision NOT NULL,
+    avg_noise double precision NOT NULL,
+    avg_transit_access double precision NOT NULL,
+    avg_sunlight double precision NOT NULL,
+    avg_overall double precision NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- sort=opinion_overall reads this backwards
+CREATE INDEX IF NOT EXISTS ix_listing_opinion_summary_overall
+    ON {schema}.listing_opinion_summary (avg_overall, listing_id);
+
+INSERT INTO {schema}.listing_opinion_summary
+    (listing_id, n_opinions, avg_cleanliness, avg_safety, avg_parking, avg_noise,
+     avg_transit_access, avg_sunlight, avg_overall)
+SELECT listing_id, count(*), avg(cleanliness), avg(safety), avg(parking), avg(noise),
+       avg(transit_access), avg(sunlight), avg(overall)
+FROM {schema}.synthetic_opinions
+GROUP BY listing_id
+ON CONFLICT (listing_id) DO NOTHING;
@@ -0,0 +1,86 @@
+-- Latest row per listing as a real table. It replaces v_latest_listings (a
+-- DISTINCT ON over the whole history on every read) as the default Listing
+-- relation. backend/latest.py keeps it current: after a snapshot load only the
+-- listings in that snapshot are upserted.
+-- It copies every fact_listings column (geom included when present).
+
+CREATE TABLE IF NOT EXISTS {schema}.latest_listings AS
+SELECT DISTINCT ON (listing_id) *
+FROM {schema}.fact_listings
+ORDER BY listing_id, snapshot_date DESC;
+
+ALTER TABLE {schema}.latest_listings ADD PRIMARY KEY (listing_id);
+
+-- the search indexes of 0002-0004, on the latest table
+CREATE INDEX IF NOT EXISTS ix_latest_listings_price_id
+    ON {schema}.latest_listings (price, listing_id);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_m2_id
+    ON {schema}.latest_listings ((coalesce(square_m, 'Infinity'::float8)), listing_id);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_recent_id
+    ON {schema}.latest_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_city_recent
+    ON {schema}.latest_listings (lower(city), (coalesce(snapshot_date, '1970-01-01'::date)), listing_id);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_city_price
+    ON {schema}.latest_listings (lower(city), price, listing_id);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_city_type_rooms
+    ON {schema}.latest_listings (lower(city), type, rooms, price);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_square_m
+    ON {schema}.latest_listings (square_m);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_parking_recent
+    ON {schema}.latest_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id) WHERE has_parking_space;
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_balcony_recent
+    ON {schema}.latest_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id) WHERE has_balcony;
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_elevator_recent
+    ON {schema}.latest_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id) WHERE has_elevator;
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_security_recent
+    ON {schema}.latest_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id) WHERE has_security;
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_storage_recent
+    ON {schema}.latest_listings ((coalesce(snapshot_date, '1970-01-01'::date)), listing_id) WHERE has_storage_room;
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_school_distance
+    ON {schema}.latest_listings (school_distance);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_clinic_distance
+    ON {schema}.latest_listings (clinic_distance);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_post_office_distance
+    ON {schema}.latest_listings (post_office_distance);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_restaurant_distance
+    ON {schema}.latest_listings (restaurant_distance);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_college_distance
+    ON {schema}.latest_listings (college_distance);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_pharmacy_distance
+    ON {schema}.latest_listings (pharmacy_distance);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_kindergarten_distance
+    ON {schema}.latest_listings (kindergarten_distance);
+
+CREATE INDEX IF NOT EXISTS ix_latest_listings_lat_lng
+    ON {schema}.latest_listings (latitude, longitude);
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = '{schema}' AND table_name = 'latest_listings' AND column_name = 'geom'
+    ) THEN
+        EXECUTE 'CREATE INDEX IF NOT EXISTS ix_latest_listings_geom ON {schema}.latest_listings USING gist (geom)';
+    END IF;
+END
+$$;
+
+ANALYZE {schema}.latest_listings;
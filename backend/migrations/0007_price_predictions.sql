@@ -0,0 +1,12 @@
+-- Next-snapshot price predictions (backend/ml/price.py), one row per listing,
+-- snapshot and model version, so a new model or a new snapshot never reads a
+-- stale value. Filled by python -m backend.ml.price.
+
+CREATE TABLE IF NOT EXISTS {schema}.listing_price_predictions (
+    listing_id text NOT NULL,
+    snapshot_date date NOT NULL,
+    model_version text NOT NULL,
+    predicted_next_price double precision NOT NULL,
+    scored_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (listing_id, snapshot_date, model_version)
+);
@@ -0,0 +1,34 @@
+-- Monthly market statistics rolled up over city, type and rooms with GROUPING
+-- SETS (backend/market.py), so GET /stats/market reads a few rows by primary
+-- key instead of scanning fact_listings. level is GROUPING(city, type, rooms):
+-- bit 4 = all cities, 2 = all types, 1 = all room counts. Rolled-up (and
+-- missing) values are stored as '' / 0 so the key has no NULLs; level tells
+-- them apart. A snapshot load rewrites the rows of its month only.
+-- Filled by python -m backend.market.
+
+CREATE TABLE IF NOT EXISTS {schema}.market_stats (
+    level smallint NOT NULL,
+    city text NOT NULL,
+    type text NOT NULL,
+    rooms smallint NOT NULL,
+    month date NOT NULL,
+    n_listings integer NOT NULL,
+    avg_price double precision,
+    price_p10 double precision,
+    price_p25 double precision,
+    price_median double precision,
+    price_p75 double precision,
+    price_p90 double precision,
+    avg_price_m2 double precision,
+    price_m2_p10 double precision,
+    price_m2_p25 double precision,
+    price_m2_median double precision,
+    price_m2_p75 double precision,
+    price_m2_p90 double precision,
+    refreshed_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (level, city, type, rooms, month)
+);
+
+-- incremental refreshes delete one month across every level
+CREATE INDEX IF NOT EXISTS ix_market_stats_month
+    ON {schema}.market_stats (month);
@@ -0,0 +1,21 @@
+-- Per-listing price history as date-sorted parallel arrays (backend/history.py).
+-- It used to be created on the first refresh, so /listings?include_history=true
+-- failed on a missing relation until one had run. The backfill covers existing
+-- rows; after that, ingestion refreshes the listings of each new snapshot.
+
+CREATE TABLE IF NOT EXISTS {schema}.listing_price_history (
+    listing_id text PRIMARY KEY,
+    dates date[] NOT NULL,
+    prices double precision[] NOT NULL,
+    last_snapshot date NOT NULL
+);
+
+INSERT INTO {schema}.listing_price_history (listing_id, dates, prices, last_snapshot)
+SELECT f.listing_id,
+       array_agg(f.snapshot_date::date ORDER BY f.snapshot_date),
+       array_agg(f.price::float8 ORDER BY f.snapshot_date),
+       max(f.snapshot_date::date)
+FROM {schema}.fact_listings f
+WHERE f.price IS NOT NULL
+GROUP BY f.listing_id
+ON CONFLICT (listing_id) DO NOTHING;
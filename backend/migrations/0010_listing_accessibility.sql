@@ -0,0 +1,26 @@
+-- Per-city accessibility ranks of every current listing (backend/accessibility.py):
+-- 1 - percent_rank of each POI distance within the city, plus the equal-weight
+-- score that sort=accessibility reads off its index. It used to be created on
+-- the first refresh, so the accessibility filters and sort failed on a missing
+-- relation until one had run. Filled by python -m backend.accessibility and by
+-- ingestion for the cities of each new snapshot.
+
+CREATE TABLE IF NOT EXISTS {schema}.listing_accessibility (
+    listing_id text PRIMARY KEY,
+    city text NOT NULL,
+    centre double precision NOT NULL,
+    school double precision NOT NULL,
+    clinic double precision NOT NULL,
+    post_office double precision NOT NULL,
+    kindergarten double precision NOT NULL,
+    restaurant double precision NOT NULL,
+    college double precision NOT NULL,
+    pharmacy double precision NOT NULL,
+    default_score double precision NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_listing_accessibility_score
+    ON {schema}.listing_accessibility (default_score, listing_id);
+
+CREATE INDEX IF NOT EXISTS ix_listing_accessibility_city_score
+    ON {schema}.listing_accessibility (city, default_score);
@@ -0,0 +1,15 @@
+-- One-row counter of listing data loads (backend/snapshots.py). Ingestion bumps
+-- it after refreshing the derived tables, and API processes poll it to clear
+-- their caches. It replaces polling max(snapshot_date), which a backfilled
+-- older snapshot or a --force reload leaves unchanged.
+
+CREATE TABLE IF NOT EXISTS {schema}.data_version (
+    id smallint PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version bigint NOT NULL,
+    snapshot_date date,
+    published_at timestamptz NOT NULL DEFAULT now()
+);
+
+INSERT INTO {schema}.data_version (id, version, snapshot_date)
+SELECT 1, 0, max(snapshot_date) FROM {schema}.fact_listings
+ON CONFLICT (id) DO NOTHING;
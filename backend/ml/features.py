@@ -0,0 +1,251 @@
+"""Feature store for the price models: one Parquet partition per snapshot.
+
+Replaces the notebook's "SELECT * FROM fact_listings into one DataFrame, then
+groupby/shift over everything". fact_listings is streamed with a server-side
+cursor ordered by (listing_id, snapshot_date), CHUNK_ROWS at a time; a
+listing's rows never straddle two chunks (the tail listing is carried over), so
+prev_price / price_change / price_change_pct / days_since_prev are computed
+per chunk with a plain groupby-shift. Columns are stored compactly (float32,
+small nullable ints, categoricals) under
+
+    FEATURE_STORE_DIR/snapshot_date=YYYY-MM-DD/part-0.parquet
+
+A partition only depends on its own snapshot and earlier ones, so a new
+snapshot writes just its partition (streaming only the histories of the
+listings in it). next_price, which depends on the following snapshot, is
+attached when the training frame is loaded (load_training_frame).
+
+    python -m backend.ml.features              # build missing partitions
+    python -m backend.ml.features --full       # rebuild everything in one pass
+    python -m backend.ml.features --snapshot 2024-06-01
+"""
+import argparse
+import logging
+import shutil
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from backend.settings import settings
+from backend.ml.price import CAT_COLS, HAS_COLS
+
+try:  # optional: only the feature store needs it
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None
+
+log = logging.getLogger(__name__)
+
+CHUNK_ROWS = 100_000
+
+FLOAT_COLS = (
+    "square_m", "latitude", "longitude", "centre_distance", "school_distance", "clinic_distance",
+    "post_office_distance", "kindergarten_distance", "restaurant_distance", "college_distance",
+    "pharmacy_distance", "price",
+)
+# small integers, nullable
+INT_COLS = {"rooms": "Int8", "floor": "Int8", "floor_count": "Int8", "build_year": "Int16", "poi_count": "Int16"}
+
+SOURCE_COLS = ("listing_id", "snapshot_date") + CAT_COLS + HAS_COLS + FLOAT_COLS + tuple(INT_COLS)
+
+STREAM_SQL = """
+SELECT {cols}
+FROM {schema}.fact_listings
+{where}
+ORDER BY listing_id, snapshot_date
+"""
+
+# histories (up to and including the snapshot) of the listings present in it
+ONLY_SNAPSHOT = """WHERE snapshot_date <= CAST(:snapshot AS date)
+  AND listing_id IN (SELECT listing_id FROM {schema}.fact_listings WHERE snapshot_date = CAST(:snapshot AS date))"""
+
+
+def store_dir() -> Path:
+    return Path(settings.FEATURE_STORE_DIR)
+
+
+def partition_path(root: Path, snapshot_date) -> Path:
+    return root / f"snapshot_date={pd.Timestamp(snapshot_date).date().isoformat()}"
+
+
+def built_snapshots(root: Path) -> set[str]:
+    return {p.name.split("=", 1)[1] for p in root.glob("snapshot_date=*") if (p / "part-0.parquet").exists()}
+
+
+def db_snapshots(engine: Engine) -> list[str]:
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT DISTINCT snapshot_date FROM {settings.SCHEMA}.fact_listings ORDER BY 1"))
+        return [pd.Timestamp(r[0]).date().isoformat() for r in rows]
+
+
+def compute_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Compact dtypes + lag features for a chunk holding complete listing histories."""
+    df["snapshot_date"] = pd.to_datetime(df["snapshot_date"])
+    for c in FLOAT_COLS:
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype("float32")
+    for c, dtype in INT_COLS.items():
+        df[c] = pd.to_numeric(df[c], errors="coerce").round().astype(dtype)
+    for c in HAS_COLS:
+        df[c] = df[c].map({True: 1, False: 0}).fillna(0).astype("int8")
+    for c in CAT_COLS:
+        df[c] = df[c].astype("string").fillna("NA").astype("category")
+
+    g = df.groupby("listing_id", sort=False)
+    prev_price = g["price"].shift(1)
+    df["prev_price"] = prev_price.astype("float32")
+    df["price_change"] = (df["price"] - prev_price).astype("float32")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["price_change_pct"] = (df["price_change"] / prev_price).astype("float32")
+    df["days_since_prev"] = g["snapshot_date"].diff().dt.days.astype("Int16")
+    return df
+
+
+def stream_chunks(engine: Engine, snapshot_date=None, chunk_rows: int = CHUNK_ROWS):
+    """Yield feature frames of whole listing histories, chunk_rows rows at a time."""
+    schema = settings.SCHEMA
+    sql = STREAM_SQL.format(
+        cols=", ".join(SOURCE_COLS),
+        schema=schema,
+        where=ONLY_SNAPSHOT.format(schema=schema) if snapshot_date is not None else "",
+    )
+    params = {"snapshot": str(snapshot_date)} if snapshot_date is not None else {}
+    carry = None
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunk_rows) as conn:
+        result = conn.execute(text(sql), params)
+        for rows in result.partitions(chunk_rows):
+            df = pd.DataFrame(rows, columns=SOURCE_COLS)
+            if carry is not None:
+                df = pd.concat([carry, df], ignore_index=True)
+            # hold back the last listing: its next rows may be in the next chunk
+            last = df["listing_id"].iat[-1]
+            tail = df["listing_id"].eq(last)
+            carry = df[tail]
+            if (~tail).any():
+                yield compute_chunk(df[~tail].reset_index(drop=True))
+        if carry is not None and len(carry):
+            yield compute_chunk(carry.reset_index(drop=True))
+
+
+class PartitionWriter:
+    """One ParquetWriter per snapshot, written under a temp dir and moved into place on close."""
+
+    def __init__(self, root: Path, only: set[str] | None = None):
+        if pq is None:
+            raise RuntimeError("pyarrow is required for the feature store")
+        self.root = root
+        self.only = only
+        self.tmp = root / f".build-{int(time.time())}"
+        self.writers: dict[str, "pq.ParquetWriter"] = {}
+        self.counts: dict[str, int] = {}
+
+    def write(self, df: pd.DataFrame) -> None:
+        for snap, part in df.groupby(df["snapshot_date"].dt.date, sort=False):
+            key = snap.isoformat()
+            if self.only is not None and key not in self.only:
+                continue
+            table = pa.Table.from_pandas(part.drop(columns="snapshot_date"), preserve_index=False)
+            if key not in self.writers:
+                path = partition_path(self.tmp, key)
+                path.mkdir(parents=True, exist_ok=True)
+                self.writers[key] = pq.ParquetWriter(path / "part-0.parquet", table.schema, compression="zstd")
+            # categories differ between chunks: unify the dictionary schema
+            self.writers[key].write_table(table.cast(self.writers[key].schema))
+            self.counts[key] = self.counts.get(key, 0) + len(part)
+
+    def close(self) -> dict[str, int]:
+        for w in self.writers.values():
+            w.close()
+        for key in self.writers:
+            final = partition_path(self.root, key)
+            if final.exists():
+                shutil.rmtree(final)
+            partition_path(self.tmp, key).rename(final)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        return self.counts
+
+
+def build(engine: Engine, snapshot_date=None, root: Path | None = None, chunk_rows: int = CHUNK_ROWS) -> dict[str, int]:
+    """Write the partition of snapshot_date, or every partition when it is None."""
+    root = root or store_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    only = {pd.Timestamp(snapshot_date).date().isoformat()} if snapshot_date is not None else None
+    writer = PartitionWriter(root, only)
+    try:
+        for chunk in stream_chunks(engine, snapshot_date, chunk_rows):
+            writer.write(chunk)
+    except BaseException:
+        shutil.rmtree(writer.tmp, ignore_errors=True)
+        raise
+    counts = writer.close()
+    log.info("feature store: %d partition(s), %d rows written", len(counts), sum(counts.values()))
+    return counts
+
+
+def build_missing(engine: Engine, root: Path | None = None, chunk_rows: int = CHUNK_ROWS) -> dict[str, int]:
+    """Partitions for snapshots not in the store yet: one full pass if the store is
+    empty, otherwise one pass per new snapshot over just its listings' histories."""
+    root = root or store_dir()
+    have = built_snapshots(root)
+    missing = [s for s in db_snapshots(engine) if s not in have]
+    if not missing:
+        return {}
+    if not have:
+        return build(engine, None, root, chunk_rows)
+    counts: dict[str, int] = {}
+    for snap in missing:
+        counts.update(build(engine, snap, root, chunk_rows))
+    return counts
+
+
+def load_training_frame(root: Path | None = None, columns: list[str] | None = None,
+                        since: str | None = None) -> pd.DataFrame:
+    """Concatenate partitions (optionally from `since` on) and attach next_price,
+    the listing's price at its next snapshot, like the notebook's shift(-1)."""
+    root = root or store_dir()
+    frames = []
+    for path in sorted(root.glob("snapshot_date=*")):
+        snap = path.name.split("=", 1)[1]
+        if since and snap < since:
+            continue
+        df = pd.read_parquet(path / "part-0.parquet", columns=columns and list(dict.fromkeys(["listing_id", "price", *columns])))
+        df["snapshot_date"] = pd.Timestamp(snap)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    for c in CAT_COLS:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    df = df.sort_values(["listing_id", "snapshot_date"], kind="stable")
+    df["next_price"] = df.groupby("listing_id", sort=False)["price"].shift(-1)
+    return df.reset_index(drop=True)
+
+
+def main() -> None:
+    from backend.db import engine
+
+    ap = argparse.ArgumentParser(description="Build the per-snapshot Parquet feature store")
+    ap.add_argument("--full", action="store_true", help="rebuild every partition in one pass")
+    ap.add_argument("--snapshot", help="(re)build only this snapshot's partition (YYYY-MM-DD)")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    t0 = time.perf_counter()
+    if args.full:
+        counts = build(engine, None, chunk_rows=args.chunk_rows)
+    elif args.snapshot:
+        counts = build(engine, args.snapshot, chunk_rows=args.chunk_rows)
+    else:
+        counts = build_missing(engine, chunk_rows=args.chunk_rows)
+    for snap, n in sorted(counts.items()):
+        print(f"{snap}  {n:>9,} rows")
+    print(f"{len(counts)} partition(s), {sum(counts.values()):,} rows in {time.perf_counter() - t0:.1f}s -> {store_dir()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Next-snapshot price prediction with the CatBoost model from main/data_analysis.ipynb.
+
+The model is trained in the notebook (features: categoricals, has_* flags,
+numerics and the price-delta features; log1p target) and exported with
+save_model(), which writes the .cbm file plus a <path>.meta.json sidecar
+holding the feature order, the categorical columns, the training medians used
+to fill gaps and a model version. PRICE_MODEL_PATH points the API at it; the
+model is loaded once per process on first use.
+
+Predictions are keyed by (listing_id, snapshot_date, model_version):
+
+* realestate.listing_price_predictions holds them durably; the bulk job
+  (python -m backend.ml.price) scores the whole catalogue into it;
+* PricePredictor.predict() serves a page: in-memory hits first, then one query
+  that fetches the features of the remaining listings together with any
+  stored prediction, then a single batched predict for whatever is left.
+  predict_async() does the same from a request handler, with the model work
+  in a worker thread.
+  The in-memory layer only holds current-snapshot values and is dropped when a
+  new snapshot is published.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.settings import settings
+from backend import snapshots
+
+try:  # optional: only needed when a model is configured
+    from catboost import CatBoostRegressor, Pool
+except ImportError:  # pragma: no cover
+    CatBoostRegressor = Pool = None
+
+log = logging.getLogger(__name__)
+
+# feature groups of the next-price model in the notebook
+CAT_COLS = ("city", "type", "ownership", "building_material", "condition")
+HAS_COLS = ("has_parking_space", "has_balcony", "has_elevator", "has_security", "has_storage_room")
+NUM_COLS = (
+    "square_m", "rooms", "floor", "floor_count", "build_year", "latitude", "longitude",
+    "centre_distance", "poi_count", "school_distance", "clinic_distance", "post_office_distance",
+    "kindergarten_distance", "restaurant_distance", "college_distance", "pharmacy_distance",
+    "price", "price_change", "price_change_pct", "days_since_prev",
+)
+DELTA_COLS = ("price_change", "price_change_pct", "days_since_prev")
+FEATURE_COLS = CAT_COLS + HAS_COLS + NUM_COLS
+
+# listing columns plus the price history arrays for the delta features, and any
+# stored prediction for the current model version
+FEATURES_SQL = """
+SELECT l.listing_id, l.snapshot_date, {cols}, h.dates, h.prices, p.predicted_next_price
+FROM {schema}.{latest} l
+LEFT JOIN {schema}.listing_price_history h ON h.listing_id = l.listing_id
+LEFT JOIN {schema}.listing_price_predictions p
+       ON p.listing_id = l.listing_id AND p.snapshot_date = l.snapshot_date AND p.model_version = :version
+WHERE {where}
+ORDER BY l.listing_id {limit}
+"""
+
+UPSERT_SQL = """
+INSERT INTO {schema}.listing_price_predictions (listing_id, snapshot_date, model_version, predicted_next_price)
+VALUES (:listing_id, :snapshot_date, :model_version, :predicted_next_price)
+ON CONFLICT (listing_id, snapshot_date, model_version)
+DO UPDATE SET predicted_next_price = EXCLUDED.predicted_next_price, scored_at = now()
+"""
+
+
+def save_model(model, path: str, train_frame: pd.DataFrame, version: str | None = None) -> None:
+    """Write model + sidecar from the notebook; train_frame is the prepared X_train."""
+    model.save_model(path)
+    meta = {
+        "version": version or hashlib.sha256(Path(path).read_bytes()).hexdigest()[:12],
+        "feature_cols": list(train_frame.columns),
+        "cat_cols": [c for c in CAT_COLS if c in train_frame.columns],
+        "medians": {c: float(train_frame[c].median()) for c in train_frame.columns if c in NUM_COLS},
+    }
+    Path(f"{path}.meta.json").write_text(json.dumps(meta, indent=2))
+
+
+def _delta_features(snapshot_date, dates, prices, price) -> tuple:
+    """price_change, price_change_pct, days_since_prev against the snapshot before snapshot_date."""
+    if not dates or snapshot_date is None or price is None:
+        return None, None, None
+    current = pd.Timestamp(snapshot_date).date()
+    prev = [(d, p) for d, p in zip(dates, prices) if d < current]
+    if not prev:
+        return None, None, None
+    prev_date, prev_price = prev[-1]
+    change = price - prev_price
+    return change, (change / prev_price if prev_price else None), (current - prev_date).days
+
+
+class PriceModel:
+    def __init__(self, path: str):
+        if CatBoostRegressor is None:
+            raise RuntimeError("catboost is not installed")
+        self.model = CatBoostRegressor()
+        self.model.load_model(path)
+        meta_path = Path(f"{path}.meta.json")
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        self.version = meta.get("version") or hashlib.sha256(Path(path).read_bytes()).hexdigest()[:12]
+        self.feature_cols = meta.get("feature_cols") or list(FEATURE_COLS)
+        self.cat_cols = [c for c in (meta.get("cat_cols") or CAT_COLS) if c in self.feature_cols]
+        self.medians = meta.get("medians") or {}
+
+    def frame(self, rows: list[dict]) -> pd.DataFrame:
+        """Feature matrix prepared the way the notebook prepared training data."""
+        df = pd.DataFrame(rows)
+        for c in self.feature_cols:
+            if c not in df.columns:
+                df[c] = None
+        X = df[self.feature_cols].copy()
+        for c in self.feature_cols:
+            if c in self.cat_cols:
+                X[c] = X[c].astype("string").fillna("NA")
+            elif c in HAS_COLS:
+                X[c] = X[c].map({True: 1, False: 0}).fillna(0).astype("int8")
+            else:
+                col = pd.to_numeric(X[c], errors="coerce")
+                fill = self.medians.get(c, col.median())
+                X[c] = col.fillna(0.0 if pd.isna(fill) else fill).astype("float32")
+        return X
+
+    def predict(self, rows: list[dict]) -> np.ndarray:
+        if not rows:
+            return np.empty(0)
+        X = self.frame(rows)
+        pool = Pool(X, cat_features=[X.columns.get_loc(c) for c in self.cat_cols])
+        return np.expm1(self.model.predict(pool))
+
+
+class PricePredictor:
+    """Loads the configured model once and serves batched, cached predictions."""
+
+    def __init__(self, path: str | None, cache_size: int):
+        self.path = path
+        self.cache_size = cache_size
+        self._model: PriceModel | None = None
+        self._cache: OrderedDict = OrderedDict()  # (listing_id, model_version) -> price
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and CatBoostRegressor is not None
+
+    @property
+    def model(self) -> PriceModel:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = PriceModel(self.path)
+                    log.info("price model %s loaded from %s", self._model.version, self.path)
+        return self._model
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _features(self, db: Session, where: str, params: dict, limit: str = "") -> list[dict]:
+        sql = FEATURES_SQL.format(
+            schema=settings.SCHEMA,
+            latest=settings.VIEW_OR_TABLE,
+            cols=", ".join(f"l.{c}" for c in CAT_COLS + HAS_COLS + NUM_COLS if c not in DELTA_COLS),
+            where=where,
+            limit=limit,
+        )
+        rows = [dict(r._mapping) for r in db.execute(text(sql), dict(params, version=self.model.version))]
+        for r in rows:
+            r["price_change"], r["price_change_pct"], r["days_since_prev"] = _delta_features(
+                r["snapshot_date"], r.pop("dates"), r.pop("prices"), r["price"]
+            )
+        return rows
+
+    def _cached(self, listing_ids: list[str], version: str) -> tuple[dict[str, float], list[str]]:
+        out: dict[str, float] = {}
+        with self._lock:
+            for lid in listing_ids:
+                hit = self._cache.get((lid, version))
+                if hit is not None:
+                    self._cache.move_to_end((lid, version))
+                    out[lid] = hit
+        return out, [lid for lid in listing_ids if lid not in out]
+
+    def _score(self, rows: list[dict]) -> dict[str, float]:
+        """Stored predictions of rows plus one batched predict for the rest; cached."""
+        version = self.model.version
+        stored = {r["listing_id"]: r["predicted_next_price"] for r in rows if r["predicted_next_price"] is not None}
+        todo = [r for r in rows if r["listing_id"] not in stored]
+        fresh = dict(zip((r["listing_id"] for r in todo), map(float, self.model.predict(todo))))
+
+        computed = {**stored, **fresh}
+        with self._lock:
+            for lid, price in computed.items():
+                self._cache[(lid, version)] = price
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return computed
+
+    def predict(self, db: Session, listing_ids: list[str]) -> dict[str, float]:
+        """listing_id -> predicted next-snapshot price, one query and one predict call at most."""
+        out, missing = self._cached(listing_ids, self.model.version)
+        if missing:
+            rows = self._features(db, "l.listing_id = ANY(:ids)", {"ids": missing})
+            out.update(self._score(rows))
+        return out
+
+    async def predict_async(self, db: AsyncSession, listing_ids: list[str]) -> dict[str, float]:
+        """predict() for request handlers: the feature query runs on db, while loading
+        the model, building the frame and inference run in a worker thread, so they
+        don't block the event loop."""
+        model = await asyncio.to_thread(lambda: self.model)
+        out, missing = self._cached(listing_ids, model.version)
+        if missing:
+            rows = await db.run_sync(self._features, "l.listing_id = ANY(:ids)", {"ids": missing})
+            out.update(await asyncio.to_thread(self._score, rows))
+        return out
+
+    def score_catalogue(self, db: Session, batch_size: int = 20_000) -> int:
+        """Bulk job: predict every listing without a stored prediction for this
+        model version, batch_size listings per query/predict/upsert round."""
+        version, after, total = self.model.version, "", 0
+        while True:
+            rows = self._features(db, "l.listing_id > :after", {"after": after, "limit": batch_size}, "LIMIT :limit")
+            if not rows:
+                return total
+            after = rows[-1]["listing_id"]
+            todo = [r for r in rows if r["predicted_next_price"] is None]
+            if todo:
+                prices = self.model.predict(todo)
+                db.execute(text(UPSERT_SQL.format(schema=settings.SCHEMA)), [
+                    {"listing_id": r["listing_id"], "snapshot_date": r["snapshot_date"],
+                     "model_version": version, "predicted_next_price": float(p)}
+                    for r, p in zip(todo, prices)
+                ])
+                db.commit()
+                total += len(todo)
+            log.info("scored %d listings (up to %s)", total, after)
+
+
+predictor = PricePredictor(settings.PRICE_MODEL_PATH, settings.PREDICTION_CACHE_SIZE)
+
+
+@snapshots.subscribe
+def _clear_on_snapshot(_snapshot_date) -> None:
+    predictor.clear()
+
+
+def main() -> None:
+    from backend.db import SessionLocal
+
+    ap = argparse.ArgumentParser(description="Precompute next-price predictions for every listing")
+    ap.add_argument("--batch-size", type=int, default=20_000)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not predictor.enabled:
+        raise SystemExit("set PRICE_MODEL_PATH (and install catboost) first")
+
+    t0 = time.perf_counter()
+    with SessionLocal() as db:
+        n = predictor.score_catalogue(db, args.batch_size)
+    elapsed = time.perf_counter() - t0
+    print(f"scored {n:,} listings with model {predictor.model.version} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Nearest-neighbour index for "similar listings".
+
+Each listing becomes a z-scored feature vector (price per m², rooms, build
+year, position, centre and POI distances; missing values take the column
+median). Queries go to a scipy cKDTree when scipy is installed and to a
+vectorized brute-force scan otherwise; filtered queries (city/type) always
+scan the matching subset. The index is rebuilt in a background thread after
+each snapshot and swapped in whole.
+"""
+import logging
+import threading
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.models import Listing
+from backend import snapshots
+
+try:  # optional: exact KD-tree queries
+    from scipy.spatial import cKDTree
+except ImportError:  # pragma: no cover
+    cKDTree = None
+
+log = logging.getLogger(__name__)
+
+DISTANCE_COLUMNS = (
+    "centre_distance", "school_distance", "clinic_distance", "post_office_distance",
+    "kindergarten_distance", "restaurant_distance", "college_distance", "pharmacy_distance",
+)
+FEATURES = ("price_per_m2", "rooms", "build_year", "latitude", "longitude") + DISTANCE_COLUMNS
+
+# rows scored per block in brute-force batch queries (seeds x listings floats)
+_BLOCK = 256
+
+
+def _column(values) -> np.ndarray:
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+class SimilarityIndex:
+    def __init__(self, ids: list[str], cities: list, types: list, features: np.ndarray):
+        self.ids = np.array(ids, dtype=object)
+        self.pos = {lid: i for i, lid in enumerate(ids)}
+        self.cities = np.array([c.lower() if c else "" for c in cities], dtype=object)
+        self.types = np.array([t or "" for t in types], dtype=object)
+
+        # impute, then z-score so no feature dominates the metric
+        med = np.nanmedian(features, axis=0) if len(features) else np.zeros(features.shape[1])
+        med = np.where(np.isnan(med), 0.0, med)
+        x = np.where(np.isnan(features), med, features)
+        sd = x.std(axis=0) if len(x) else np.ones(x.shape[1])
+        self.x = ((x - x.mean(axis=0)) / np.where(sd > 1e-9, sd, 1.0)).astype(np.float32) if len(x) else x
+        self.sq = np.einsum("ij,ij->i", self.x, self.x)
+        self.tree = cKDTree(self.x) if cKDTree is not None and len(self.x) else None
+
+    @classmethod
+    def load(cls, db: Session) -> "SimilarityIndex":
+        cols = [getattr(Listing, c) for c in ("price", "square_m", "rooms", "build_year", "latitude", "longitude") + DISTANCE_COLUMNS]
+        rows = db.execute(select(Listing.listing_id, Listing.city, Listing.type, *cols)).all()
+        if not rows:
+            return cls([], [], [], np.empty((0, len(FEATURES))))
+        ids, cities, types, price, m2, *rest = zip(*rows)
+        price, m2 = _column(price), _column(m2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ppm2 = np.where(m2 > 0, price / m2, np.nan)
+        features = np.column_stack([ppm2] + [_column(c) for c in rest])
+        return cls(list(ids), list(cities), list(types), features)
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def _candidates(self, city: str | None, type_: str | None) -> np.ndarray | None:
+        if not city and not type_:
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        if city:
+            mask &= self.cities == city.lower()
+        if type_:
+            mask &= self.types == type_
+        return np.flatnonzero(mask)
+
+    def query(self, seeds: list[str], k: int, city: str | None = None, type_: str | None = None) -> dict[str, list[tuple[str, float]]]:
+        """seed listing_id -> [(listing_id, distance), ...] of its k nearest neighbours
+        (the seed itself excluded). Unknown seeds are left out of the result."""
+        known = [s for s in seeds if s in self.pos]
+        if not known:
+            return {}
+        seed_pos = np.array([self.pos[s] for s in known])
+        cand = self._candidates(city, type_)
+
+        if cand is None and self.tree is not None:
+            # a list for k keeps the output 2-D even when only one neighbour is asked for
+            dist, idx = self.tree.query(self.x[seed_pos], k=list(range(1, min(k + 1, self.size) + 1)))
+        else:
+            dist, idx = self._brute(seed_pos, k + 1, cand)
+
+        out = {}
+        for s, p, d_row, i_row in zip(known, seed_pos, dist, idx):
+            hits = [(self.ids[i], float(d)) for d, i in zip(d_row, i_row) if i != p and np.isfinite(d)]
+            out[s] = hits[:k]
+        return out
+
+    def _brute(self, seed_pos: np.ndarray, k: int, cand: np.ndarray | None) -> tuple[np.ndarray, np.ndarray]:
+        x = self.x if cand is None else self.x[cand]
+        sq = self.sq if cand is None else self.sq[cand]
+        k = min(k, len(x))
+        if k == 0:
+            return np.empty((len(seed_pos), 0)), np.empty((len(seed_pos), 0), dtype=np.int64)
+        dists, idxs = [], []
+        for start in range(0, len(seed_pos), _BLOCK):
+            q = self.x[seed_pos[start:start + _BLOCK]]
+            # |q - x|^2 = |q|^2 + |x|^2 - 2 q.x, one matrix product per block
+            d2 = np.einsum("ij,ij->i", q, q)[:, None] + sq[None, :] - 2.0 * (q @ x.T)
+            part = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            pd = np.take_along_axis(d2, part, axis=1)
+            order = np.argsort(pd, axis=1)
+            idx = np.take_along_axis(part, order, axis=1)
+            dists.append(np.sqrt(np.maximum(np.take_along_axis(pd, order, axis=1), 0.0)))
+            idxs.append(idx if cand is None else cand[idx])
+        return np.vstack(dists), np.vstack(idxs)
+
+
+class SimilarityService:
+    """Holds the current SimilarityIndex; rebuild() builds a new one and swaps it in."""
+
+    def __init__(self):
+        self.index: SimilarityIndex | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.index is not None
+
+    def _build(self) -> None:
+        from backend.db import ReadSessionLocal
+
+        with ReadSessionLocal() as db:
+            index = SimilarityIndex.load(db)
+        self.index = index
+        log.info("similarity index built over %d listings (kd-tree: %s)", index.size, index.tree is not None)
+
+    def rebuild(self) -> None:
+        if not self._lock.acquire(blocking=False):
+            return  # a rebuild is already running
+        try:
+            self._build()
+        finally:
+            self._lock.release()
+
+    def rebuild_in_background(self) -> None:
+        threading.Thread(target=self.rebuild, name="similarity-rebuild", daemon=True).start()
+
+    def query(self, seeds: list[str], k: int, city: str | None = None, type_: str | None = None):
+        if self.index is None:
+            # first query before the startup build finished: wait for it (or build)
+            with self._lock:
+                if self.index is None:
+                    self._build()
+        return self.index.query(seeds, k, city=city, type_=type_)
+
+
+similarity = SimilarityService()
+
+
+@snapshots.subscribe
+def _rebuild_on_snapshot(_snapshot_date) -> None:
+    similarity.rebuild_in_background()
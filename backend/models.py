@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, Boolean, text
+from sqlalchemy import Column, Integer, Float, String, Boolean, Date, text
 from sqlalchemy.orm import declarative_base
 from .settings import settings
 
@@ -25,7 +25,7 @@ class Listing(Base):
     has_elevator = Column(Boolean)
     has_security = Column(Boolean)
     has_storage_room = Column(Boolean)
-    snapshot_date = Column(String)
+    snapshot_date = Column(Date)
     school_distance   = Column(Float)
     clinic_distance   = Column(Float)
     post_office_distance = Column(Float)
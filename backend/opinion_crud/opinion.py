@@ -1,5 +1,8 @@
+from sqlalchemy import select, delete, func, exists, bindparam
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from backend.opinion_models.opinion import SyntheticOpinion
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.opinion_models.opinion import SyntheticOpinion, OpinionSummary
 from typing import List
 
 def get_opinions_by_listing(db: Session, listing_id: str) -> List[SyntheticOpinion]:
@@ -8,17 +11,100 @@ def get_opinions_by_listing(db: Session, listing_id: str) -> List[SyntheticOpini
              .order_by(SyntheticOpinion.overall.desc(), SyntheticOpinion.created_at.desc())
              .all())
 
-def upsert_many(db: Session, rows: list[dict]):
-    objs = []
-    for r in rows:
-        obj = db.query(SyntheticOpinion).get(r['opinion_id'])
-        if obj:
-            # optional: update text/overall if you want regeneration to overwrite
-            for k, v in r.items():
-                setattr(obj, k, v)
-        else:
-            obj = SyntheticOpinion(**r)
-            db.add(obj)
-        objs.append(obj)
+async def get_opinions_by_listing_async(db: AsyncSession, listing_id: str) -> List[SyntheticOpinion]:
+    res = await db.execute(
+        select(SyntheticOpinion)
+        .where(SyntheticOpinion.listing_id == listing_id)
+        .order_by(SyntheticOpinion.overall.desc(), SyntheticOpinion.created_at.desc())
+    )
+    return list(res.scalars().all())
+
+SUMMARY_SCORES = ("cleanliness", "safety", "parking", "noise", "transit_access", "sunlight", "overall")
+
+# rows per INSERT statement; SQLAlchemy renders each batch as one multi-row VALUES
+UPSERT_BATCH = 1000
+
+_WRITABLE = ("listing_id", "cleanliness", "safety", "parking", "noise", "transit_access",
+             "sunlight", "overall", "review_text", "source")
+
+async def get_opinions_by_listings_async(db: AsyncSession, listing_ids: list[str]) -> dict[str, list[SyntheticOpinion]]:
+    """Opinions of many listings in one query, grouped by listing (same order as the single-listing read)."""
+    res = await db.execute(
+        select(SyntheticOpinion)
+        .where(SyntheticOpinion.listing_id.in_(listing_ids))
+        .order_by(SyntheticOpinion.listing_id, SyntheticOpinion.overall.desc(), SyntheticOpinion.created_at.desc())
+    )
+    grouped: dict[str, list[SyntheticOpinion]] = {}
+    for op in res.scalars():
+        grouped.setdefault(op.listing_id, []).append(op)
+    return grouped
+
+async def get_summaries_async(db: AsyncSession, listing_ids: list[str]) -> dict[str, OpinionSummary]:
+    res = await db.execute(select(OpinionSummary).where(OpinionSummary.listing_id.in_(listing_ids)))
+    return {s.listing_id: s for s in res.scalars()}
+
+def _upsert_statement():
+    stmt = pg_insert(SyntheticOpinion)
+    return stmt.on_conflict_do_update(
+        index_elements=[SyntheticOpinion.opinion_id],
+        set_={c: getattr(stmt.excluded, c) for c in _WRITABLE},
+    )
+
+def _write_batches(db: Session, rows: list[dict], batch_size: int) -> int:
+    stmt = _upsert_statement()
+    written = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        db.execute(stmt, batch)
+        written += len(batch)
+    return written
+
+def _summary_upsert():
+    """INSERT ... SELECT of the per-listing averages for the listings in :ids, upserted."""
+    o = SyntheticOpinion
+    agg = (
+        select(o.listing_id, func.count(), *[func.avg(getattr(o, c)) for c in SUMMARY_SCORES])
+        .where(o.listing_id.in_(bindparam("ids", expanding=True)))
+        .group_by(o.listing_id)
+    )
+    cols = ["listing_id", "n_opinions"] + [f"avg_{c}" for c in SUMMARY_SCORES]
+    stmt = pg_insert(OpinionSummary).from_select(cols, agg)
+    return stmt.on_conflict_do_update(
+        index_elements=[OpinionSummary.listing_id],
+        set_={**{c: getattr(stmt.excluded, c) for c in cols[1:]}, "updated_at": func.now()},
+    )
+
+def refresh_summaries(db: Session, listing_ids, batch_size: int = UPSERT_BATCH) -> None:
+    """Recompute listing_opinion_summary for listing_ids from synthetic_opinions
+    (in the caller's transaction); listings left without opinions lose their row."""
+    ids = sorted(set(listing_ids))
+    stmt = _summary_upsert()
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        db.execute(stmt, {"ids": chunk})
+        db.execute(
+            delete(OpinionSummary)
+            .where(OpinionSummary.listing_id.in_(chunk))
+            .where(~exists().where(SyntheticOpinion.listing_id == OpinionSummary.listing_id))
+        )
+
+def upsert_many(db: Session, rows: list[dict], batch_size: int = UPSERT_BATCH) -> int:
+    """INSERT ... ON CONFLICT (opinion_id) DO UPDATE in batches; rows may span any
+    number of listings. One commit at the end; returns the number of rows written."""
+    written = _write_batches(db, rows, batch_size)
+    refresh_summaries(db, [r["listing_id"] for r in rows], batch_size)
     db.commit()
-    return objs
+    return written
+
+def replace_opinions(db: Session, listing_ids: list[str], rows: list[dict], batch_size: int = UPSERT_BATCH) -> int:
+    """Swap the opinions of listing_ids for rows in a single transaction, so readers
+    see either the old set or the new one, never an empty listing."""
+    try:
+        db.execute(delete(SyntheticOpinion).where(SyntheticOpinion.listing_id.in_(listing_ids)))
+        written = _write_batches(db, rows, batch_size)
+        refresh_summaries(db, listing_ids, batch_size)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return written
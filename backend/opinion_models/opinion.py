@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, SmallInteger, Text as SAText, TIMESTAMP
+from sqlalchemy import Column, Integer, Float, String, SmallInteger, Text as SAText, TIMESTAMP
 from sqlalchemy.schema import ForeignKey
 from sqlalchemy.sql import text as sa_text
 from backend.models import Base  # your Declarative Base
@@ -19,3 +19,19 @@ class SyntheticOpinion(Base):
     review_text     = Column(SAText, nullable=False)
     source          = Column(String, nullable=False, server_default=sa_text("'synthetic_v1'"))
     created_at      = Column(TIMESTAMP(timezone=True), nullable=False, server_default=sa_text("NOW()"))
+
+class OpinionSummary(Base):
+    """Per-listing averages of synthetic_opinions, rewritten with every opinion write."""
+    __tablename__ = "listing_opinion_summary"
+    __table_args__ = {"schema": "realestate"}
+
+    listing_id          = Column(String, primary_key=True)
+    n_opinions          = Column(Integer, nullable=False)
+    avg_cleanliness     = Column(Float, nullable=False)
+    avg_safety          = Column(Float, nullable=False)
+    avg_parking         = Column(Float, nullable=False)
+    avg_noise           = Column(Float, nullable=False)
+    avg_transit_access  = Column(Float, nullable=False)
+    avg_sunlight        = Column(Float, nullable=False)
+    avg_overall         = Column(Float, nullable=False)
+    updated_at          = Column(TIMESTAMP(timezone=True), nullable=False, server_default=sa_text("NOW()"))
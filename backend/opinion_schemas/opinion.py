@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import Literal
+from pydantic import BaseModel, Field
 
 class Opinion(BaseModel):
     opinion_id: str
@@ -16,3 +17,30 @@ class Opinion(BaseModel):
 class OpinionsResponse(BaseModel):
     listing_id: str
     opinions: list[Opinion]
+    # pending: generation is queued or running (HTTP 202, opinions empty); retry later
+    status: Literal["ready", "pending"] = "ready"
+
+class OpinionSummary(BaseModel):
+    n_opinions: int
+    avg_cleanliness: float
+    avg_safety: float
+    avg_parking: float
+    avg_noise: float
+    avg_transit_access: float
+    avg_sunlight: float
+    avg_overall: float
+
+class OpinionsBatchRequest(BaseModel):
+    listing_ids: list[str] = Field(..., min_length=1, max_length=100)
+    mode: Literal["full", "summary"] = "full"
+    n: int = Field(3, ge=1, le=10)
+    seed: int = 42
+
+class OpinionsBatchResponse(BaseModel):
+    mode: str
+    # full: listing_id -> opinions (generated on first use, like GET /{id}/opinions)
+    opinions: dict[str, list[Opinion]] = {}
+    # summary: listing_id -> averages; listings without opinions yet are omitted
+    summaries: dict[str, OpinionSummary] = {}
+    # full: listings whose opinions were still being generated when the response was sent
+    pending: list[str] = []
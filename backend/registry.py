@@ -0,0 +1,65 @@
+"""Process-wide registry of reflected tables.
+
+Reflection costs a round-trip to pg_catalog, so the tables the search path needs
+are reflected once at startup (see app lifespan) and reused by every request.
+Call registry.refresh(bind) after a schema change; the version bump also retires
+the cached search statements built against the old Table objects.
+"""
+import threading
+from sqlalchemy import MetaData, Table
+from .settings import settings
+
+
+class SchemaRegistry:
+    # the fact table (geo columns) and the relation Listing is mapped to
+    TABLES = tuple(dict.fromkeys(("fact_listings", settings.VIEW_OR_TABLE)))
+
+    def __init__(self, schema: str, tables=TABLES):
+        self.schema = schema
+        self.names = tuple(tables)
+        self.version = 0
+        self._tables: dict[str, Table] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return all(n in self._tables for n in self.names)
+
+    def load(self, bind) -> None:
+        """Reflect every registered table that isn't loaded yet."""
+        with self._lock:
+            missing = [n for n in self.names if n not in self._tables]
+            if not missing:
+                return
+            meta = MetaData(schema=self.schema)
+            for name in missing:
+                self._tables[name] = Table(name, meta, autoload_with=bind)
+            self.version += 1
+
+    def refresh(self, bind) -> None:
+        """Re-reflect everything, e.g. after a migration added columns."""
+        meta = MetaData(schema=self.schema)
+        fresh = {name: Table(name, meta, autoload_with=bind) for name in self.names}
+        with self._lock:
+            self._tables = fresh
+            self.version += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables = {}
+            self.version += 1
+
+    def table(self, name: str, bind=None) -> Table:
+        """Registered table by name; reflects lazily if startup loading was skipped."""
+        tbl = self._tables.get(name)
+        if tbl is None:
+            if bind is None:
+                raise KeyError(f"table {name!r} is not loaded in the schema registry")
+            if name not in self.names:
+                self.names += (name,)
+            self.load(bind)
+            tbl = self._tables[name]
+        return tbl
+
+
+registry = SchemaRegistry(settings.SCHEMA)
@@ -1,53 +1,148 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import delete
+import asyncio
+from concurrent.futures import Future
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text as sa_text
 import pandas as pd
 
-from backend.db import get_db
-from backend.opinion_schemas.opinion import OpinionsResponse, Opinion
-from backend.opinion_crud.opinion import get_opinions_by_listing, upsert_many
+from backend.db import get_async_db
+from backend.settings import settings
+from backend.opinion_schemas.opinion import (
+    OpinionsResponse, Opinion, OpinionSummary, OpinionsBatchRequest, OpinionsBatchResponse,
+)
+from backend.opinion_crud.opinion import (
+    get_opinions_by_listing_async, get_opinions_by_listings_async, get_summaries_async,
+    replace_opinions,
+)
 from backend.services.opinion_generator import synthesize_opinions
-from backend.opinion_models.opinion import SyntheticOpinion
+from backend.services.opinion_worker import opinion_worker, LISTING_SQL
+from backend.http_cache import response_cache, cache_key, invalidate_opinions
+from backend.instrumentation import span
+from backend import snapshots
 
 router = APIRouter(prefix="/listings", tags=["opinions"])
 
-# helper to load one listing row into a DataFrame
-def _load_listing_df(db: Session, listing_id: str) -> pd.DataFrame:
-    engine = db.get_bind()  # Session -> Engine
-    sql = sa_text("""
-        SELECT listing_id, city, type, square_m, rooms, floor, floor_count, build_year,
-               centre_distance, poi_count, has_parking_space, has_elevator, has_security
-        FROM realestate.v_latest_listings
-        WHERE listing_id = :listing_id
-        LIMIT 1
-    """)
-    return pd.read_sql(sql, engine, params={"listing_id": listing_id})
-
-@router.get("/{listing_id}/opinions", response_model=OpinionsResponse)
-def get_or_create_opinions(
+# seconds a client should wait before asking again for pending opinions
+RETRY_AFTER = 1
+
+
+class OpinionsPending(Exception):
+    """Generation is still running; the GET answers 202 and nothing is cached."""
+
+
+# only API processes subscribe: ingestion precomputes synchronously before it publishes
+@snapshots.subscribe
+def _precompute_new_snapshot(snapshot_date) -> None:
+    if settings.OPINION_PRECOMPUTE and snapshot_date is not None:
+        opinion_worker.precompute_in_background(snapshot_date)
+
+
+# helper to load one listing row into a DataFrame: the worker's query, so
+# regenerate sees the same columns from the same relation as batched generation
+async def _load_listing_df(db: AsyncSession, listing_id: str) -> pd.DataFrame:
+    sql = sa_text(LISTING_SQL.format(schema=settings.SCHEMA, latest=settings.VIEW_OR_TABLE))
+    res = await db.execute(sql, {"ids": [listing_id]})
+    return pd.DataFrame(res.all(), columns=list(res.keys()))
+
+# wait (up to timeout) on generation jobs; returns the listing ids still pending.
+# The jobs keep running either way, and a failed job re-raises here.
+async def _wait_for(futures: dict[str, Future], timeout: float) -> list[str]:
+    if timeout > 0 and futures:
+        with span("generate"):
+            await asyncio.wait([asyncio.wrap_future(f) for f in futures.values()], timeout=timeout)
+    for f in futures.values():
+        if f.done():
+            f.result()
+    return [lid for lid, f in futures.items() if not f.done()]
+
+@router.post("/opinions:batch", response_model=OpinionsBatchResponse)
+async def opinions_batch(
+    body: OpinionsBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Opinions (mode=full) or per-listing averages (mode=summary) for a page of listings.
+
+    full reads every listing's opinions in one query and hands the missing ones to the
+    opinion worker, waiting up to OPINION_WAIT_SECONDS; listings still generating
+    after that are listed under pending. summary reads the aggregate table only.
+    Everything is read from the primary: opinion writes invalidate cached
+    responses, and a lagging replica would hand the old state straight back."""
+    ids = list(dict.fromkeys(body.listing_ids))
+    if body.mode == "summary":
+        with span("read_summaries"):
+            summaries = await get_summaries_async(db, ids)
+        return {
+            "mode": "summary",
+            "summaries": {lid: OpinionSummary.model_validate(s, from_attributes=True) for lid, s in summaries.items()},
+        }
+
+    with span("read_opinions"):
+        grouped = await get_opinions_by_listings_async(db, ids)
+    missing = [lid for lid in ids if lid not in grouped]
+    pending = []
+    if missing:
+        futures = opinion_worker.submit_many(missing, body.n, body.seed)
+        pending = await _wait_for(futures, settings.OPINION_WAIT_SECONDS)
+        generated = [lid for lid in missing if lid not in pending]
+        if generated:
+            with span("read_opinions"):
+                grouped.update(await get_opinions_by_listings_async(db, generated))
+
+    return {
+        "mode": "full",
+        "opinions": {
+            lid: [Opinion.model_validate(o, from_attributes=True) for o in grouped.get(lid, [])]
+            for lid in ids
+        },
+        "pending": pending,
+    }
+
+@router.get(
+    "/{listing_id}/opinions",
+    response_model=OpinionsResponse,
+    responses={202: {"model": OpinionsResponse, "description": "opinions are being generated; retry later"}},
+)
+async def get_or_create_opinions(
+    request: Request,
     listing_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     n: int = Query(3, ge=1, le=10),
     seed: int = 42,
+    wait: bool = Query(True, description="wait up to OPINION_WAIT_SECONDS for generation instead of answering 202 at once"),
 ):
+    async def produce() -> bytes:
+        data = await _get_or_create(db, listing_id, n, seed, settings.OPINION_WAIT_SECONDS if wait else 0)
+        with span("serialize"):
+            return OpinionsResponse(**data).model_dump_json().encode()
+
+    key = cache_key(f"opinions:{listing_id}", n=n, seed=seed)
+    try:
+        return await response_cache.respond(request, key, produce)
+    except OpinionsPending:
+        body = OpinionsResponse(listing_id=listing_id, opinions=[], status="pending")
+        return JSONResponse(body.model_dump(), status_code=202, headers={"Retry-After": str(RETRY_AFTER)})
 
-    existing = get_opinions_by_listing(db, listing_id)
+async def _get_or_create(db: AsyncSession, listing_id: str, n: int, seed: int, timeout: float) -> dict:
+    """Read the listing's opinions; a miss joins (or queues) its generation job,
+    waits up to timeout for it and reads the result back. Raises OpinionsPending
+    if the job is still running.
+
+    db is the primary: the response is cached until the next opinion write, so
+    it must not come from a replica that has not seen that write yet."""
+    with span("read_opinions"):
+        existing = await get_opinions_by_listing_async(db, listing_id)
     if existing:
         return {
             "listing_id": listing_id,
             "opinions": [Opinion.model_validate(o, from_attributes=True) for o in existing],
         }
 
-
-    df = _load_listing_df(db, listing_id)
-    if df.empty:
-
-        return {"listing_id": listing_id, "opinions": []}
-
-    gen = synthesize_opinions(df, n_per_listing=n, seed=seed)  
-    upsert_many(db, gen.to_dict(orient="records"))
-    saved = get_opinions_by_listing(db, listing_id)
+    if await _wait_for({listing_id: opinion_worker.submit(listing_id, n, seed)}, timeout):
+        raise OpinionsPending(listing_id)
+    # written now, by this job or an earlier one; empty for an unknown listing
+    with span("read_opinions"):
+        saved = await get_opinions_by_listing_async(db, listing_id)
 
     return {
         "listing_id": listing_id,
@@ -55,24 +150,24 @@ def get_or_create_opinions(
     }
 
 @router.post("/{listing_id}/opinions:regenerate", response_model=OpinionsResponse)
-def regenerate(
+async def regenerate(
     listing_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     n: int = Query(3, ge=1, le=10),
     seed: int = 42,
 ):
-    df = _load_listing_df(db, listing_id)
+    with span("load_listings"):
+        df = await _load_listing_df(db, listing_id)
     if df.empty:
         return {"listing_id": listing_id, "opinions": []}
 
-    gen = synthesize_opinions(df, n_per_listing=n, seed=seed)
-
-
-    db.execute(delete(SyntheticOpinion).where(SyntheticOpinion.listing_id == listing_id))
-    db.commit()
-
-    upsert_many(db, gen.to_dict(orient="records"))
-    saved = get_opinions_by_listing(db, listing_id)
+    with span("generate"):
+        gen = synthesize_opinions(df, n_per_listing=n, seed=seed)
+    with span("upsert"):
+        await db.run_sync(replace_opinions, [listing_id], gen.to_dict(orient="records"))
+    invalidate_opinions(listing_id)
+    with span("read_opinions"):
+        saved = await get_opinions_by_listing_async(db, listing_id)
     return {
         "listing_id": listing_id,
         "opinions": [Opinion.model_validate(o, from_attributes=True) for o in saved],
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db import get_read_db
+from backend.crud import LISTING_COLUMNS
+from backend.models import Listing
+from backend.ml.similar import similarity
+from backend.serialization import LISTING_FIELDS
+from backend.schemas import SimilarResponse, SimilarBatchRequest, SimilarBatchResponse
+
+router = APIRouter(prefix="/listings", tags=["similar"])
+
+async def _hydrate(db: AsyncSession, neighbours: dict[str, list[tuple[str, float]]]) -> dict[str, list[dict]]:
+    """Attach listing fields to every (listing_id, distance) pair with one query."""
+    ids = {lid for hits in neighbours.values() for lid, _ in hits}
+    if not ids:
+        return {seed: [] for seed in neighbours}
+    res = await db.execute(select(*LISTING_COLUMNS).where(Listing.listing_id.in_(ids)))
+    rows = {r.listing_id: dict(zip(LISTING_FIELDS, r)) for r in res}
+    return {
+        seed: [dict(rows[lid], distance=d) for lid, d in hits if lid in rows]
+        for seed, hits in neighbours.items()
+    }
+
+@router.get("/{listing_id}/similar", response_model=SimilarResponse)
+async def similar_listings(
+    listing_id: str,
+    k: int = Query(20, ge=1, le=100),
+    city: str | None = None,
+    type: str | None = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    neighbours = await run_in_threadpool(similarity.query, [listing_id], k, city, type)
+    if listing_id not in neighbours:
+        raise HTTPException(status_code=404, detail="listing not found in the similarity index")
+    items = await _hydrate(db, neighbours)
+    return {"listing_id": listing_id, "items": items[listing_id]}
+
+@router.post("/similar:batch", response_model=SimilarBatchResponse)
+async def similar_listings_batch(
+    body: SimilarBatchRequest,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """k nearest neighbours for many seeds in one index query; unknown seeds are omitted."""
+    neighbours = await run_in_threadpool(similarity.query, body.listing_ids, body.k, body.city, body.type)
+    items = await _hydrate(db, neighbours)
+    return {"results": [{"listing_id": seed, "items": hits} for seed, hits in items.items()]}
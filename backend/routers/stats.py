@@ -0,0 +1,56 @@
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db import get_read_db
+from backend.market import DIMENSIONS, fetch_market_stats
+from backend.schemas import MarketStatsResponse
+from backend.serialization import dumps
+from backend.http_cache import response_cache, cache_key
+from backend import snapshots
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+def _month(value: str | None, name: str) -> date | None:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:7] + "-01")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be YYYY-MM")
+
+@router.get("/market", response_model=MarketStatsResponse)
+async def market_stats(
+    request: Request,
+    by: str | None = Query(None, description="comma-separated breakdown: " + ",".join(DIMENSIONS)),
+    city: str | None = None,
+    type: str | None = None,
+    rooms: int | None = None,
+    since: str | None = Query(None, description="first month, YYYY-MM"),
+    until: str | None = Query(None, description="last month, YYYY-MM"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Monthly price and price per m² statistics (count, mean, 10/25/50/75/90th
+    percentiles, month-over-month change of the medians) from the market_stats
+    rollup. One series per combination of the by dimensions; city/type/rooms
+    pin a dimension to one value, and the rest are aggregated over."""
+    dims = sorted({d.strip().lower() for d in by.split(",") if d.strip()}) if by else []
+    unknown = [d for d in dims if d not in DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown breakdown {', '.join(unknown)}; expected {', '.join(DIMENSIONS)}")
+    params = dict(
+        by=dims,
+        city=city.strip().lower() if city else None,
+        type_=type,
+        rooms=rooms,
+        since=_month(since, "since"),
+        until=_month(until, "until"),
+    )
+
+    async def produce() -> bytes:
+        return dumps({"by": dims, "items": await fetch_market_stats(db, **params)})
+
+    # the rollup changes with each snapshot, which clears the listings: namespace
+    await db.run_sync(snapshots.watch)
+    key = cache_key("listings:market", **params)
+    return await response_cache.respond(request, key, produce)
@@ -1,10 +1,15 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Union
+from .opinion_schemas.opinion import OpinionSummary
 
 class PricePoint(BaseModel):
     date: str
     price: float
 
+class PriceSeries(BaseModel):
+    dates: list[str]
+    prices: list[float]
+
 class ListingOut(BaseModel):
     listing_id: str
     city: Optional[str]
@@ -22,7 +27,7 @@ class ListingOut(BaseModel):
     has_elevator: Optional[bool]
     has_security: Optional[bool]
     has_storage_room: Optional[bool]
-    price_history: Optional[List[PricePoint]] = None 
+    price_history: Optional[Union[List[PricePoint], PriceSeries]] = None
     school_distance: float | None = None
     clinic_distance: float | None = None
     post_office_distance: float | None = None
@@ -30,6 +35,8 @@ class ListingOut(BaseModel):
     restaurant_distance: float | None = None
     college_distance: float | None = None
     pharmacy_distance: float | None = None
+    opinion_summary: Optional[OpinionSummary] = None
+    predicted_next_price: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -39,3 +46,66 @@ class ListingsResponse(BaseModel):
     page: int
     page_size: int
     total: int
+    total_is_estimate: bool = False
+    next_cursor: Optional[str] = None
+
+class Cluster(BaseModel):
+    cell: str
+    count: int
+    lat: float
+    lng: float
+    price_min: Optional[float]
+    price_median: Optional[float]
+    price_max: Optional[float]
+
+class ClustersResponse(BaseModel):
+    zoom: int
+    cell_size: float
+    bbox: list[float]
+    total: int
+    mode: str  # "clusters" | "listings"
+    clusters: list[Cluster]
+    items: list[ListingOut]
+
+class SimilarListing(ListingOut):
+    distance: float  # in the normalized feature space; smaller is more similar
+
+class SimilarResponse(BaseModel):
+    listing_id: str
+    items: list[SimilarListing]
+
+class SimilarBatchRequest(BaseModel):
+    listing_ids: list[str] = Field(..., min_length=1, max_length=1000)
+    k: int = Field(20, ge=1, le=100)
+    city: Optional[str] = None
+    type: Optional[str] = None
+
+class SimilarBatchResponse(BaseModel):
+    results: list[SimilarResponse]
+
+class MarketStats(BaseModel):
+    month: str
+    # None when the dimension is rolled up (all cities / types / room counts)
+    city: Optional[str] = None
+    type: Optional[str] = None
+    rooms: Optional[int] = None
+    n_listings: int
+    avg_price: Optional[float]
+    price_p10: Optional[float]
+    price_p25: Optional[float]
+    price_median: Optional[float]
+    price_p75: Optional[float]
+    price_p90: Optional[float]
+    avg_price_m2: Optional[float]
+    price_m2_p10: Optional[float]
+    price_m2_p25: Optional[float]
+    price_m2_median: Optional[float]
+    price_m2_p75: Optional[float]
+    price_m2_p90: Optional[float]
+    # relative change against the previous month of the same series (0.02 = +2%)
+    price_median_mom: Optional[float] = None
+    price_m2_median_mom: Optional[float] = None
+
+class MarketStatsResponse(BaseModel):
+    by: list[str]
+    items: list[MarketStats]
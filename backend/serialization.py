@@ -0,0 +1,215 @@
+"""Single-pass JSON encoding for listing pages.
+
+Rows arrive from the page query as plain tuples in LISTING_FIELDS order; they
+are zipped into dicts (or transposed into columns) and encoded to bytes once,
+without building ORM objects or Pydantic models. orjson is used when
+installed, with the stdlib json module as the fallback. The export encoders
+write the same fields as NDJSON, CSV or an Arrow IPC stream, one streamed
+batch at a time.
+"""
+import csv
+import io
+import json
+import typing
+from .schemas import ListingOut, OpinionSummary
+
+try:  # optional fast encoder
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:  # optional: only format=arrow exports need it
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pa = None
+
+# wire fields of a listing, in the order the page query selects them
+# (fields filled after the query are left out)
+ATTACHED_FIELDS = ("price_history", "opinion_summary", "predicted_next_price")
+LISTING_FIELDS = tuple(f for f in ListingOut.model_fields if f not in ATTACHED_FIELDS)
+_ID = LISTING_FIELDS.index("listing_id")
+
+# opinion summary fields, selected after sort_key when a page includes them
+SUMMARY_FIELDS = tuple(OpinionSummary.model_fields)
+
+
+def _summary(values):
+    return dict(zip(SUMMARY_FIELDS, values)) if values[0] is not None else None
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), default=str).encode()
+
+
+def encode_listings_page(
+    rows,
+    *,
+    page: int,
+    page_size: int,
+    total: int,
+    total_is_estimate: bool,
+    next_cursor: str | None,
+    histories: dict | None = None,
+    empty_history=None,
+    columnar: bool = False,
+    opinion_summaries: bool = False,
+    predictions: dict | None = None,
+) -> bytes:
+    """Encode a /listings page. rows are tuples whose first len(LISTING_FIELDS)
+    values are the listing fields; histories (if given) is listing_id -> history,
+    with empty_history used for listings that have none. With opinion_summaries
+    the values after sort_key are the SUMMARY_FIELDS. predictions (if given) is
+    listing_id -> predicted_next_price."""
+    n = len(LISTING_FIELDS)
+    meta = {
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "next_cursor": next_cursor,
+    }
+
+    if columnar:
+        cols = list(zip(*rows)) if rows else [()] * n
+        columns = {f: list(cols[i]) for i, f in enumerate(LISTING_FIELDS)}
+        if histories is not None:
+            columns["price_history"] = [histories.get(lid, empty_history) for lid in columns["listing_id"]]
+        if opinion_summaries:
+            columns["opinion_summary"] = [_summary(r[n + 1:]) for r in rows]
+        if predictions is not None:
+            columns["predicted_next_price"] = [predictions.get(lid) for lid in columns["listing_id"]]
+        return dumps({"columns": columns, **meta})
+
+    if histories is None:
+        items = [dict(zip(LISTING_FIELDS, r[:n]), price_history=None) for r in rows]
+    else:
+        items = [
+            dict(zip(LISTING_FIELDS, r[:n]), price_history=histories.get(r[_ID], empty_history))
+            for r in rows
+        ]
+    if opinion_summaries:
+        for item, r in zip(items, rows):
+            item["opinion_summary"] = _summary(r[n + 1:])
+    if predictions is not None:
+        for item, r in zip(items, rows):
+            item["predicted_next_price"] = predictions.get(r[_ID])
+    return dumps({"items": items, **meta})
+
+
+# ---- bulk export (GET /listings/export) -------------------------------------
+# Each encoder turns one batch of streamed rows into bytes; header/footer frame
+# the whole stream. histories is listing_id -> [{date, price}, ...] or None.
+
+class NdjsonEncoder:
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def __init__(self, with_history: bool):
+        self.with_history = with_history
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows, histories: dict | None) -> bytes:
+        n = len(LISTING_FIELDS)
+        out = []
+        for r in rows:
+            item = dict(zip(LISTING_FIELDS, r[:n]))
+            if self.with_history:
+                item["price_history"] = histories.get(r[_ID], [])
+            out.append(dumps(item))
+        out.append(b"")
+        return b"\n".join(out)
+
+    def footer(self) -> bytes:
+        return b""
+
+
+class CsvEncoder(NdjsonEncoder):
+    media_type = "text/csv; charset=utf-8"
+    extension = "csv"
+
+    def header(self) -> bytes:
+        return self._lines([LISTING_FIELDS + (("price_history",) if self.with_history else ())])
+
+    def encode(self, rows, histories: dict | None) -> bytes:
+        n = len(LISTING_FIELDS)
+        if not self.with_history:
+            return self._lines(r[:n] for r in rows)
+        # the history goes into one JSON-encoded cell
+        return self._lines(tuple(r[:n]) + (dumps(histories.get(r[_ID], [])).decode(),) for r in rows)
+
+    @staticmethod
+    def _lines(rows) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerows(rows)
+        return buf.getvalue().encode()
+
+
+class _Chunks:
+    """Write-only file object collecting what the Arrow stream writer emits."""
+    closed = False
+
+    def __init__(self):
+        self.parts: list[bytes] = []
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def _arrow_type(annotation):
+    """Arrow type of a ListingOut field annotation (Optional[...] / X | None)."""
+    base = next((a for a in typing.get_args(annotation) if a is not type(None)), annotation)
+    return {str: pa.string(), int: pa.int64(), float: pa.float64(), bool: pa.bool_()}[base]
+
+
+class ArrowEncoder(NdjsonEncoder):
+    """Arrow IPC stream: one record batch per streamed batch (needs pyarrow)."""
+    media_type = "application/vnd.apache.arrow.stream"
+    extension = "arrow"
+
+    def __init__(self, with_history: bool):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for format=arrow")
+        super().__init__(with_history)
+        fields = [pa.field(f, _arrow_type(ListingOut.model_fields[f].annotation)) for f in LISTING_FIELDS]
+        if with_history:
+            fields.append(pa.field("price_history", pa.list_(pa.struct([("date", pa.string()), ("price", pa.float64())]))))
+        self.schema = pa.schema(fields)
+        self.sink = _Chunks()
+        self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    def _take(self) -> bytes:
+        return self.sink.take()
+
+    def header(self) -> bytes:
+        return self._take()
+
+    def encode(self, rows, histories: dict | None) -> bytes:
+        n = len(LISTING_FIELDS)
+        cols = list(zip(*rows)) if rows else [()] * n
+        arrays = [pa.array(list(cols[i]), type=self.schema.field(i).type) for i in range(n)]
+        if self.with_history:
+            arrays.append(pa.array([histories.get(lid, []) for lid in cols[_ID]], type=self.schema.field(n).type))
+        self.writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        return self._take()
+
+    def footer(self) -> bytes:
+        self.writer.close()
+        return self._take()
+
+
+EXPORT_ENCODERS = {"ndjson": NdjsonEncoder, "csv": CsvEncoder, "arrow": ArrowEncoder}
@@ -1,34 +1,79 @@
+"""Synthetic opinions (six aspect scores, an overall score and a short review) per listing.
+
+A listing's opinions depend only on that listing, n and `seed`, never on which
+other listings are generated with it: the worker batches listings, regenerate
+does one, and both must write the same rows.
+
+* features are normalized against fixed catalogue statistics (NORMS), not
+  against the batch, and missing values default to those means;
+* the draws come from a counter-based stream keyed by (seed, listing_id):
+  opinion j of a listing reads DRAWS_PER_OPINION uniforms at positions
+  j * DRAWS_PER_OPINION.. of its own stream, laid out as
+
+    jitter   normal(0, 0.6)  6 (12 uniforms)   cleanliness..sunlight
+    overall  normal(0, 0.4)  1 (2 uniforms)
+    order    uniform         7                 argsort -> phrase order
+
+synthesize_opinions works on whole matrices; synthesize_opinions_reference is
+the per-opinion loop over the same draws and is kept as the readable spec
+(bench/opinions.py checks the two agree).
+"""
+import hashlib
 import numpy as np
 import pandas as pd
-from numpy.random import default_rng
+
+ASPECTS = ("cleanliness", "safety", "parking", "noise", "transit_access", "sunlight")
+
+# (score <= 2, score == 3, score >= 4) per part; noise reads the other way round
+PHRASES = (
+    ("Needed better cleaning", "Fairly clean overall", "Spotlessly clean"),
+    ("Area felt a bit sketchy", "Felt safe most of the time", "Very safe and calm"),
+    ("Parking was a headache", "Parking was manageable", "Lots of parking available"),
+    ("A bit noisy", "Noise ok", "Not too noisy"),
+    ("Hard to reach without a car", "Decent public transport", "Excellent public transport"),
+    ("A bit dark inside", "Gets decent daylight", "Bright with great natural light"),
+    ("Mixed feelings overall", "Solid overall experience", "Would gladly recommend"),
+)
+
+OVERALL_WEIGHTS = (0.2, 0.2, 0.2, 0.15, 0.15, 0.1)  # noise enters as (6 - noise)
+
+# (mean, sd) of the apartments_pl snapshots; fixed so that a listing's scores
+# do not move with the rest of the batch
+NORMS = {
+    'build_year': (1985.0, 33.0),
+    'poi_count': (20.0, 24.0),
+    'centre_distance': (4.3, 2.8),
+}
+DEFAULTS = {
+    'build_year': NORMS['build_year'][0],
+    'centre_distance': NORMS['centre_distance'][0],
+    'poi_count': NORMS['poi_count'][0],
+    'has_parking_space': False,
+    'has_elevator': False,
+    'has_security': False,
+    'floor': 1,
+    'floor_count': 5,
+}
+
+DRAWS_PER_OPINION = 2 * len(ASPECTS) + 2 + len(PHRASES)
 
 def _clip_round(x, lo=1, hi=5): return int(max(lo, min(hi, round(x))))
-def _zscore(s: pd.Series):
-    s = s.astype(float)
-    m, sd = s.mean(), s.std(ddof=0)
-    return (s - m) / (sd if sd > 1e-9 else 1.0)
+def _zscore(s: pd.Series, col: str):
+    m, sd = NORMS[col]
+    return (s.astype(float) - m) / sd
 
-def synthesize_opinions(df_listings: pd.DataFrame, n_per_listing: int = 3, seed: int = 42) -> pd.DataFrame:
-    rng = default_rng(seed)
+def _base_scores(df_listings: pd.DataFrame) -> np.ndarray:
+    """Expected aspect scores before jitter, shape (N, 6) in ASPECTS order."""
     df = df_listings.copy()
 
-    for col, default in [
-        ('build_year', 1995),
-        ('centre_distance', df_listings.get('centre_distance', pd.Series([2.5])).fillna(2.5).mean()),
-        ('poi_count', df_listings.get('poi_count', pd.Series([10])).fillna(10).mean()),
-        ('has_parking_space', False),
-        ('has_elevator', False),
-        ('has_security', False),
-        ('floor', 1),
-        ('floor_count', df_listings.get('floor_count', pd.Series([5])).fillna(5).mean()),
-    ]:
+    for col, default in DEFAULTS.items():
         if col not in df.columns:
             df[col] = default
         df[col] = df[col].fillna(default)
 
-    z_build = _zscore(df['build_year'])
-    z_poi   = _zscore(df['poi_count'])
-    z_center= -_zscore(df['centre_distance'])
+    z_build = _zscore(df['build_year'], 'build_year')
+    z_poi   = _zscore(df['poi_count'], 'poi_count')
+    z_center= -_zscore(df['centre_distance'], 'centre_distance')
 
     base_cleanliness = 3.2 + 0.5 * z_build
     base_safety      = 3.0 + 0.3 * z_build + 0.4 * df['has_security'].astype(int)
@@ -37,37 +82,106 @@ def synthesize_opinions(df_listings: pd.DataFrame, n_per_listing: int = 3, seed:
     base_transit     = 2.8 + 0.8 * z_center + 0.3 * z_poi
     base_sunlight    = 2.9 + 0.5 * (df['floor'] / (df['floor_count'].replace(0,1))) + 0.2 * df['has_elevator'].astype(int)
 
-    def jitter(): return rng.normal(0, 0.6)
+    return np.column_stack([
+        np.asarray(s, dtype=np.float64)
+        for s in (base_cleanliness, base_safety, base_parking, base_noise, base_transit, base_sunlight)
+    ])
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    # uint64 arithmetic wraps, which is what the mixer relies on
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def listing_keys(listing_ids, seed: int) -> np.ndarray:
+    """Stream key per listing: a stable 64-bit hash of (seed, listing_id)."""
+    return np.array([
+        int.from_bytes(hashlib.blake2b(f"{seed}:{lid}".encode(), digest_size=8).digest(), "little")
+        for lid in listing_ids
+    ], dtype=np.uint64)
+
+def _uniforms(keys: np.ndarray, n_per_listing: int) -> np.ndarray:
+    """(N, n, DRAWS_PER_OPINION) uniforms in [0, 1); row i depends on keys[i] only."""
+    pos = np.arange(n_per_listing * DRAWS_PER_OPINION, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        bits = _splitmix64(_splitmix64(keys)[:, None] ^ pos[None, :])
+    u = (bits >> np.uint64(11)).astype(np.float64) * 2.0**-53
+    return u.reshape(len(keys), n_per_listing, DRAWS_PER_OPINION)
+
+def _normals(u1: np.ndarray, u2: np.ndarray) -> np.ndarray:
+    # Box-Muller; 1 - u1 keeps the log argument in (0, 1]
+    return np.sqrt(-2.0 * np.log1p(-u1)) * np.cos(2.0 * np.pi * u2)
+
+def _draws(seed: int, listing_ids, n_per_listing: int):
+    u = _uniforms(listing_keys(listing_ids, seed), n_per_listing)
+    k = len(ASPECTS)
+    jitter = 0.6 * _normals(u[..., 0:k], u[..., k:2*k])
+    overall_noise = 0.4 * _normals(u[..., 2*k], u[..., 2*k + 1])
+    order = u[..., 2*k + 2:].argsort(axis=-1)
+    return jitter, overall_noise, order
+
+def synthesize_opinions(df_listings: pd.DataFrame, n_per_listing: int = 3, seed: int = 42) -> pd.DataFrame:
+    n_listings = len(df_listings)
+    base = _base_scores(df_listings)
+    jitter, overall_noise, order = _draws(seed, df_listings['listing_id'], n_per_listing)
+
+    # (N, n, 6) aspect scores; np.rint rounds half to even like round()
+    scores = np.clip(np.rint(base[:, None, :] + jitter), 1, 5).astype(np.int64)
+    cl, sa, pk, nz, tr, su = (scores[..., k] for k in range(len(ASPECTS)))
+    w = OVERALL_WEIGHTS
+    overall = w[0]*cl + w[1]*sa + w[2]*pk + w[3]*(6-nz) + w[4]*tr + w[5]*su + overall_noise
+    overall = np.clip(np.rint(overall), 1, 5).astype(np.int64)
+
+    # phrase level 0/1/2 for <=2 / 3 / >=4, then phrase text by fancy indexing
+    all_scores = np.concatenate([scores, overall[..., None]], axis=-1).reshape(-1, len(PHRASES))
+    level = (all_scores >= 3).astype(np.int64) + (all_scores >= 4)
+    table = np.array(PHRASES, dtype=object)                        # (7, 3)
+    parts = table[np.arange(len(PHRASES)), level]                  # (M, 7)
+    parts = np.take_along_axis(parts, order.reshape(-1, len(PHRASES)), axis=1)
+    text = parts[:, 0]
+    for k in range(1, len(PHRASES)):
+        text = text + " " + parts[:, k]
+    text = text + "."
+
+    ids = df_listings['listing_id'].to_numpy(dtype=object)
+    listing_ids = np.repeat(ids, n_per_listing)
+    suffixes = np.array([f"-{j+1}" for j in range(n_per_listing)], dtype=object)
+    flat = scores.reshape(-1, len(ASPECTS))
+
+    out = pd.DataFrame({
+        'listing_id': listing_ids,
+        'opinion_id': listing_ids.astype(str).astype(object) + np.tile(suffixes, n_listings),
+        **{name: flat[:, k] for k, name in enumerate(ASPECTS)},
+        'overall': overall.reshape(-1),
+        'review_text': text,
+        'source': 'synthetic_v1',
+    })
+    return out
+
+def synthesize_opinions_reference(df_listings: pd.DataFrame, n_per_listing: int = 3, seed: int = 42) -> pd.DataFrame:
+    """One opinion at a time over the same draws as synthesize_opinions."""
+    base = _base_scores(df_listings)
+    jitter, overall_noise, order = _draws(seed, df_listings['listing_id'], n_per_listing)
 
     def pick_phrase(score, low, mid, high):
         return low if score <= 2 else (mid if score == 3 else high)
 
     rows = []
-    for idx, row in df.iterrows():
+    for i, listing_id in enumerate(df_listings['listing_id']):
         for j in range(n_per_listing):
-            cl = _clip_round(base_cleanliness.loc[idx] + jitter())
-            sa = _clip_round(base_safety.loc[idx]      + jitter())
-            pk = _clip_round(base_parking.loc[idx]     + jitter())
-            nz = _clip_round(base_noise.loc[idx]       + jitter())
-            tr = _clip_round(base_transit.loc[idx]     + jitter())
-            su = _clip_round(base_sunlight.loc[idx]    + jitter())
-            overall = _clip_round(0.2*cl + 0.2*sa + 0.2*pk + 0.15*(6-nz) + 0.15*tr + 0.1*su + np.random.normal(0,0.4))
+            cl, sa, pk, nz, tr, su = (_clip_round(base[i, k] + jitter[i, j, k]) for k in range(len(ASPECTS)))
+            overall = _clip_round(0.2*cl + 0.2*sa + 0.2*pk + 0.15*(6-nz) + 0.15*tr + 0.1*su + overall_noise[i, j])
 
             parts = [
-                pick_phrase(cl, "Needed better cleaning", "Fairly clean overall", "Spotlessly clean"),
-                pick_phrase(sa, "Area felt a bit sketchy", "Felt safe most of the time", "Very safe and calm"),
-                pick_phrase(pk, "Parking was a headache", "Parking was manageable", "Lots of parking available"),
-                "Not too noisy" if nz >= 4 else ("Noise ok" if nz == 3 else "A bit noisy"),
-                pick_phrase(tr, "Hard to reach without a car", "Decent public transport", "Excellent public transport"),
-                pick_phrase(su, "A bit dark inside", "Gets decent daylight", "Bright with great natural light"),
-                pick_phrase(overall, "Mixed feelings overall", "Solid overall experience", "Would gladly recommend")
+                pick_phrase(score, *phrases)
+                for score, phrases in zip((cl, sa, pk, nz, tr, su, overall), PHRASES)
             ]
-            np.random.shuffle(parts)
-            text = " ".join(parts) + "."
+            text = " ".join(parts[k] for k in order[i, j]) + "."
 
             rows.append({
-                'listing_id': row['listing_id'],
-                'opinion_id': f"{row['listing_id']}-{j+1}",
+                'listing_id': listing_id,
+                'opinion_id': f"{listing_id}-{j+1}",
                 'cleanliness': cl, 'safety': sa, 'parking': pk, 'noise': nz,
                 'transit_access': tr, 'sunlight': su, 'overall': overall,
                 'review_text': text, 'source': 'synthetic_v1'
@@ -0,0 +1,219 @@
+"""Background opinion generation: an in-process job queue with per-listing single-flight.
+
+GET /listings/{id}/opinions used to generate on a miss inside the request, so
+concurrent first views of a new listing all generated and raced on the same
+opinion ids. Now a miss submits a job here:
+
+* submit() returns the Future of the job already in flight for that listing,
+  or queues a new one: however many requests arrive, a listing is generated
+  once;
+* OPINION_WORKERS threads take jobs off the queue in batches of up to
+  OPINION_BATCH listings: one query loads the listings, synthesize_opinions
+  runs once per (n, seed) over the whole batch and everything is written
+  with one upsert_many; listings that already have opinions are skipped;
+* the request waits up to OPINION_WAIT_SECONDS on the Future and otherwise
+  answers 202 with status "pending".
+
+precompute(snapshot_date) pushes every listing of a snapshot that has no
+opinions yet through the same queue and blocks until they are written, so
+first views find them ready:
+
+    python -m backend.services.opinion_worker 2024-06-01
+    python -m backend.ingest /data --opinions          # after loading
+
+With OPINION_PRECOMPUTE=true ingestion does this for every new snapshot, and an
+API process does it in the background when it notices one (routers/opinion.py).
+"""
+import argparse
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import NamedTuple
+import pandas as pd
+from sqlalchemy import text
+
+from backend.settings import settings
+from backend.services.opinion_generator import synthesize_opinions
+
+log = logging.getLogger(__name__)
+
+# newest row per listing: DISTINCT ON makes that hold whether VIEW_OR_TABLE is
+# latest_listings (a no-op) or the full fact_listings; routers/opinion.py uses it too
+LISTING_SQL = """
+SELECT DISTINCT ON (listing_id)
+       listing_id, city, type, square_m, rooms, floor, floor_count, build_year,
+       centre_distance, poi_count, has_parking_space, has_elevator, has_security
+FROM {schema}.{latest}
+WHERE listing_id = ANY(:ids)
+ORDER BY listing_id, snapshot_date DESC
+"""
+
+HAVE_OPINIONS_SQL = """
+SELECT DISTINCT listing_id FROM {schema}.synthetic_opinions WHERE listing_id = ANY(:ids)
+"""
+
+# listings of a snapshot without opinions, keyset-paged by listing_id
+SNAPSHOT_TODO_SQL = """
+SELECT f.listing_id
+FROM {schema}.fact_listings f
+WHERE f.snapshot_date = CAST(:snapshot AS date) AND f.listing_id > :after
+  AND NOT EXISTS (SELECT 1 FROM {schema}.synthetic_opinions o WHERE o.listing_id = f.listing_id)
+ORDER BY f.listing_id
+LIMIT :limit
+"""
+
+
+class Job(NamedTuple):
+    listing_id: str
+    n: int
+    seed: int
+    future: Future  # resolves to the number of opinions written (0: already had some, or unknown listing)
+
+
+class OpinionWorker:
+    def __init__(self, workers: int, batch_size: int):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._queue: queue.Queue[Job] = queue.Queue()
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        for i in range(max(1, self.workers)):
+            t = threading.Thread(target=self._run, name=f"opinion-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, listing_id: str, n: int = 3, seed: int = 42) -> Future:
+        """The in-flight job for listing_id, or a newly queued one."""
+        return self.submit_many([listing_id], n, seed)[listing_id]
+
+    def submit_many(self, listing_ids: list[str], n: int = 3, seed: int = 42) -> dict[str, Future]:
+        futures = {}
+        with self._lock:
+            self._ensure_started()
+            for lid in dict.fromkeys(listing_ids):
+                fut = self._inflight.get(lid)
+                if fut is None:
+                    fut = self._inflight[lid] = Future()
+                    self._queue.put(Job(lid, n, seed, fut))
+                futures[lid] = fut
+        return futures
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch: list[Job]) -> None:
+        from backend.db import SessionLocal
+        from backend.opinion_crud.opinion import upsert_many
+        from backend.http_cache import invalidate_opinions
+
+        t0 = time.perf_counter()
+        schema = settings.SCHEMA
+        try:
+            ids = [j.listing_id for j in batch]
+            with SessionLocal() as db:
+                have = set(db.execute(text(HAVE_OPINIONS_SQL.format(schema=schema)), {"ids": ids}).scalars())
+                todo = [j for j in batch if j.listing_id not in have]
+                frames = []
+                if todo:
+                    res = db.execute(text(LISTING_SQL.format(schema=schema, latest=settings.VIEW_OR_TABLE)),
+                                     {"ids": [j.listing_id for j in todo]})
+                    df = pd.DataFrame(res.all(), columns=list(res.keys()))
+                    # one vectorized call per (n, seed) over all of its listings
+                    groups: dict[tuple[int, int], list[str]] = {}
+                    for j in todo:
+                        groups.setdefault((j.n, j.seed), []).append(j.listing_id)
+                    for (n, seed), group in groups.items():
+                        part = df[df["listing_id"].isin(group)].reset_index(drop=True)
+                        if not part.empty:
+                            frames.append(synthesize_opinions(part, n_per_listing=n, seed=seed))
+                written: dict[str, int] = {}
+                if frames:
+                    gen = pd.concat(frames, ignore_index=True)
+                    upsert_many(db, gen.to_dict(orient="records"))
+                    written = gen["listing_id"].value_counts().to_dict()
+            for lid in written:
+                invalidate_opinions(lid)
+        except Exception as exc:
+            log.exception("opinion generation failed for %d listing(s)", len(batch))
+            self._finish(batch, error=exc)
+            return
+        self._finish(batch, written=written)
+        log.debug("generated opinions for %d of %d listing(s) in %.2fs",
+                  len(written), len(batch), time.perf_counter() - t0)
+
+    def _finish(self, batch: list[Job], written: dict | None = None, error: Exception | None = None) -> None:
+        # leave the in-flight map first: a later miss must start a new job, not join a finished one
+        with self._lock:
+            for j in batch:
+                if self._inflight.get(j.listing_id) is j.future:
+                    del self._inflight[j.listing_id]
+        for j in batch:
+            if error is not None:
+                j.future.set_exception(error)
+            else:
+                j.future.set_result(int(written.get(j.listing_id, 0)))
+
+    def precompute_in_background(self, snapshot_date) -> None:
+        """precompute() on a daemon thread, for long-running (API) processes."""
+        threading.Thread(
+            target=self.precompute, args=(snapshot_date,), name="opinion-precompute", daemon=True
+        ).start()
+
+    def precompute(self, snapshot_date, n: int = 3, seed: int = 42, chunk: int = 2000) -> int:
+        """Generate opinions for every listing of snapshot_date that has none; blocks
+        until done and returns the number of opinions written."""
+        from backend.db import SessionLocal
+
+        sql = text(SNAPSHOT_TODO_SQL.format(schema=settings.SCHEMA))
+        after, total, listings = "", 0, 0
+        while True:
+            with SessionLocal() as db:
+                ids = list(db.execute(sql, {"snapshot": str(snapshot_date), "after": after, "limit": chunk}).scalars())
+            if not ids:
+                break
+            after = ids[-1]
+            futures = self.submit_many(ids, n, seed)
+            wait(futures.values())
+            total += sum(f.result() for f in futures.values())
+            listings += len(ids)
+            log.info("precompute %s: %d listings, %d opinions so far", snapshot_date, listings, total)
+        return total
+
+
+opinion_worker = OpinionWorker(settings.OPINION_WORKERS, settings.OPINION_BATCH)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Generate opinions for every listing of a snapshot ahead of time")
+    ap.add_argument("snapshot_date", help="YYYY-MM-DD")
+    ap.add_argument("--n", type=int, default=3, help="opinions per listing")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    t0 = time.perf_counter()
+    n = opinion_worker.precompute(args.snapshot_date, args.n, args.seed)
+    print(f"wrote {n:,} opinions for {args.snapshot_date} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,18 @@ from pydantic import Field, AliasChoices
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # asyncio driver URL for the async endpoints; derived from DATABASE_URL when unset
+    ASYNC_DATABASE_URL: str | None = None
+    # optional read replica for the read-only routes (and its asyncio URL, derived when unset)
+    READ_DATABASE_URL: str | None = None
+    ASYNC_READ_DATABASE_URL: str | None = None
+    # connection pool of every engine (backend/db.py)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    # connections opened per async engine at startup
+    DB_POOL_WARMUP: int = 4
     DEBUG: bool = False
     USE_POSTGIS: bool = True 
     SCHEMA: str = Field(
@@ -10,12 +22,57 @@ class Settings(BaseSettings):
         validation_alias=AliasChoices("DB_SCHEMA", "SCHEMA"),
     )
 
-    # Accept VIEW_OR_TABLE or TABLE or VIEW; default to "fact_listings"
+    # Accept VIEW_OR_TABLE or TABLE or VIEW; default to "latest_listings", the
+    # one-row-per-listing table kept current by backend/latest.py
     VIEW_OR_TABLE: str = Field(
-        default="fact_listings",
+        default="latest_listings",
         validation_alias=AliasChoices("VIEW_OR_TABLE", "TABLE", "VIEW"),
     )
 
+    # /listings totals: exact | cached | estimate (see backend/counts.py)
+    COUNT_MODE: str = "cached"
+    COUNT_CACHE_SIZE: int = 2048
+    # below this planner estimate an exact count is cheap enough to run anyway
+    ESTIMATE_EXACT_BELOW: int = 1000
+    # how often (seconds) to look for a newly loaded snapshot
+    SNAPSHOT_POLL_SECONDS: int = 60
+
+    # response cache for /listings and opinion GETs (see backend/http_cache.py)
+    RESPONSE_CACHE_TTL: int = 300
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2048
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_MIN_COMPRESS: int = 1024
+    # e.g. redis://cache:6379/0 to share the cache between workers
+    RESPONSE_CACHE_URL: str | None = None
+
+    # rows fetched (and encoded) per batch by /listings/export
+    EXPORT_BATCH_ROWS: int = 5000
+
+    # /listings/clusters returns raw listings when a viewport has at most this many
+    CLUSTER_RAW_THRESHOLD: int = 200
+
+    # serve /listings from the in-memory NumPy engine (backend/columnar.py)
+    USE_COLUMNAR_ENGINE: bool = False
+
+    # CatBoost next-price model (backend/ml/price.py); unset disables predictions
+    PRICE_MODEL_PATH: str | None = None
+    PREDICTION_CACHE_SIZE: int = 100_000
+    # per-snapshot Parquet partitions written by backend/ml/features.py
+    FEATURE_STORE_DIR: str = "feature_store"
+
+    # statements at least this slow are logged to backend.slow_query (backend/instrumentation.py)
+    SLOW_QUERY_MS: int = 200
+    # per-stage Server-Timing header on every response
+    SERVER_TIMING: bool = True
+
+    # background opinion generation (backend/services/opinion_worker.py)
+    OPINION_WORKERS: int = 2
+    OPINION_BATCH: int = 200
+    # how long GET /listings/{id}/opinions waits on generation before answering 202
+    OPINION_WAIT_SECONDS: float = 2.0
+    # generate opinions for a new snapshot's listings as soon as an API process sees it
+    OPINION_PRECOMPUTE: bool = False
+
     # load from .env automatically
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,77 @@
+"""Snapshot change notifications for the in-process caches.
+
+A snapshot load is the only thing that changes the listing data, so caches
+subscribe here and get cleared after one. The loader calls announce(), which
+bumps realestate.data_version (migrations/0011_data_version.sql) and
+publishes in its own process; other processes call watch(), which polls the
+counter. A counter rather than max(snapshot_date): backfilling an older
+snapshot or reloading one with --force changes the data but not the newest
+date.
+"""
+import logging
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+_listeners = []
+_lock = threading.Lock()
+_UNSET = object()
+_state = {"version": _UNSET, "checked_at": 0.0}
+
+VERSION_SQL = "SELECT version, snapshot_date FROM {schema}.data_version"
+
+BUMP_SQL = """
+UPDATE {schema}.data_version
+SET version = version + 1, snapshot_date = CAST(:snapshot AS date), published_at = now()
+RETURNING version
+"""
+
+
+def subscribe(fn):
+    """Register fn(snapshot_date) to run after a new snapshot is loaded. Usable as a decorator."""
+    _listeners.append(fn)
+    return fn
+
+
+def publish(snapshot_date) -> None:
+    """Tell every subscriber in this process that snapshot_date has been loaded."""
+    for fn in list(_listeners):
+        try:
+            fn(snapshot_date)
+        except Exception:
+            log.exception("snapshot listener %r failed", fn)
+
+
+def announce(db: Session, snapshot_date) -> None:
+    """Record a load of snapshot_date for every process, then publish it in this one.
+    Call it after the derived tables are refreshed: a watcher that clears its
+    caches earlier would fill them again from the old rows."""
+    version = db.execute(text(BUMP_SQL.format(schema=settings.SCHEMA)), {"snapshot": str(snapshot_date)}).scalar()
+    db.commit()
+    _state["version"] = version
+    publish(snapshot_date)
+
+
+def current_version(db: Session):
+    """(version, snapshot_date) of the last announced load."""
+    return tuple(db.execute(text(VERSION_SQL.format(schema=settings.SCHEMA))).one())
+
+
+def watch(db: Session, force: bool = False) -> None:
+    """Publish when another process announced a load; polls at most every SNAPSHOT_POLL_SECONDS."""
+    now = time.monotonic()
+    with _lock:
+        if not force and now - _state["checked_at"] < settings.SNAPSHOT_POLL_SECONDS:
+            return
+        _state["checked_at"] = now
+    version, snapshot_date = current_version(db)
+    if _state["version"] is _UNSET:
+        # first look at the counter: nothing has been cached against older data yet
+        _state["version"] = version
+    elif version != _state["version"]:
+        _state["version"] = version
+        publish(snapshot_date)
@@ -0,0 +1,19 @@
+"""The columnar engine must return what the SQL path returns: same totals, same
+ids in the same order, page after page (backend/bench/oracle.py as a test)."""
+import pytest
+
+from backend.bench.oracle import CASES, run_case
+
+# every sort once more on a filtered subset, on top of the oracle's cases
+SORT_CASES = [{"city": "gdansk", "sort": s} for s in ("recent", "price_asc", "price_desc", "m2_asc", "m2_desc")]
+
+
+@pytest.fixture(scope="module")
+def index(synthetic_db):
+    from backend.columnar import ColumnarIndex
+    return ColumnarIndex.load(synthetic_db)
+
+
+@pytest.mark.parametrize("case", CASES + SORT_CASES, ids=lambda c: ",".join(f"{k}={v}" for k, v in c.items()) or "all")
+def test_columnar_matches_sql(synthetic_db, index, case):
+    assert run_case(synthetic_db, index, case, pages=3, page_size=24) == []
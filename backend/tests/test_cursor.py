@@ -0,0 +1,48 @@
+from datetime import date
+import pytest
+from sqlalchemy.dialects.postgresql import asyncpg, psycopg
+
+from backend.crud import prepare_search, encode_cursor, decode_cursor
+
+FILTERS = dict(city=None, type_=None, min_m2=None, max_m2=None, min_price=None, max_price=None,
+               rooms=None, amenities=None)
+
+
+def test_recent_cursor_round_trips_a_date():
+    cursor = encode_cursor("recent", date(2024, 6, 1), "abc")
+    assert decode_cursor(cursor) == ("recent", date(2024, 6, 1), "abc")
+
+
+def test_malformed_recent_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("recent", "June", "abc"))
+
+
+@pytest.mark.parametrize("dialect", [asyncpg.dialect(), psycopg.dialect()], ids=["asyncpg", "psycopg"])
+def test_recent_keyset_binds_a_date(dialect):
+    query = prepare_search(page=1, page_size=24, sort="recent",
+                           cursor=encode_cursor("recent", date(2024, 6, 1), "abc"), **FILTERS)
+    compiled = query.stmts.page.compile(dialect=dialect)
+    assert str(compiled.binds["after_key"].type) == "DATE"
+    assert "VARCHAR" not in str(compiled)
+    assert query.page_params["after_key"] == date(2024, 6, 1)
+
+
+def test_recent_page_two(synthetic_db):
+    from fastapi.testclient import TestClient
+    from backend.app import app
+
+    with TestClient(app) as client:
+        first = client.get("/listings", params={"sort": "recent", "page_size": 24})
+        assert first.status_code == 200
+        cursor = first.json()["next_cursor"]
+        assert cursor
+
+        second = client.get("/listings", params={"sort": "recent", "page_size": 24, "cursor": cursor})
+        assert second.status_code == 200
+        by_offset = client.get("/listings", params={"sort": "recent", "page_size": 24, "page": 2})
+
+    ids = [i["listing_id"] for i in second.json()["items"]]
+    assert ids
+    assert not set(ids) & {i["listing_id"] for i in first.json()["items"]}
+    assert ids == [i["listing_id"] for i in by_offset.json()["items"]]
@@ -0,0 +1,41 @@
+"""The vectorized generator must reproduce the per-opinion reference exactly."""
+import pandas as pd
+import pytest
+
+from backend.bench.opinions import fake_listings
+from backend.services.opinion_generator import synthesize_opinions, synthesize_opinions_reference
+
+
+@pytest.mark.parametrize("n_listings,per_listing,seed", [(1, 3, 42), (500, 3, 42), (500, 5, 7), (2000, 1, 0)])
+def test_matches_reference(n_listings, per_listing, seed):
+    df = fake_listings(n_listings, seed=seed)
+    fast = synthesize_opinions(df, per_listing, seed)
+    ref = synthesize_opinions_reference(df, per_listing, seed)
+    pd.testing.assert_frame_equal(fast, ref, check_dtype=False)
+
+
+def test_seed_is_reproducible():
+    df = fake_listings(200)
+    pd.testing.assert_frame_equal(synthesize_opinions(df, 3, 42), synthesize_opinions(df, 3, 42))
+
+
+def test_batch_does_not_change_a_listings_opinions():
+    # the worker generates batches, regenerate one listing: both must write the same rows
+    df = fake_listings(300, seed=3)
+    batched = synthesize_opinions(df, 3, 42)
+    single = pd.concat(
+        [synthesize_opinions(df.iloc[[i]].reset_index(drop=True), 3, 42) for i in range(len(df))],
+        ignore_index=True,
+    )
+    pd.testing.assert_frame_equal(batched, single)
+
+    shuffled = df.sample(frac=1.0, random_state=1).reset_index(drop=True)
+    again = synthesize_opinions(shuffled, 3, 42).set_index("opinion_id").loc[batched["opinion_id"]].reset_index()
+    pd.testing.assert_frame_equal(again[batched.columns], batched)
+
+
+def test_more_opinions_extend_the_same_ones():
+    df = fake_listings(50)
+    three = synthesize_opinions(df, 3, 42).set_index("opinion_id")
+    five = synthesize_opinions(df, 5, 42).set_index("opinion_id")
+    pd.testing.assert_frame_equal(five.loc[three.index], three)
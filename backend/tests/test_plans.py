@@ -0,0 +1,25 @@
+"""Every /listings shape in backend/bench/plan_check.py must plan onto an index:
+no sequential scan on the listing relations and no full-table sort."""
+import pytest
+
+from backend.bench.plan_check import CASES, check_plan, explain_case, listing_relations, listing_rows
+from backend.settings import settings
+
+# below this the planner rightly prefers seq scans, so plans say nothing
+MIN_ROWS = 50_000
+FULL_SORT = 0.5
+
+
+@pytest.fixture(scope="module")
+def table_rows(synthetic_db):
+    rows = listing_rows(synthetic_db)
+    if rows < MIN_ROWS:
+        pytest.skip(f"{settings.VIEW_OR_TABLE} has ~{int(rows):,} rows; plans need at least {MIN_ROWS:,}")
+    return rows
+
+
+@pytest.mark.parametrize("keyset", [False, True], ids=["first_page", "keyset_page"])
+@pytest.mark.parametrize("case", [c for _, c in CASES], ids=[label for label, _ in CASES])
+def test_plan_uses_indexes(synthetic_db, table_rows, case, keyset):
+    plan = explain_case(synthetic_db, case, keyset)
+    assert check_plan(plan, listing_relations(), table_rows, FULL_SORT) == []
@@ -0,0 +1,22 @@
+"""API processes must notice every announced load, not only a newer snapshot_date."""
+from sqlalchemy import text
+
+from backend import snapshots
+from backend.settings import settings
+
+
+def test_watch_publishes_a_backfill(synthetic_db):
+    seen = []
+    listener = snapshots.subscribe(seen.append)
+    try:
+        snapshots.watch(synthetic_db, force=True)
+        snapshots.watch(synthetic_db, force=True)
+        assert seen == []
+
+        # another process backfills an older snapshot: the newest date stays the same
+        synthetic_db.execute(text(snapshots.BUMP_SQL.format(schema=settings.SCHEMA)), {"snapshot": "2020-01-01"})
+        synthetic_db.commit()
+        snapshots.watch(synthetic_db, force=True)
+        assert [str(d) for d in seen] == ["2020-01-01"]
+    finally:
+        snapshots._listeners.remove(listener)
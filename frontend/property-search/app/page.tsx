@@ -28,6 +28,7 @@ export default function Page() {
         {/* Map */}
         <MapView
           items={data?.items ?? []}
+          filters={params}
           onSelectListing={(id) => setSelectedId(id)}
           onBoundsChanged={(b) => {
             setParams((prev) => ({
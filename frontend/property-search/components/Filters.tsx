@@ -67,6 +67,7 @@ export function Filters({ onChange }: { onChange: (p: SearchParams) => void }) {
         <option value="price_desc">Price ↓</option>
         <option value="m2_asc">m² ↑</option>
         <option value="m2_desc">m² ↓</option>
+        <option value="accessibility">Accessibility</option>
       </select>
 
       <div className="col-span-2 md:col-span-6 flex gap-3 flex-wrap">
@@ -1,9 +1,8 @@
 "use client";
-import { useMemo, useRef, useCallback, useState } from "react";
+import { useMemo, useRef, useCallback, useState, useEffect } from "react";
 import {
   GoogleMap,
   Marker,
-  MarkerClustererF,
   useLoadScript,
   InfoWindowF,
 } from "@react-google-maps/api";
@@ -11,8 +10,45 @@ import type { Listing } from "@/lib/types";
 
 type Bounds = { south: number; west: number; north: number; east: number };
 
+// GET /listings/clusters: grid cells while the view is dense, the listings
+// themselves (mode "listings") once at most raw_threshold match
+type Cluster = {
+  cell: string;
+  count: number;
+  lat: number;
+  lng: number;
+  price_min: number | null;
+  price_median: number | null;
+  price_max: number | null;
+};
+type ClustersResponse = {
+  zoom: number;
+  cell_size: number;
+  bbox: number[];
+  total: number;
+  mode: "clusters" | "listings";
+  clusters: Cluster[];
+  items: Listing[];
+};
+
+// search params that are not attribute filters; everything else is forwarded
+const NOT_FILTERS = new Set([
+  "page",
+  "page_size",
+  "sort",
+  "cursor",
+  "include_history",
+  "include_opinions",
+  "include_prediction",
+  "bbox_south",
+  "bbox_west",
+  "bbox_north",
+  "bbox_east",
+]);
+
 export default function MapView({
   items,
+  filters,
   onBoundsChanged,
   onSelectListing,
   defaultCenter = { lat: 50.0647, lng: 19.945 }, // Kraków
@@ -20,6 +56,8 @@ export default function MapView({
   colorMetric = "centre_distance",
 }: {
   items: Listing[];
+  // the list's search params, so the clusters count the same listings
+  filters?: Record<string, unknown>;
   onBoundsChanged?: (b: Bounds) => void;
   onSelectListing?: (id: string) => void;
   defaultCenter?: { lat: number; lng: number };
@@ -38,6 +76,8 @@ export default function MapView({
   const mapRef = useRef<google.maps.Map | null>(null);
   // active marker id for InfoWindow
   const [active, setActive] = useState<string | null>(null); // <-- define setActive
+  const [clusters, setClusters] = useState<ClustersResponse | null>(null);
+  const pending = useRef<AbortController | null>(null);
 
   // const uniqueItems = Array.from(
   //   new Map(
@@ -47,15 +87,63 @@ export default function MapView({
   //   ).values()
   // );
 
+  // raw markers come from the clusters endpoint once it answers in listings mode
   const uniqueItems = useMemo(() => {
+    const raw = clusters?.mode === "listings" ? clusters.items : [];
     return Array.from(
       new Map(
-        (items ?? [])
+        (raw ?? [])
           .filter((i) => i.latitude && i.longitude)
           .map((i) => [i.listing_id, i])
       ).values()
     );
-  }, [items]);
+  }, [clusters]);
+
+  // attribute filters as a query string: stable while only the viewport moves
+  const filterQs = useMemo(() => {
+    const qs = new URLSearchParams();
+    for (const [k, v] of Object.entries(filters ?? {})) {
+      if (NOT_FILTERS.has(k) || v == null || v === "") continue;
+      qs.set(k, Array.isArray(v) ? v.join(",") : String(v));
+    }
+    return qs.toString();
+  }, [filters]);
+
+  const fetchClusters = useCallback(async () => {
+    const map = mapRef.current;
+    const b = map?.getBounds();
+    const zoom = map?.getZoom();
+    if (!b || zoom == null) return;
+    const ne = b.getNorthEast();
+    const sw = b.getSouthWest();
+    const qs = new URLSearchParams({
+      bbox_south: String(sw.lat()),
+      bbox_west: String(sw.lng()),
+      bbox_north: String(ne.lat()),
+      bbox_east: String(ne.lng()),
+      zoom: String(Math.round(zoom)),
+    });
+    const query = filterQs ? `${qs}&${filterQs}` : `${qs}`;
+
+    // only the latest viewport matters: drop the answer of the previous one
+    pending.current?.abort();
+    const ctrl = new AbortController();
+    pending.current = ctrl;
+    try {
+      const res = await fetch(`/api/listings/clusters?${query}`, {
+        signal: ctrl.signal,
+      });
+      if (!res.ok) return;
+      setClusters((await res.json()) as ClustersResponse);
+    } catch (e) {
+      if ((e as Error).name !== "AbortError") throw e;
+    }
+  }, [filterQs]);
+
+  // new filters: re-cluster the current view
+  useEffect(() => {
+    fetchClusters();
+  }, [fetchClusters]);
 
   const onLoad = useCallback(
     (map: google.maps.Map) => {
@@ -77,6 +165,7 @@ export default function MapView({
   );
 
   const handleIdle = useCallback(() => {
+    fetchClusters();
     if (!mapRef.current || !onBoundsChanged) return;
     const b = mapRef.current.getBounds();
     if (!b) return;
@@ -88,7 +177,7 @@ export default function MapView({
       south: sw.lat(),
       west: sw.lng(),
     });
-  }, [onBoundsChanged]);
+  }, [onBoundsChanged, fetchClusters]);
 
   const options = useMemo<google.maps.MapOptions>(
     () => ({
@@ -149,6 +238,26 @@ export default function MapView({
     return `data:image/svg+xml;charset=UTF-8,${svg}`;
   }
 
+  // circle sized by the cell's count, with the count as its label
+  function clusterIcon(count: number): google.maps.Icon {
+    const size = count < 10 ? 30 : count < 100 ? 38 : count < 1000 ? 46 : 54;
+    const svg = encodeURIComponent(
+      `<svg width="${size}" height="${size}" viewBox="0 0 40 40" xmlns="http://www.w3.org/2000/svg">
+      <circle cx="20" cy="20" r="19" fill="#2563eb" fill-opacity="0.85" stroke="white" stroke-width="2"/>
+    </svg>`
+    );
+    return {
+      url: `data:image/svg+xml;charset=UTF-8,${svg}`,
+      scaledSize: new google.maps.Size(size, size),
+      anchor: new google.maps.Point(size / 2, size / 2),
+    };
+  }
+
+  function formatPrice(v: number | null) {
+    if (v == null) return "";
+    return v >= 1e6 ? `${(v / 1e6).toFixed(1)}M` : `${Math.round(v / 1e3)}k`;
+  }
+
   function colorForDistance(v?: number) {
     if (v == null) return "#808080"; // grey if unknown
     if (v <= 300) return "#16a34a"; // green-600
@@ -186,56 +295,76 @@ export default function MapView({
         options={options}
         mapContainerStyle={{ height: "100%", width: "100%" }}
       >
-        <MarkerClustererF>
-          {(clusterer) => (
-            <>
-              {uniqueItems.map((i) => {
-                const val = (i as any)[metric] as number | undefined;
-                const icon = {
-                  url: pinUrl(colorForDistance(val)),
-                  scaledSize: new google.maps.Size(32, 48),
-                };
+        {clusters?.mode === "clusters" &&
+          clusters.clusters.map((c) => (
+            <Marker
+              key={c.cell}
+              position={{ lat: c.lat, lng: c.lng }}
+              icon={clusterIcon(c.count)}
+              label={{
+                text: c.count.toLocaleString(),
+                color: "white",
+                fontSize: "12px",
+                fontWeight: "600",
+              }}
+              title={
+                c.price_median != null
+                  ? `${c.count} listings, median ${formatPrice(c.price_median)} (${formatPrice(c.price_min)}–${formatPrice(c.price_max)})`
+                  : `${c.count} listings`
+              }
+              onClick={() => {
+                // zoom into the cell; the next idle fetches its finer cells
+                const map = mapRef.current;
+                if (!map) return;
+                map.panTo({ lat: c.lat, lng: c.lng });
+                map.setZoom((map.getZoom() ?? defaultZoom) + 2);
+              }}
+            />
+          ))}
 
-                return (
-                  <div key={i.listing_id}>
-                    <Marker
-                      position={{ lat: i.latitude!, lng: i.longitude! }}
-                      clusterer={clusterer}
-                      icon={icon}
-                      onClick={() => {
-                        setActive(i.listing_id); // show InfoWindow
-                        onSelectListing?.(i.listing_id); // notify parent (triggers opinions panel)
-                      }}
-                    />
+        {uniqueItems.map((i) => {
+          const val = (i as any)[metric] as number | undefined;
+          const icon = {
+            url: pinUrl(colorForDistance(val)),
+            scaledSize: new google.maps.Size(32, 48),
+          };
+
+          return (
+            <div key={i.listing_id}>
+              <Marker
+                position={{ lat: i.latitude!, lng: i.longitude! }}
+                icon={icon}
+                onClick={() => {
+                  setActive(i.listing_id); // show InfoWindow
+                  onSelectListing?.(i.listing_id); // notify parent (triggers opinions panel)
+                }}
+              />
 
-                    {/* ✅ Add this InfoWindow right below the Marker */}
-                    {active === i.listing_id && (
-                      <InfoWindowF
-                        position={{ lat: i.latitude!, lng: i.longitude! }}
-                        onCloseClick={() => setActive(null)}
-                      >
-                        <div className="text-sm space-y-1">
-                          <div className="font-medium">
-                            {i.city ?? "Property"}
-                          </div>
-                          <div>
-                            {i.square_m} m² • {i.rooms} rooms
-                          </div>
-                          <button
-                            className="mt-1 px-2 py-1 rounded bg-blue-600 text-white hover:bg-blue-700"
-                            onClick={() => onSelectListing?.(i.listing_id)}
-                          >
-                            See opinions
-                          </button>
-                        </div>
-                      </InfoWindowF>
-                    )}
+              {/* ✅ Add this InfoWindow right below the Marker */}
+              {active === i.listing_id && (
+                <InfoWindowF
+                  position={{ lat: i.latitude!, lng: i.longitude! }}
+                  onCloseClick={() => setActive(null)}
+                >
+                  <div className="text-sm space-y-1">
+                    <div className="font-medium">
+                      {i.city ?? "Property"}
+                    </div>
+                    <div>
+                      {i.square_m} m² • {i.rooms} rooms
+                    </div>
+                    <button
+                      className="mt-1 px-2 py-1 rounded bg-blue-600 text-white hover:bg-blue-700"
+                      onClick={() => onSelectListing?.(i.listing_id)}
+                    >
+                      See opinions
+                    </button>
                   </div>
-                );
-              })}
-            </>
-          )}
-        </MarkerClustererF>
+                </InfoWindowF>
+              )}
+            </div>
+          );
+        })}
 
         {/* <MarkerClustererF>
           {(clusterer) => (
@@ -161,6 +161,11 @@ export function Results({
 
   if (!data) return null;
 
+  // an estimated total can't tell us where the last page ends; the cursor can
+  const hasNext = data.total_is_estimate
+    ? Boolean(data.next_cursor)
+    : data.page * data.page_size < data.total;
+
   return (
     <div className="mt-4">
       <div className="grid grid-cols-1 md:grid-cols-3 lg:grid-cols-4 gap-4">
@@ -175,7 +180,8 @@ export function Results({
       </div>
       <div className="flex justify-between items-center mt-4">
         <span className="text-sm text-gray-600">
-          Total {data.total.toLocaleString()} results
+          Total {data.total_is_estimate ? "~" : ""}
+          {data.total.toLocaleString()} results
         </span>
         <div className="inline-flex gap-2">
           <button
@@ -187,7 +193,7 @@ export function Results({
           </button>
           <button
             className="px-4 py-2 border rounded"
-            disabled={data.page * data.page_size >= data.total}
+            disabled={!hasNext}
             onClick={() => onPage(data.page + 1)}
           >
             Next